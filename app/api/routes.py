@@ -1,17 +1,19 @@
 import time
 import logging
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
 from app.schemas.chat import ChatRequest, ChatResponse, Message, SummarizationRequest, HealthResponse
 from app.llm.rag import get_rag_chain
+from app.llm.concurrency import Overloaded, get_admission_queue
+from app.llm.memory import get_session_memory, history_from_messages
+from app.llm.summary_store import get_summary_store
 from app.core.config import get_settings
 from app.monitoring.metrics import TOKEN_COUNT, MEMORY_USAGE
-from app.llm.prompts import get_system_prompt
 import psutil
-import asyncio
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -38,24 +40,41 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
         raise HTTPException(status_code=400, detail="Last message must be from user")
 
     query = last_message.content
+    chat_history = resolve_chat_history(request)
+
+    # Shed load before any work is done for the request; requests joining an
+    # identical one in flight add no work and skip the queue
+    rag_chain = get_rag_chain()
+    flight_key = rag_chain.chat_flight_key(
+        query, request.response_mode, chat_history, request.book, request.chapter, request.stream
+    )
+    release = await admit(rag_chain, flight_key)
 
     # Streaming response handling
     if request.stream:
+        # Join or lead the stream now, in the same step as admission: deciding
+        # once the body is iterated could make an unadmitted request the leader
+        stream = rag_chain.stream_response(query, request.response_mode, chat_history, request.book, request.chapter)
         return StreamingResponse(
-            generate_streaming_response(query, request.response_mode),
-            media_type="text/event-stream"
+            generate_streaming_response(stream, query, request.session_id, release),
+            media_type="text/event-stream",
+            # Also frees the slot if the client leaves before the stream starts
+            background=BackgroundTask(release_slot, release)
         )
 
-    # Get or create RAG chain
-    rag_chain = get_rag_chain()
-
     # Generate response
     try:
         response_text, sources = await rag_chain.generate_response(
             query=query,
-            response_mode=request.response_mode
+            response_mode=request.response_mode,
+            chat_history=chat_history,
+            book=request.book,
+            chapter=request.chapter
         )
 
+        if request.session_id:
+            get_session_memory().append(request.session_id, query, response_text)
+
         # Update metrics in background
         background_tasks.add_task(update_metrics, "chat", len(query))
 
@@ -67,9 +86,13 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
             message=Message(role="assistant", content=response_text),
             sources=sources
         )
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
         logger.error(f"Error generating response: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        release()
 
 
 @router.post("/summarize", response_model=ChatResponse, tags=["summarization"])
@@ -77,8 +100,19 @@ async def summarize(request: SummarizationRequest, background_tasks: BackgroundT
     """Summarization endpoint"""
     start_time = time.time()
 
-    # Get RAG chain
+    # Precomputed summaries are served straight from the store
+    stored = get_summary_store().lookup(request.type, request.target, request.response_mode)
+    if stored:
+        summary_text, sources = stored
+        background_tasks.add_task(update_metrics, "summarize", len(request.target))
+        return ChatResponse(
+            message=Message(role="assistant", content=summary_text),
+            sources=sources
+        )
+
     rag_chain = get_rag_chain()
+    flight_key = rag_chain.summary_flight_key(request.type, request.target, request.response_mode)
+    release = await admit(rag_chain, flight_key)
 
     # Generate summary
     try:
@@ -99,178 +133,94 @@ async def summarize(request: SummarizationRequest, background_tasks: BackgroundT
             message=Message(role="assistant", content=summary_text),
             sources=sources
         )
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
         logger.error(f"Error generating summary: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        release()
 
 
 @router.get("/clear-memory", tags=["chat"])
-async def clear_memory():
-    """Clear the conversation memory"""
-    rag_chain = get_rag_chain()
-    rag_chain.memory.clear()
+async def clear_memory(session_id: Optional[str] = None):
+    """Clear the conversation memory of one session"""
+    # Clients without a session id keep their own history in `messages`
+    if session_id:
+        get_session_memory().clear(session_id)
     return {"status": "Memory cleared"}
 
 
-# In app/api/routes.py - Replace the generate_streaming_response function with this:
-
-import time
-import logging
-from typing import List, Optional
-
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from fastapi.responses import StreamingResponse
-
-from app.schemas.chat import ChatRequest, ChatResponse, Message, SummarizationRequest, HealthResponse
-from app.llm.rag import get_rag_chain
-from app.core.config import get_settings
-from app.monitoring.metrics import TOKEN_COUNT, MEMORY_USAGE
-from app.llm.prompts import get_system_prompt
-import psutil
-import asyncio
-
-logger = logging.getLogger(__name__)
-settings = get_settings()
-router = APIRouter()
-
-
-@router.get("/health", response_model=HealthResponse, tags=["health"])
-async def health_check():
-    """Health check endpoint"""
-    return HealthResponse(version=settings.APP_VERSION)
-
-
-@router.post("/chat", response_model=ChatResponse, tags=["chat"])
-async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
-    """Chat endpoint"""
-    start_time = time.time()
-
-    # Extract the last user message
-    if not request.messages or len(request.messages) == 0:
-        raise HTTPException(status_code=400, detail="No messages provided")
-
-    last_message = request.messages[-1]
-    if last_message.role != "user":
-        raise HTTPException(status_code=400, detail="Last message must be from user")
-
-    query = last_message.content
+def overloaded_error(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
-    # Streaming response handling
-    if request.stream:
-        return StreamingResponse(
-            generate_streaming_response(query, request.response_mode),
-            media_type="text/event-stream"
-        )
 
-    # Get or create RAG chain
-    rag_chain = get_rag_chain()
+async def admit(rag_chain, flight_key: str):
+    """Take a RAG pipeline slot, or reject the request with 429/503 when saturated.
 
-    # Generate response
+    A request joining an identical one in flight gets no slot. That holds only
+    if it joins the flight before its next await, so callers must start the
+    (coalesced) work right after this returns.
+    """
+    if rag_chain.in_flight(flight_key):
+        return lambda: None
     try:
-        response_text, sources = await rag_chain.generate_response(
-            query=query,
-            response_mode=request.response_mode
-        )
-
-        # Update metrics in background
-        background_tasks.add_task(update_metrics, "chat", len(query))
-
-        # Calculate response time
-        response_time = time.time() - start_time
-        logger.info(f"Response generated in {response_time:.2f} seconds")
-
-        return ChatResponse(
-            message=Message(role="assistant", content=response_text),
-            sources=sources
-        )
-    except Exception as e:
-        logger.error(f"Error generating response: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@router.post("/summarize", response_model=ChatResponse, tags=["summarization"])
-async def summarize(request: SummarizationRequest, background_tasks: BackgroundTasks):
-    """Summarization endpoint"""
-    start_time = time.time()
+        return await get_admission_queue().acquire()
+    except Overloaded as e:
+        raise overloaded_error(e)
 
-    # Get RAG chain
-    rag_chain = get_rag_chain()
-
-    # Generate summary
-    try:
-        summary_text, sources = await rag_chain.generate_summary(
-            summary_type=request.type,
-            summary_target=request.target,
-            response_mode=request.response_mode
-        )
 
-        # Update metrics in background
-        background_tasks.add_task(update_metrics, "summarize", len(request.target))
+async def release_slot(release):
+    # Async so that Starlette runs it on the event loop, like the slot's other users
+    release()
 
-        # Calculate response time
-        response_time = time.time() - start_time
-        logger.info(f"Summary generated in {response_time:.2f} seconds")
 
-        return ChatResponse(
-            message=Message(role="assistant", content=summary_text),
-            sources=sources
-        )
-    except Exception as e:
-        logger.error(f"Error generating summary: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+def resolve_chat_history(request: ChatRequest):
+    """History for this request: the server-side session, or the client's messages"""
+    if request.session_id:
+        return get_session_memory().get_history(request.session_id)
+    return history_from_messages(request.messages[:-1], settings.MEMORY_MAX_TURNS)
 
 
-@router.get("/clear-memory", tags=["chat"])
-async def clear_memory():
-    """Clear the conversation memory"""
-    rag_chain = get_rag_chain()
-    rag_chain.memory.clear()
-    return {"status": "Memory cleared"}
+def format_sse(text: str) -> str:
+    """Frame a text fragment as a server-sent event.
 
+    Each line gets its own ``data:`` field so newlines inside the answer
+    survive the SSE framing; clients re-join them with newlines.
+    """
+    return "".join(f"data: {line}\n" for line in text.split("\n")) + "\n"
 
-# In app/api/routes.py - Replace the generate_streaming_response function with this:
 
-async def generate_streaming_response(query: str, response_mode: str):
-    """Generate streaming response"""
-    rag_chain = get_rag_chain()
-    
-    # Get the system prompt and initialize the conversation chain
-    system_prompt = get_system_prompt(response_mode)
-    chain = rag_chain.get_conversation_chain(response_mode)
-    
+async def generate_streaming_response(
+    stream: AsyncIterator[str],
+    query: str,
+    session_id: Optional[str] = None,
+    release=None
+):
+    """Generate streaming response, forwarding the LLM tokens of ``stream`` as they arrive"""
     # Send the initial "thinking" indicator
     yield "data: Thinking...\n\n"
-    await asyncio.sleep(0.2)
-    
+
     try:
-        # Get the full result
-        result = chain.invoke({"question": query})
-        answer = result.get("answer", "Sorry, I couldn't generate a response.")
-        
-        # Stream the answer in smaller chunks to prevent abrupt cutoffs
-        chunk_size = 50  # Increased from 20
-        for i in range(0, len(answer), chunk_size):
-            chunk = answer[i:i + chunk_size]
-            yield f"data: {chunk}\n\n"
-            await asyncio.sleep(0.05)  # Reduced delay for smoother streaming
-        
+        answer_parts = []
+        async for delta in stream:
+            answer_parts.append(delta)
+            yield format_sse(delta)
+
+        if session_id:
+            get_session_memory().append(session_id, query, "".join(answer_parts))
+
         # Properly signal the end of the stream
         yield "data: [DONE]\n\n"
-        
+
     except Exception as e:
         logger.error(f"Error in streaming response: {e}")
         yield f"data: Error generating response: {str(e)}\n\n"
         yield "data: [DONE]\n\n"
+    finally:
+        if release:
+            release()
 
-def update_metrics(operation: str, input_length: int):
-    """Update metrics after response generation"""
-    # Track token count (rough estimate)
-    estimated_tokens = input_length // 4
-    TOKEN_COUNT.labels(operation=operation).inc(estimated_tokens)
-
-    # Track memory usage
-    memory_info = psutil.Process().memory_info()
-    MEMORY_USAGE.set(memory_info.rss)
 
 def update_metrics(operation: str, input_length: int):
     """Update metrics after response generation"""
@@ -17,9 +17,67 @@ class Settings(BaseModel):
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
 
     # RAG settings
+    # Vector store: "auto" (flat index if exported, else Chroma), "flat", "hnsw",
+    # "int8" or "binary" (quantized codes in memory, exact rescoring) or "chroma"
+    VECTOR_STORE_BACKEND: str = os.getenv("VECTOR_STORE_BACKEND", "auto")
+    HNSW_EF_SEARCH: int = int(os.getenv("HNSW_EF_SEARCH", "64"))
+    VECTOR_RESCORE_MULTIPLIER: int = int(os.getenv("VECTOR_RESCORE_MULTIPLIER", "8"))  # candidates rescored = k * this
+    # Character sizes of the older splitter; they still bound the overlap
+    # search when stitching chunks stored without offsets
     CHUNK_SIZE: int = 512
     CHUNK_OVERLAP: int = 128
+    # Chunks are sized in the embedding model's tokens (MiniLM embeds at most 256)
+    EMBEDDING_TOKENIZER: str = os.getenv("EMBEDDING_TOKENIZER", "sentence-transformers/all-MiniLM-L6-v2")
+    CHUNK_TOKENS: int = int(os.getenv("CHUNK_TOKENS", "128"))
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
     RETRIEVAL_K: int = 5
+    # Hybrid retrieval: BM25 over the same chunks, fused with vector search by
+    # reciprocal rank fusion (score = sum(weight / (RRF_K + rank)))
+    ENABLE_HYBRID_SEARCH: bool = os.getenv("ENABLE_HYBRID_SEARCH", "True").lower() == "true"
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "20"))  # per retriever, before fusion
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+    RRF_VECTOR_WEIGHT: float = float(os.getenv("RRF_VECTOR_WEIGHT", "1.0"))
+    RRF_BM25_WEIGHT: float = float(os.getenv("RRF_BM25_WEIGHT", "1.0"))
+    BM25_K1: float = float(os.getenv("BM25_K1", "1.2"))
+    BM25_B: float = float(os.getenv("BM25_B", "0.75"))
+    # Reranking: "none", "mmr" (diversify on the stored embeddings) or
+    # "cross_encoder" (score question/passage pairs with a local model).
+    # Skipped under load or when it would exceed the latency budget.
+    RERANK_MODE: str = os.getenv("RERANK_MODE", "none")
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", "30"))
+    RERANK_LATENCY_BUDGET_MS: float = float(os.getenv("RERANK_LATENCY_BUDGET_MS", "150"))
+    RERANK_MAX_CONCURRENT: int = int(os.getenv("RERANK_MAX_CONCURRENT", "2"))
+    MMR_LAMBDA: float = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1 = pure relevance, 0 = pure diversity
+    CROSS_ENCODER_MODEL: str = os.getenv("CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_BATCH_SIZE: int = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+    RERANK_CACHE_SIZE: int = int(os.getenv("RERANK_CACHE_SIZE", "20000"))  # cached cross-encoder scores
+    RERANK_CACHE_MB: int = int(os.getenv("RERANK_CACHE_MB", "16"))  # cached chunk vectors for MMR
+
+    # Restrict retrieval to a book named in the question ("in Goblet of Fire, ...")
+    AUTO_DETECT_SCOPE: bool = os.getenv("AUTO_DETECT_SCOPE", "True").lower() == "true"
+    # When to rewrite follow-ups against the history: "auto" (heuristic), "always" or "never"
+    CONDENSE_QUESTION_MODE: str = os.getenv("CONDENSE_QUESTION_MODE", "auto")
+
+    # Context assembly: overlapping/adjacent chunks are merged, near-duplicates
+    # dropped and the rest cut to a token budget counted with the LLM's tokenizer
+    CONTEXT_MAX_TOKENS: int = int(os.getenv("CONTEXT_MAX_TOKENS", "1200"))
+    CONTEXT_MIN_PASSAGE_TOKENS: int = int(os.getenv("CONTEXT_MIN_PASSAGE_TOKENS", "64"))  # shortest cut passage kept
+    CONTEXT_DUPLICATE_THRESHOLD: float = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.8"))  # shared 3-word shingles
+    # Hub repo or local tokenizer.json; the default is an ungated copy of Mistral's tokenizer
+    CONTEXT_TOKENIZER: str = os.getenv("CONTEXT_TOKENIZER", "TheBloke/Mistral-7B-Instruct-v0.1-GPTQ")
+
+    # Chapter summaries: a chapter that fits the context budget is summarized in
+    # one call, longer ones are split into sections summarized in parallel (map)
+    # and then combined (reduce). Tokens are counted with CONTEXT_TOKENIZER.
+    CHAPTER_CONTEXT_TOKENS: int = int(os.getenv("CHAPTER_CONTEXT_TOKENS", "6000"))
+    CHAPTER_SECTION_TOKENS: int = int(os.getenv("CHAPTER_SECTION_TOKENS", "2000"))
+    CHAPTER_SECTION_SUMMARY_TOKENS: int = int(os.getenv("CHAPTER_SECTION_SUMMARY_TOKENS", "300"))
+    CHAPTER_MAP_CONCURRENCY: int = int(os.getenv("CHAPTER_MAP_CONCURRENCY", "4"))
+
+    # Conversation memory settings
+    MEMORY_MAX_TURNS: int = int(os.getenv("MEMORY_MAX_TURNS", "5"))  # exchanges kept per session
+    MEMORY_SESSION_TTL: int = int(os.getenv("MEMORY_SESSION_TTL", "1800"))  # idle seconds before eviction
+    MEMORY_MAX_SESSIONS: int = int(os.getenv("MEMORY_MAX_SESSIONS", "10000"))
 
     # LLM generation settings
     MAX_NEW_TOKENS: int = 1024
@@ -31,15 +89,81 @@ class Settings(BaseModel):
     BASE_DIR: Path = Path(__file__).resolve().parent.parent.parent
     DATA_DIR: Path = BASE_DIR / "data"
     CHROMA_DB_DIR: Path = DATA_DIR / "processed" / "chroma_db"
+    VECTOR_INDEX_DIR: Path = Path(os.getenv("VECTOR_INDEX_DIR", str(DATA_DIR / "processed" / "vector_index")))
+    SUMMARY_STORE_PATH: Path = Path(os.getenv("SUMMARY_STORE_PATH", str(DATA_DIR / "processed" / "summaries.json.gz")))
+    BM25_INDEX_DIR: Path = Path(os.getenv("BM25_INDEX_DIR", str(DATA_DIR / "processed" / "bm25")))
+    CHAPTERS_PATH: Path = Path(os.getenv("CHAPTERS_PATH", str(DATA_DIR / "processed" / "all_chapters.jsonl")))
+    CHAPTER_INDEX_PATH: Path = Path(os.getenv("CHAPTER_INDEX_PATH", str(DATA_DIR / "processed" / "chapter_index.json")))
     MODEL_NAME: str = "mistral-small"
+    MISTRAL_API_URL: str = os.getenv("MISTRAL_API_URL", "https://api.mistral.ai/v1/chat/completions")
+
+    # LLM HTTP client settings
+    LLM_POOL_SIZE: int = int(os.getenv("LLM_POOL_SIZE", "100"))
+    LLM_POOL_KEEPALIVE: int = int(os.getenv("LLM_POOL_KEEPALIVE", "20"))
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    LLM_READ_TIMEOUT: float = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+    LLM_POOL_TIMEOUT: float = float(os.getenv("LLM_POOL_TIMEOUT", "10"))
+    LLM_HTTP2: bool = os.getenv("LLM_HTTP2", "True").lower() == "true"
+
+    # Startup: warm up in the background (serving /ready=503 meanwhile) instead of
+    # delaying the worker's startup until it is warm
+    WARMUP_IN_BACKGROUND: bool = os.getenv("WARMUP_IN_BACKGROUND", "False").lower() == "true"
 
     # Model inference settings
     BATCH_SIZE: int = 1
     INFERENCE_THREADS: int = os.cpu_count() or 4
 
+    # Request handling: blocking work (embedding, search, tokenizing) runs on a
+    # sized thread pool; searches have their own concurrency cap (query
+    # embeddings are already serialized by the micro-batcher). Requests
+    # beyond RAG_MAX_ACTIVE wait in a queue of RAG_MAX_QUEUE; a full queue
+    # answers 429, a wait longer than RAG_QUEUE_TIMEOUT seconds answers 503.
+    RAG_WORKER_THREADS: int = int(os.getenv("RAG_WORKER_THREADS", str(max(4, os.cpu_count() or 1))))
+    SEARCH_CONCURRENCY: int = int(os.getenv("SEARCH_CONCURRENCY", str(max(2, os.cpu_count() or 1))))
+    RAG_MAX_ACTIVE: int = int(os.getenv("RAG_MAX_ACTIVE", "64"))
+    RAG_MAX_QUEUE: int = int(os.getenv("RAG_MAX_QUEUE", "128"))
+    RAG_QUEUE_TIMEOUT: float = float(os.getenv("RAG_QUEUE_TIMEOUT", "10"))
+    RAG_RETRY_AFTER: int = int(os.getenv("RAG_RETRY_AFTER", "2"))  # seconds, sent with 429/503
+    # Identical requests in flight together (same normalized question, mode,
+    # scope and history) share one retrieval and LLM call
+    ENABLE_REQUEST_COALESCING: bool = os.getenv("ENABLE_REQUEST_COALESCING", "True").lower() == "true"
+
+    # Outbound LLM calls, across all requests of a worker: at most
+    # LLM_CONCURRENCY open at once, started at most LLM_RATE_LIMIT_RPS per
+    # second (0 = no cap) in bursts of LLM_RATE_LIMIT_BURST. A 429 from the
+    # provider pauses all calls for its Retry-After and is retried.
+    LLM_CONCURRENCY: int = int(os.getenv("LLM_CONCURRENCY", "32"))
+    LLM_RATE_LIMIT_RPS: float = float(os.getenv("LLM_RATE_LIMIT_RPS", "0"))
+    LLM_RATE_LIMIT_BURST: int = int(os.getenv("LLM_RATE_LIMIT_BURST", "5"))
+    LLM_RATE_LIMIT_RETRIES: int = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "2"))
+    LLM_RATE_LIMIT_BACKOFF: float = float(os.getenv("LLM_RATE_LIMIT_BACKOFF", "1"))  # seconds, without Retry-After
+    LLM_LIMITER_TIMEOUT: float = float(os.getenv("LLM_LIMITER_TIMEOUT", "30"))  # longest wait to start a call
+
+    # Query embedding micro-batching
+    ENABLE_EMBEDDING_BATCHER: bool = os.getenv("ENABLE_EMBEDDING_BATCHER", "True").lower() == "true"
+    EMBEDDING_BATCH_MAX_SIZE: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
+    # Query embedding cache (LRU, bounded in bytes; optional persistence across restarts)
+    ENABLE_EMBEDDING_CACHE: bool = os.getenv("ENABLE_EMBEDDING_CACHE", "True").lower() == "true"
+    EMBEDDING_CACHE_MAX_MB: int = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "32"))
+    EMBEDDING_CACHE_DTYPE: str = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")  # or "float16"
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "")  # e.g. data/processed/query_embeddings.npz
+
     # Performance optimizations
-    RESPONSE_CACHE_SIZE: int = 100
-    RESPONSE_CACHE_TTL: int = 3600  # seconds
+    ENABLE_RESPONSE_CACHE: bool = os.getenv("ENABLE_RESPONSE_CACHE", "True").lower() == "true"
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "100"))
+    RESPONSE_CACHE_TTL: int = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # seconds
+    RESPONSE_CACHE_BACKEND: str = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # "memory" or "redis"
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Semantic cache: reuse answers for paraphrased first-turn questions
+    ENABLE_SEMANTIC_CACHE: bool = os.getenv("ENABLE_SEMANTIC_CACHE", "True").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # cosine similarity
+    SEMANTIC_CACHE_SIZE: int = int(os.getenv("SEMANTIC_CACHE_SIZE", "500"))  # entries per partition
+    # One partition per response mode and book/chapter scope, least recently used dropped first
+    SEMANTIC_CACHE_PARTITIONS: int = int(os.getenv("SEMANTIC_CACHE_PARTITIONS", "32"))
+    SEMANTIC_CACHE_TTL: int = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))  # seconds
 
     # Monitoring
     ENABLE_METRICS: bool = True
@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.config import get_settings
+from app.llm.scope import where_mask
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+INDEX_VERSION = 1
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by did do does for from had has have he her him his how i if in into is it its "
+    "me my no not of on or she so that the their them then there they this to was we were what when where which "
+    "who whom why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens without stopwords; names and spells are kept as-is"""
+    return [token for token in _TOKEN.findall(text.lower()) if len(token) > 1 and token not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over the book chunks, with postings stored as flat arrays.
+
+    Postings for term ``t`` are ``doc_ids[offsets[t]:offsets[t + 1]]`` with
+    their term frequencies in ``tfs``. On disk each array is a ``.npy``
+    file that is memory-mapped on load, so workers share the pages and a
+    query only touches the postings of its own terms.
+    """
+
+    def __init__(self, terms: Dict[str, int], offsets, doc_ids, tfs, doc_lengths, books, chapters, documents):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.books = books
+        self.chapters = chapters
+        self.documents: List[dict] = documents
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+        n_docs = len(doc_lengths)
+        doc_freqs = np.diff(offsets)
+        self.idf = np.log(1 + (n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+    def __len__(self):
+        return len(self.documents)
+
+    @classmethod
+    def build(cls, documents: Sequence[Document]) -> "BM25Index":
+        postings: Dict[str, List[tuple]] = {}
+        doc_lengths = np.zeros(len(documents), dtype=np.int32)
+        for doc_id, doc in enumerate(documents):
+            counts = Counter(tokenize(doc.page_content))
+            doc_lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        terms = {term: term_id for term_id, term in enumerate(sorted(postings))}
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for term, term_id in terms.items():
+            offsets[term_id + 1] = len(postings[term])
+        np.cumsum(offsets, out=offsets)
+
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        for term, term_id in terms.items():
+            entries = np.array(postings[term], dtype=np.int64)
+            doc_ids[offsets[term_id]:offsets[term_id + 1]] = entries[:, 0]
+            tfs[offsets[term_id]:offsets[term_id + 1]] = np.minimum(entries[:, 1], np.iinfo(np.uint16).max)
+
+        books = np.array([doc.metadata.get("book", -1) for doc in documents], dtype=np.int16)
+        chapters = np.array(
+            [doc.metadata["chapter"] if isinstance(doc.metadata.get("chapter"), int) else -1 for doc in documents],
+            dtype=np.int16
+        )
+        stored = [{"text": doc.page_content, "metadata": doc.metadata} for doc in documents]
+        return cls(terms, offsets, doc_ids, tfs, doc_lengths, books, chapters, stored)
+
+    def _column(self, field: str) -> np.ndarray:
+        if field == "book":
+            return self.books
+        if field == "chapter":
+            return self.chapters
+        raise ValueError(f"BM25 index cannot filter on {field!r}")
+
+    def search(self, query: str, k: int, where: Optional[dict] = None) -> List[Document]:
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        k1, b = settings.BM25_K1, settings.BM25_B
+
+        for term in set(tokenize(query)):
+            term_id = self.terms.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            doc_ids = self.doc_ids[start:end]
+            tfs = self.tfs[start:end].astype(np.float32)
+            norm = k1 * (1 - b + b * self.doc_lengths[doc_ids] / self.avg_length)
+            scores[doc_ids] += self.idf[term_id] * tfs * (k1 + 1) / (tfs + norm)
+
+        if where:
+            scores[~where_mask(where, self._column, len(self.documents))] = 0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        return [
+            Document(page_content=self.documents[i]["text"], metadata=dict(self.documents[i]["metadata"]))
+            for i in ranked
+        ]
+
+    def save(self, directory) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in ("offsets", "doc_ids", "tfs", "doc_lengths", "books", "chapters"):
+            np.save(directory / f"{name}.npy", getattr(self, name))
+
+        with open(directory / "documents.json", "w", encoding="utf-8") as f:
+            json.dump(self.documents, f, ensure_ascii=False)
+
+        # Written last: a directory without it is an incomplete build
+        tmp_path = directory / "index.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "terms": self.terms}, f)
+        os.replace(tmp_path, directory / "index.json")
+
+    @classmethod
+    def load(cls, directory, mmap: bool = True) -> "BM25Index":
+        directory = Path(directory)
+        with open(directory / "index.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported BM25 index version: {meta.get('version')}")
+
+        with open(directory / "documents.json", "r", encoding="utf-8") as f:
+            documents = json.load(f)
+
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(directory / f"{name}.npy", mmap_mode=mmap_mode)
+            for name in ("offsets", "doc_ids", "tfs", "doc_lengths", "books", "chapters")
+        }
+        return cls(meta["terms"], documents=documents, **arrays)
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Document]],
+    weights: Sequence[float],
+    k: int,
+    rrf_k: int = 60
+) -> List[Document]:
+    """Fuse ranked lists: each document scores sum(weight / (rrf_k + rank)).
+
+    Documents are matched on their text, since the vector store and the
+    BM25 index identify chunks differently.
+    """
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc in enumerate(ranking, 1):
+            key = doc.page_content
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank)
+            docs.setdefault(key, doc)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in ranked]
+
+
+@lru_cache()
+def get_bm25_index() -> Optional[BM25Index]:
+    """Load the memory-mapped BM25 index, or None if hybrid search is off or it wasn't built"""
+    if not settings.ENABLE_HYBRID_SEARCH:
+        return None
+
+    directory = Path(settings.BM25_INDEX_DIR)
+    if not (directory / "index.json").exists():
+        logger.warning(f"No BM25 index at {directory}; using vector search only")
+        return None
+
+    try:
+        index = BM25Index.load(directory)
+        logger.info(f"Loaded BM25 index over {len(index)} chunks from {directory}")
+        return index
+    except Exception as e:
+        logger.error(f"Could not load BM25 index from {directory}: {e}")
+        return None
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from app.core.config import get_settings
+from app.monitoring.metrics import CACHE_HITS, CACHE_MISSES, CACHE_EVICTIONS, LLM_CALLS_SAVED
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache key"""
+    query = _WHITESPACE.sub(" ", query.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", query)
+
+
+def fingerprint_documents(docs: Sequence[Document]) -> str:
+    """Stable fingerprint of the retrieved context"""
+    digest = hashlib.sha1()
+    for doc in docs:
+        digest.update(doc.metadata.get("source", "").encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class InMemoryCacheBackend:
+    """LRU cache with per-entry TTL, held in the worker process"""
+
+    def __init__(self, max_size: int, ttl: int, on_evict: Optional[Callable[[str], None]] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._evicted("ttl")
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evicted("lru")
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evicted(self, reason: str):
+        if self.on_evict:
+            self.on_evict(reason)
+
+
+class RedisCacheBackend:
+    """Cache stored in Redis, shared by all workers.
+
+    Works with any client exposing the redis-py ``get``/``set``/``delete``/
+    ``scan_iter`` API (e.g. ``fakeredis.FakeRedis`` for local runs). Entries
+    expire via Redis TTLs; size-based eviction is left to the server's
+    ``maxmemory-policy allkeys-lru``.
+    """
+
+    def __init__(self, client, ttl: int, prefix: str = "storybook:cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    """Cache of generated answers and their sources"""
+
+    def __init__(self, backend, name: str = "response"):
+        self.backend = backend
+        self.name = name
+
+    @staticmethod
+    def make_key(kind: str, query: str, response_mode: str, docs: Sequence[Document]) -> str:
+        raw = "\0".join([kind, normalize_query(query), response_mode, fingerprint_documents(docs)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, List[str]]]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never fail the request
+            logger.warning(f"Response cache lookup failed: {e}")
+            value = None
+
+        if value is None:
+            CACHE_MISSES.labels(cache=self.name).inc()
+            return None
+
+        CACHE_HITS.labels(cache=self.name).inc()
+        LLM_CALLS_SAVED.labels(cache=self.name).inc()
+        return value["answer"], value["sources"]
+
+    def set(self, key: str, answer: str, sources: List[str]):
+        try:
+            self.backend.set(key, {"answer": answer, "sources": sources})
+        except Exception as e:
+            logger.warning(f"Response cache store failed: {e}")
+
+    def clear(self):
+        self.backend.clear()
+
+
+@lru_cache()
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get the configured response cache, or None when caching is disabled"""
+    if not settings.ENABLE_RESPONSE_CACHE or settings.RESPONSE_CACHE_SIZE <= 0:
+        return None
+
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        import redis
+
+        logger.info(f"Using Redis response cache at {settings.REDIS_URL}")
+        backend = RedisCacheBackend(redis.Redis.from_url(settings.REDIS_URL), settings.RESPONSE_CACHE_TTL)
+    else:
+        logger.info(f"Using in-process response cache (size={settings.RESPONSE_CACHE_SIZE})")
+        backend = InMemoryCacheBackend(
+            settings.RESPONSE_CACHE_SIZE,
+            settings.RESPONSE_CACHE_TTL,
+            on_evict=lambda reason: CACHE_EVICTIONS.labels(cache="response", reason=reason).inc()
+        )
+
+    return ResponseCache(backend)
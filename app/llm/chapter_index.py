@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+INDEX_VERSION = 1
+
+
+def _key(book: int, chapter: int) -> str:
+    return f"{book}:{chapter}"
+
+
+def merge_chunks(texts: List[str], max_overlap: int) -> str:
+    """Join consecutive chunks of one text, dropping the overlap the splitter added"""
+    merged = ""
+    for text in texts:
+        overlap = 0
+        for size in range(min(max_overlap, len(merged), len(text)), 0, -1):
+            if merged.endswith(text[:size]):
+                overlap = size
+                break
+        if merged and not overlap:
+            merged += "\n"
+        merged += text[overlap:]
+    return merged
+
+
+def has_offsets(doc: Document) -> bool:
+    return "start_index" in doc.metadata and "end_index" in doc.metadata
+
+
+def join_chunks(docs: List[Document], max_overlap: int) -> str:
+    """Join consecutive chunks of one chapter.
+
+    Chunks that carry their offsets into the chapter (start_index /
+    end_index) are stitched exactly; others fall back to merge_chunks.
+    """
+    if not all(has_offsets(doc) for doc in docs):
+        return merge_chunks([doc.page_content for doc in docs], max_overlap)
+
+    merged, end = "", None
+    for doc in docs:
+        start = doc.metadata["start_index"]
+        if end is None:
+            merged = doc.page_content
+        elif start <= end:
+            merged += doc.page_content[end - start:]
+        else:
+            merged += "\n" + doc.page_content
+        end = max(end if end is not None else 0, doc.metadata["end_index"])
+    return merged
+
+
+class ChapterIndex:
+    """Maps (book, chapter) to the ids of its chunks in reading order.
+
+    Chapter summaries fetch their chapter's chunks by id instead of relying
+    on a similarity search to find them.
+    """
+
+    def __init__(self, chapters: Optional[Dict[str, List[str]]] = None):
+        self.chapters: Dict[str, List[str]] = chapters or {}
+
+    def __contains__(self, book_chapter: Tuple[int, int]) -> bool:
+        return _key(*book_chapter) in self.chapters
+
+    def __len__(self):
+        return len(self.chapters)
+
+    def chunk_ids(self, book: int, chapter: int) -> List[str]:
+        return self.chapters.get(_key(book, chapter), [])
+
+    def add(self, book: int, chapter: int, chunk_id: str):
+        self.chapters.setdefault(_key(book, chapter), []).append(chunk_id)
+
+    @classmethod
+    def from_vector_store(cls, vector_store) -> "ChapterIndex":
+        """Build the index from chunk metadata.
+
+        Chunks carry a ``chunk_index`` (their position in the chapter) when
+        they were created by preprocessing/create_embeddings.py; older stores
+        without it fall back to insertion order.
+        """
+        result = vector_store.get(include=["metadatas"])
+        positions: Dict[str, List[Tuple[int, int, str]]] = {}
+        for order, (chunk_id, metadata) in enumerate(zip(result["ids"], result["metadatas"])):
+            if not isinstance(metadata.get("chapter"), int):
+                continue
+            position = metadata.get("chunk_index", order)
+            positions.setdefault(_key(metadata["book"], metadata["chapter"]), []).append((position, order, chunk_id))
+
+        return cls({key: [chunk_id for _, _, chunk_id in sorted(items)] for key, items in positions.items()})
+
+    def save(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "chapters": self.chapters}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path) -> "ChapterIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+
+        if payload.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported chapter index version: {payload.get('version')}")
+        return cls(payload["chapters"])
+
+
+def fetch_chapter(vector_store, index: ChapterIndex, book: int, chapter: int) -> List[Document]:
+    """Fetch a chapter's chunks, in reading order"""
+    ids = index.chunk_ids(book, chapter)
+    if not ids:
+        return []
+
+    # Chroma returns fetched ids in storage order, not the order asked for
+    result = vector_store.get(ids=ids, include=["documents", "metadatas"])
+    by_id = {
+        chunk_id: Document(page_content=text, metadata=metadata)
+        for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+    }
+    return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+
+
+def load_chapter_index(vector_store) -> ChapterIndex:
+    """Load the saved chapter index, or build it from the vector store's metadata"""
+    path = Path(settings.CHAPTER_INDEX_PATH)
+    if path.exists():
+        try:
+            index = ChapterIndex.load(path)
+            logger.info(f"Loaded chapter index for {len(index)} chapters from {path}")
+            return index
+        except Exception as e:
+            logger.warning(f"Could not load chapter index from {path}: {e}")
+
+    index = ChapterIndex.from_vector_store(vector_store)
+    logger.info(f"Built chapter index for {len(index)} chapters from the vector store")
+    return index
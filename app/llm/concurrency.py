@@ -0,0 +1,372 @@
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache, partial
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import get_settings
+from app.monitoring.metrics import (
+    COALESCED_REQUESTS,
+    LLM_CALLS_REJECTED,
+    LLM_CALLS_THROTTLED,
+    LLM_IN_FLIGHT,
+    LLM_LIMITER_WAIT,
+    PIPELINE_ACTIVE,
+    PIPELINE_QUEUED,
+    REQUESTS_SHED,
+    STAGE_IN_FLIGHT,
+    STAGE_QUEUE_WAIT
+)
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@lru_cache()
+def get_executor() -> ThreadPoolExecutor:
+    """Sized thread pool for the pipeline's blocking work (embedding, search, tokenizing)"""
+    logger.info(f"Creating RAG worker pool with {settings.RAG_WORKER_THREADS} threads")
+    return ThreadPoolExecutor(max_workers=settings.RAG_WORKER_THREADS, thread_name_prefix="rag-worker")
+
+
+def shutdown_executor():
+    """Stop the worker pool (called on application shutdown)"""
+    if get_executor.cache_info().currsize:
+        get_executor().shutdown(wait=False, cancel_futures=True)
+        get_executor.cache_clear()
+
+
+async def run_in_worker(fn: Callable, *args, **kwargs):
+    """Like asyncio.to_thread, but on the sized worker pool instead of the default executor"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), partial(context.run, fn, *args, **kwargs))
+
+
+class _LoopSemaphores:
+    """asyncio semaphores by name, recreated when the event loop changes"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def get(self, name: str, value: int) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._semaphores = loop, {}
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            semaphore = self._semaphores[name] = asyncio.Semaphore(value)
+        return semaphore
+
+
+class StageLimiter:
+    """Caps how many requests are in each pipeline stage at once.
+
+    A request over a stage's limit waits for a slot instead of piling more
+    work onto the worker pool; the wait is recorded in
+    STAGE_QUEUE_WAIT. Stages without a limit run unrestricted.
+    """
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = limits
+        self._semaphores = _LoopSemaphores()
+
+    @asynccontextmanager
+    async def limit(self, stage: str):
+        if stage not in self.limits:
+            yield
+            return
+
+        semaphore = self._semaphores.get(stage, self.limits[stage])
+        start = time.perf_counter()
+        async with semaphore:
+            STAGE_QUEUE_WAIT.labels(stage=stage).observe(time.perf_counter() - start)
+            STAGE_IN_FLIGHT.labels(stage=stage).inc()
+            try:
+                yield
+            finally:
+                STAGE_IN_FLIGHT.labels(stage=stage).dec()
+
+    async def run(self, stage: str, fn: Callable, *args, **kwargs):
+        """Run a blocking call on the worker pool within the stage's limit"""
+        async with self.limit(stage):
+            return await run_in_worker(fn, *args, **kwargs)
+
+
+@lru_cache()
+def get_stage_limiter() -> StageLimiter:
+    return StageLimiter({
+        "search": settings.SEARCH_CONCURRENCY
+    })
+
+
+class Overloaded(Exception):
+    """A request shed by the admission queue; ``status_code`` is 429 or 503"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(f"Server overloaded ({reason})")
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionQueue:
+    """Bounds the requests a worker lets into the RAG pipeline.
+
+    Up to ``max_active`` requests run at once and up to ``max_queue`` more
+    wait for a slot. A request finding the queue full is rejected at once
+    with 429; one that waited ``timeout`` seconds without a slot gets 503.
+    Either way the client is told to retry later instead of timing out, and
+    the event loop stays free for /health and /metrics.
+    """
+
+    def __init__(self, max_active: int, max_queue: int, timeout: float, retry_after: int):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._semaphores = _LoopSemaphores()
+        self._waiting = 0
+
+    def _shed(self, status_code: int, reason: str) -> Overloaded:
+        REQUESTS_SHED.labels(reason=reason).inc()
+        logger.warning(f"Shedding request: {reason} ({self._waiting} queued)")
+        return Overloaded(status_code, reason, self.retry_after)
+
+    async def acquire(self) -> Callable[[], None]:
+        """Wait for a pipeline slot; returns the function releasing it (safe to call twice)"""
+        semaphore = self._semaphores.get("admission", self.max_active)
+        if semaphore.locked():
+            if self._waiting >= self.max_queue:
+                raise self._shed(429, "queue_full")
+
+            self._waiting += 1
+            PIPELINE_QUEUED.inc()
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise self._shed(503, "queue_timeout") from None
+            finally:
+                self._waiting -= 1
+                PIPELINE_QUEUED.dec()
+            STAGE_QUEUE_WAIT.labels(stage="admission").observe(time.perf_counter() - start)
+        else:
+            await semaphore.acquire()
+
+        PIPELINE_ACTIVE.inc()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                PIPELINE_ACTIVE.dec()
+                semaphore.release()
+
+        return release
+
+
+@lru_cache()
+def get_admission_queue() -> AdmissionQueue:
+    return AdmissionQueue(
+        max_active=settings.RAG_MAX_ACTIVE,
+        max_queue=settings.RAG_MAX_QUEUE,
+        timeout=settings.RAG_QUEUE_TIMEOUT,
+        retry_after=settings.RAG_RETRY_AFTER
+    )
+
+
+class LLMLimiter:
+    """Global gate for outbound LLM requests.
+
+    At most ``max_concurrent`` requests (streams included) are open at once,
+    and with a ``rate`` they start no faster than that many per second, in
+    bursts of up to ``burst``. When the provider answers 429, no request
+    starts until its Retry-After (or ``backoff`` seconds) has passed, and the
+    throttled call is retried up to ``max_retries`` times. A call that cannot
+    start within ``timeout`` seconds is rejected with Overloaded (503).
+    """
+
+    def __init__(self, max_concurrent: int, rate: float, burst: int, timeout: float, max_retries: int,
+                 backoff: float, retry_after: int):
+        self.max_concurrent = max_concurrent
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.burst = max(1, burst)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.retry_after = retry_after
+        self._semaphores = _LoopSemaphores()
+        # Theoretical arrival time of the next request (GCRA token bucket)
+        self._next_start = 0.0
+        self._paused_until = 0.0
+
+    def _reject(self, reason: str) -> Overloaded:
+        LLM_CALLS_REJECTED.labels(reason=reason).inc()
+        logger.warning(f"Rejecting LLM call: {reason}")
+        return Overloaded(503, f"llm_{reason}", self.retry_after)
+
+    def _reserve_start(self, now: float, deadline: float) -> float:
+        """Earliest start time allowed by the rate and any provider pause; reserves it"""
+        start = max(now, self._paused_until)
+        if self.interval:
+            start = max(start, self._next_start - (self.burst - 1) * self.interval)
+        if start > deadline:
+            raise self._reject("timeout")
+        if self.interval:
+            self._next_start = max(self._next_start, start) + self.interval
+        return start
+
+    @asynccontextmanager
+    async def slot(self):
+        loop = asyncio.get_running_loop()
+        begin = loop.time()
+        deadline = begin + self.timeout
+        semaphore = self._semaphores.get("llm", self.max_concurrent)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._reject("timeout") from None
+
+        try:
+            now = loop.time()
+            delay = self._reserve_start(now, deadline) - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+            LLM_LIMITER_WAIT.observe(loop.time() - begin)
+            LLM_IN_FLIGHT.inc()
+            try:
+                yield
+            finally:
+                LLM_IN_FLIGHT.dec()
+        finally:
+            semaphore.release()
+
+    def throttled(self, retry_after: Optional[float], attempt: int):
+        """Record a 429 from the provider and pause new calls; raises Overloaded once out of retries"""
+        LLM_CALLS_THROTTLED.inc()
+        pause = retry_after if retry_after is not None else self.backoff * 2 ** attempt
+        self._paused_until = max(self._paused_until, asyncio.get_running_loop().time() + pause)
+        logger.warning(f"LLM provider is rate limiting; pausing calls for {pause:.1f}s")
+        if attempt >= self.max_retries:
+            raise self._reject("provider_429")
+
+
+@lru_cache()
+def get_llm_limiter() -> LLMLimiter:
+    return LLMLimiter(
+        max_concurrent=settings.LLM_CONCURRENCY,
+        rate=settings.LLM_RATE_LIMIT_RPS,
+        burst=settings.LLM_RATE_LIMIT_BURST,
+        timeout=settings.LLM_LIMITER_TIMEOUT,
+        max_retries=settings.LLM_RATE_LIMIT_RETRIES,
+        backoff=settings.LLM_RATE_LIMIT_BACKOFF,
+        retry_after=settings.RAG_RETRY_AFTER
+    )
+
+
+class _Broadcast:
+    """Chunks of one streamed computation, replayed to every subscriber"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.producer: Optional[asyncio.Future] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: str):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def close(self, error: Optional[BaseException] = None):
+        self.done, self.error = True, error
+        self._notify()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        i = 0
+        while True:
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.done:
+                if self.error:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class SingleFlight:
+    """Shares one computation among identical requests that are in flight together.
+
+    The first request for a key starts the computation as its own task;
+    requests arriving with the same key before it finishes wait for that
+    task instead of repeating the retrieval and LLM call. Streams are fanned
+    out: a subscriber joining late first gets the chunks produced so far.
+    The computation runs to completion (and fills the caches) even if every
+    waiting client goes away.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._calls, self._streams = loop, {}, {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls or key in self._streams
+
+    def _finished(self, key: str, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieve the outcome so failures nobody waited for aren't reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, kind: str, factory: Callable[[], Awaitable]):
+        self._check_loop()
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(factory())
+            task.add_done_callback(partial(self._finished, key))
+        else:
+            COALESCED_REQUESTS.labels(kind=kind).inc()
+        return await asyncio.shield(task)
+
+    async def _produce(self, key: str, broadcast: _Broadcast, stream: AsyncIterator[str]):
+        try:
+            async for chunk in stream:
+                broadcast.publish(chunk)
+        except BaseException as e:
+            # Subscribers see the failure (or the cancellation) instead of waiting forever
+            broadcast.close(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            broadcast.close()
+        finally:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+
+    def stream(self, key: str, kind: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        self._check_loop()
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = self._streams[key] = _Broadcast()
+            broadcast.producer = asyncio.ensure_future(self._produce(key, broadcast, factory()))
+        else:
+            COALESCED_REQUESTS.labels(kind=kind).inc()
+        return broadcast.subscribe()
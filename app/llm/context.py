@@ -0,0 +1,228 @@
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from app.core.config import get_settings
+from app.llm.chapter_index import merge_chunks
+from app.monitoring.metrics import CONTEXT_TOKENS_SAVED
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Shortest shared text that counts as the splitter's overlap between two chunks
+_MIN_OVERLAP = 20
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"[.!?][\"'”’)]?\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting prompts (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+class TokenCounter:
+    """Counts and cuts text in LLM tokens, estimating when no tokenizer is available"""
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer
+
+    def count(self, text: str) -> int:
+        if self.tokenizer is None:
+            return estimate_tokens(text)
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens, preferably at the end of a sentence"""
+        if self.tokenizer is None:
+            end = max_tokens * 4
+        else:
+            encoding = self.tokenizer.encode(text, add_special_tokens=False)
+            if len(encoding.ids) <= max_tokens:
+                return text
+            end = encoding.offsets[max_tokens - 1][1]
+
+        if end >= len(text):
+            return text
+
+        cut = text[:end]
+        sentence_ends = [match.end() for match in _SENTENCE_END.finditer(cut)]
+        if sentence_ends and sentence_ends[-1] >= len(cut) // 2:
+            cut = cut[:sentence_ends[-1]]
+        return cut.rstrip()
+
+
+@lru_cache()
+def get_token_counter() -> TokenCounter:
+    """Token counter using the LLM's tokenizer: a local tokenizer.json (or its
+    directory), or a hub repo downloaded once"""
+    name = settings.CONTEXT_TOKENIZER
+    try:
+        from tokenizers import Tokenizer
+
+        path = os.path.join(name, "tokenizer.json") if os.path.isdir(name) else name
+        if os.path.isfile(path):
+            tokenizer = Tokenizer.from_file(path)
+        else:
+            tokenizer = Tokenizer.from_pretrained(name, token=os.getenv("HF_TOKEN"))
+        logger.info(f"Loaded tokenizer {name} for context budgeting")
+        return TokenCounter(tokenizer)
+    except Exception as e:
+        logger.warning(
+            f"Could not load tokenizer {name} ({e}); falling back to ~4 characters per token, "
+            f"so context budgets are approximate. Set CONTEXT_TOKENIZER to a local tokenizer.json "
+            f"or a hub repo that HF_TOKEN can read"
+        )
+        return TokenCounter()
+
+
+class _Passage:
+    """One or more retrieved chunks that are contiguous in the book"""
+
+    def __init__(self, doc: Document, rank: int):
+        self.text = doc.page_content
+        self.docs = [doc]
+        self.rank = rank
+        self.book = doc.metadata.get("book")
+        self.chapter = doc.metadata.get("chapter")
+        self.first = self.last = doc.metadata.get("chunk_index")
+        # Character offsets into the chapter, for chunks stored with them
+        self.start = doc.metadata.get("start_index")
+        self.end = doc.metadata.get("end_index")
+
+    def _precedes(self, other: "_Passage") -> bool:
+        """Whether ``other`` continues right where this passage ends"""
+        if self.last is not None and other.first is not None:
+            return other.first == self.last + 1
+        return _overlap(self.text, other.text) >= _MIN_OVERLAP
+
+    def _join_offsets(self, other: "_Passage") -> bool:
+        """Stitch ``other`` in by its offsets, if the two overlap or are consecutive chunks"""
+        consecutive = None not in (self.first, other.first) and (
+            other.first == self.last + 1 or self.first == other.last + 1
+        )
+        if (other.start > self.end or other.end < self.start) and not consecutive:
+            return False
+
+        # Consecutive chunks without overlap are apart by the whitespace trimmed off them
+        if other.start < self.start:
+            head = other.text[:self.start - other.start] if other.end >= self.start else other.text + " "
+            self.text = head + self.text
+            self.start = other.start
+        if other.end > self.end:
+            tail = other.text[self.end - other.start:] if other.start <= self.end else " " + other.text
+            self.text += tail
+            self.end = other.end
+        if None not in (self.first, other.first):
+            self.first, self.last = min(self.first, other.first), max(self.last, other.last)
+        return True
+
+    def join(self, other: "_Passage") -> bool:
+        """Absorb ``other`` if it is adjacent to (or inside) this passage"""
+        if (self.book, self.chapter) != (other.book, other.chapter):
+            return False
+
+        if None not in (self.start, self.end, other.start, other.end):
+            if not self._join_offsets(other):
+                return False
+        elif self.first is not None and other.first is not None and self.first <= other.first and other.last <= self.last:
+            pass
+        elif other.text in self.text:
+            pass
+        elif self._precedes(other):
+            self.text = merge_chunks([self.text, other.text], settings.CHUNK_OVERLAP)
+            self.last = other.last
+        elif other._precedes(self):
+            self.text = merge_chunks([other.text, self.text], settings.CHUNK_OVERLAP)
+            self.first = other.first
+        else:
+            return False
+
+        self.docs.extend(other.docs)
+        self.rank = min(self.rank, other.rank)
+        return True
+
+
+def _overlap(first: str, second: str) -> int:
+    """Length of the longest suffix of ``first`` that starts ``second``"""
+    for size in range(min(settings.CHUNK_OVERLAP, len(first), len(second)), 0, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def _shingles(text: str) -> set:
+    words = _WORD.findall(text.lower())
+    return {tuple(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+
+def _merge_adjacent(docs: Sequence[Document]) -> List[_Passage]:
+    passages: List[_Passage] = []
+    for rank, doc in enumerate(docs):
+        passage = _Passage(doc, rank)
+        # A chunk can bridge two passages, so keep joining until nothing changes
+        merged = True
+        while merged:
+            merged = False
+            for other in passages:
+                if other.join(passage):
+                    passages.remove(other)
+                    passage = other
+                    merged = True
+                    break
+        passages.append(passage)
+    return sorted(passages, key=lambda passage: passage.rank)
+
+
+def _drop_near_duplicates(passages: List[_Passage], threshold: float) -> List[_Passage]:
+    kept: List[Tuple[_Passage, set]] = []
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        if any(len(shingles & seen) >= threshold * len(shingles) for _, seen in kept):
+            continue
+        kept.append((passage, shingles))
+    return [passage for passage, _ in kept]
+
+
+def assemble_context(
+    docs: Sequence[Document],
+    max_tokens: Optional[int] = None,
+    counter: Optional[TokenCounter] = None
+) -> Tuple[str, List[Document]]:
+    """Turn retrieved chunks into the prompt context.
+
+    Overlapping or adjacent chunks of the same chapter are stitched into one
+    passage, passages that mostly repeat a better-ranked one are dropped, and
+    the rest are added in relevance order until the token budget is spent
+    (the last one cut at a sentence boundary). Returns the context and the
+    documents that made it in.
+    """
+    if not docs:
+        return "", []
+
+    counter = counter or get_token_counter()
+    max_tokens = max_tokens or settings.CONTEXT_MAX_TOKENS
+
+    passages = _drop_near_duplicates(_merge_adjacent(docs), settings.CONTEXT_DUPLICATE_THRESHOLD)
+
+    parts: List[str] = []
+    used: List[Document] = []
+    remaining = max_tokens
+    for passage in passages:
+        tokens = counter.count(passage.text)
+        if tokens > remaining:
+            if remaining >= settings.CONTEXT_MIN_PASSAGE_TOKENS:
+                parts.append(counter.truncate(passage.text, remaining))
+                used.extend(passage.docs)
+            break
+        parts.append(passage.text)
+        used.extend(passage.docs)
+        remaining -= tokens
+
+    context = "\n\n".join(parts)
+    saved = counter.count("\n\n".join(doc.page_content for doc in docs)) - counter.count(context)
+    CONTEXT_TOKENS_SAVED.observe(max(saved, 0))
+    return context, used
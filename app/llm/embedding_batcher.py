@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+from app.core.config import get_settings
+from app.llm.concurrency import run_in_worker
+from app.llm.embedding_cache import CachedEmbeddings
+from app.llm.embeddings import get_embeddings_model
+from app.monitoring.metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WAIT
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent query embeddings into one batched encode.
+
+    Callers await ``aembed_query`` as with a LangChain embeddings object. A
+    single background task collects requests for up to ``max_wait`` seconds
+    (or until ``max_batch_size`` are waiting), runs one ``embed_documents``
+    call on a worker thread and hands each vector back to its caller. Only
+    one batch runs at a time, so requests arriving meanwhile form the next
+    batch instead of contending for CPU threads.
+    """
+
+    def __init__(self, embeddings, max_batch_size: int = 32, max_wait: float = 0.005):
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def aembed_query(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._start(loop)
+
+        future = loop.create_future()
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        return await future
+
+    def embed_query(self, text: str) -> List[float]:
+        # Synchronous callers (warm-up, scripts) bypass the batcher
+        return self.embeddings.embed_query(text)
+
+    async def aclose(self):
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+    def _start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._worker = loop.create_task(self._run())
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Whatever queued up while we waited rides along for free
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            # Callers that gave up (cancelled requests) don't need a vector
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            now = time.perf_counter()
+            EMBEDDING_BATCH_SIZE.observe(len(batch))
+            for _, _, enqueued_at in batch:
+                EMBEDDING_BATCH_WAIT.observe(now - enqueued_at)
+
+            try:
+                vectors = await run_in_worker(self.embeddings.embed_documents, [text for text, _, _ in batch])
+            except Exception as e:
+                logger.error(f"Batched embedding failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+
+@lru_cache()
+def get_embedding_batcher() -> EmbeddingBatcher:
+    return EmbeddingBatcher(
+        get_embeddings_model(),
+        max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+        max_wait=settings.EMBEDDING_BATCH_MAX_WAIT_MS / 1000
+    )
+
+
+async def close_embedding_batcher():
+    """Stop the batcher's background task (called on application shutdown)"""
+    if get_embedding_batcher.cache_info().currsize:
+        await get_embedding_batcher().aclose()
+
+
+@lru_cache()
+def get_query_embedder():
+    """Object used to embed incoming queries.
+
+    The query embedding cache (if enabled) sits in front of the batcher (or
+    the model itself), so repeated texts never wait for a batch window.
+    """
+    embedder = get_embedding_batcher() if settings.ENABLE_EMBEDDING_BATCHER else get_embeddings_model()
+    if not settings.ENABLE_EMBEDDING_CACHE:
+        return embedder
+
+    cache = CachedEmbeddings(
+        embedder,
+        max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+        dtype=settings.EMBEDDING_CACHE_DTYPE
+    )
+    if settings.EMBEDDING_CACHE_PATH:
+        cache.load(settings.EMBEDDING_CACHE_PATH)
+    return cache
+
+
+def save_query_embedding_cache():
+    """Persist the query embedding cache, if configured (called on shutdown)"""
+    if not settings.EMBEDDING_CACHE_PATH or not get_query_embedder.cache_info().currsize:
+        return
+
+    embedder = get_query_embedder()
+    if isinstance(embedder, CachedEmbeddings):
+        embedder.save(settings.EMBEDDING_CACHE_PATH)
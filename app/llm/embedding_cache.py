@@ -0,0 +1,154 @@
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.monitoring.metrics import CACHE_HITS, CACHE_MISSES, CACHE_EVICTIONS
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Rough per-entry bookkeeping cost (ndarray header, dict slot, key object)
+_ENTRY_OVERHEAD = 200
+
+
+def normalize_text(text: str) -> str:
+    """Cache key for a text; MiniLM is uncased and ignores runs of whitespace"""
+    return _WHITESPACE.sub(" ", text.strip().lower())
+
+
+class CachedEmbeddings(Embeddings):
+    """LRU cache of query embeddings in front of another embeddings object.
+
+    Vectors are kept as compact float32 (or float16) arrays and the cache is
+    bounded by its approximate size in bytes. The contents can be saved to
+    and reloaded from an ``.npz`` file so restarts begin warm.
+    """
+
+    def __init__(self, embeddings, max_bytes: int, dtype: str = "float32", name: str = "embedding"):
+        self.embeddings = embeddings
+        self.name = name
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _entry_size(self, key: str, vector: np.ndarray) -> int:
+        return vector.nbytes + len(key) + _ENTRY_OVERHEAD
+
+    def _get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+
+        if vector is None:
+            CACHE_MISSES.labels(cache=self.name).inc()
+        else:
+            CACHE_HITS.labels(cache=self.name).inc()
+        return vector
+
+    def _put(self, key: str, vector) -> None:
+        vector = np.asarray(vector, dtype=self.dtype)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= self._entry_size(key, previous)
+
+            self._entries[key] = vector
+            self._bytes += self._entry_size(key, vector)
+
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_vector = self._entries.popitem(last=False)
+                self._bytes -= self._entry_size(old_key, old_vector)
+                CACHE_EVICTIONS.labels(cache=self.name, reason="size").inc()
+
+    @staticmethod
+    def _to_list(vector: np.ndarray) -> List[float]:
+        return vector.astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_text(text)
+        vector = self._get(key)
+        if vector is not None:
+            return self._to_list(vector)
+
+        result = self.embeddings.embed_query(text)
+        self._put(key, result)
+        return result
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = normalize_text(text)
+        vector = self._get(key)
+        if vector is not None:
+            return self._to_list(vector)
+
+        result = await self.embeddings.aembed_query(text)
+        self._put(key, result)
+        return result
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [normalize_text(text) for text in texts]
+        cached = [self._get(key) for key in keys]
+
+        # Only the misses go to the model, in a single batch
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                self._put(keys[i], vector)
+                cached[i] = np.asarray(vector)
+
+        return [self._to_list(np.asarray(vector)) for vector in cached]
+
+    def add(self, text: str, vector) -> None:
+        """Insert a vector computed elsewhere (e.g. read back from the vector store)"""
+        self._put(normalize_text(text), vector)
+
+    def __contains__(self, text: str) -> bool:
+        return normalize_text(text) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def save(self, path) -> None:
+        """Write the cache to an .npz file, least recently used first"""
+        with self._lock:
+            keys = list(self._entries.keys())
+            vectors = list(self._entries.values())
+
+        if not keys:
+            return
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, keys=np.array(keys), vectors=np.stack(vectors))
+        os.replace(tmp_path, path)
+        logger.info(f"Saved {len(keys)} cached query embeddings to {path}")
+
+    def load(self, path) -> None:
+        path = Path(path)
+        if not path.exists():
+            return
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                for key, vector in zip(data["keys"], data["vectors"]):
+                    self._put(str(key), vector)
+            logger.info(f"Loaded {len(self)} cached query embeddings from {path}")
+        except Exception as e:
+            logger.warning(f"Could not load query embedding cache from {path}: {e}")
@@ -1,11 +1,17 @@
+import gc
 import os
 import logging
 from pathlib import Path
 from functools import lru_cache
 from langchain_huggingface import HuggingFaceEmbeddings
-# Updated import for Chroma
-from langchain_chroma import Chroma
 from app.core.config import get_settings
+from app.llm.vector_store import (
+    QUANTIZATIONS,
+    ChromaVectorStore,
+    FlatVectorStore,
+    HNSWVectorStore,
+    QuantizedVectorStore
+)
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -19,14 +25,63 @@ def get_embeddings_model():
         encode_kwargs={'normalize_embeddings': True}
     )
 
+def preload_for_fork():
+    """Load read-only model weights in the gunicorn master before workers fork.
+
+    Workers inherit the loaded model and share its pages copy-on-write. No
+    inference runs here: torch's OpenMP pool must not exist before fork(), so
+    each worker warms the model itself after forking.
+    """
+    # HF tokenizers' Rust thread pool is not fork-safe either
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    get_embeddings_model()
+
+    # Move everything loaded so far out of the GC's reach; otherwise the first
+    # collection in each worker touches (and so copies) every object header
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded embeddings model in the master process")
+
+
+def configure_worker_threads(workers: int):
+    """Split the inference threads between forked workers"""
+    import torch
+
+    threads = max(1, settings.INFERENCE_THREADS // max(1, workers))
+    torch.set_num_threads(threads)
+    logger.info(f"Worker {os.getpid()} using {threads} torch threads")
+
+
+@lru_cache()
 def get_vector_store():
+    """Open the vector store selected by VECTOR_STORE_BACKEND.
+
+    "auto" uses the in-process flat index when it has been exported
+    (preprocessing/export_vector_store.py) and Chroma otherwise.
+    """
     embeddings = get_embeddings_model()
+    backend = settings.VECTOR_STORE_BACKEND
+    if backend == "auto":
+        backend = "flat" if (settings.VECTOR_INDEX_DIR / "metadata.json").exists() else "chroma"
+
+    if backend == "flat":
+        logger.info(f"Loading flat vector index from {settings.VECTOR_INDEX_DIR}")
+        return FlatVectorStore(settings.VECTOR_INDEX_DIR, embeddings)
+    if backend == "hnsw":
+        logger.info(f"Loading HNSW vector index from {settings.VECTOR_INDEX_DIR}")
+        return HNSWVectorStore(settings.VECTOR_INDEX_DIR, embeddings, ef_search=settings.HNSW_EF_SEARCH)
+    if backend in QUANTIZATIONS:
+        logger.info(f"Loading {backend}-quantized vector index from {settings.VECTOR_INDEX_DIR}")
+        return QuantizedVectorStore(
+            settings.VECTOR_INDEX_DIR,
+            embeddings,
+            quantization=backend,
+            rescore_multiplier=settings.VECTOR_RESCORE_MULTIPLIER
+        )
+
     if os.path.exists(settings.CHROMA_DB_DIR):
         logger.info(f"Loading existing vector store from {settings.CHROMA_DB_DIR}")
-        return Chroma(
-            persist_directory=str(settings.CHROMA_DB_DIR),
-            embedding_function=embeddings
-        )
+        return ChromaVectorStore(settings.CHROMA_DB_DIR, embeddings)
     else:
         logger.error(f"Vector store not found at {settings.CHROMA_DB_DIR}")
         raise FileNotFoundError(
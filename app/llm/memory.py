@@ -0,0 +1,122 @@
+import heapq
+import logging
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Dict, List, Sequence, Tuple
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+ChatHistory = List[Tuple[str, str]]
+
+
+class _Session:
+    __slots__ = ("turns", "last_access")
+
+    def __init__(self, max_turns: int):
+        self.turns: Deque[Tuple[str, str]] = deque(maxlen=max_turns)
+        self.last_access = time.monotonic()
+
+
+class SessionMemoryStore:
+    """Conversation histories keyed by session id.
+
+    Each session keeps its last ``max_turns`` (question, answer) pairs. Idle
+    sessions expire after ``idle_ttl`` seconds and the oldest sessions are
+    dropped once more than ``max_sessions`` are held.
+
+    The store takes no locks: it only uses dict and bounded-deque operations
+    that are atomic under the GIL, so concurrent requests never block each
+    other. The worst a race can do is drop a turn of a session that is being
+    evicted at that moment.
+    """
+
+    def __init__(self, max_turns: int, idle_ttl: float, max_sessions: int, sweep_interval: float = 60.0):
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self._sessions: Dict[str, _Session] = {}
+        self._last_sweep = time.monotonic()
+
+    def get_history(self, session_id: str) -> ChatHistory:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return []
+
+        if time.monotonic() - session.last_access > self.idle_ttl:
+            self._sessions.pop(session_id, None)
+            return []
+
+        session.last_access = time.monotonic()
+        return list(session.turns)
+
+    def append(self, session_id: str, question: str, answer: str):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions.setdefault(session_id, _Session(self.max_turns))
+
+        session.turns.append((question, answer))
+        session.last_access = time.monotonic()
+
+        if len(self._sessions) > self.max_sessions or time.monotonic() - self._last_sweep > self.sweep_interval:
+            self._evict()
+
+    def clear(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self):
+        now = time.monotonic()
+        self._last_sweep = now
+        sessions = list(self._sessions.items())
+
+        expired = {sid for sid, session in sessions if now - session.last_access > self.idle_ttl}
+        for sid in expired:
+            self._sessions.pop(sid, None)
+
+        overflow = len(self._sessions) - self.max_sessions
+        if overflow > 0:
+            # Drop a little extra so a full store doesn't evict on every append
+            overflow += self.max_sessions // 10
+            live = [item for item in sessions if item[0] not in expired]
+            for sid, _ in heapq.nsmallest(overflow, live, key=lambda item: item[1].last_access):
+                self._sessions.pop(sid, None)
+
+        if expired or overflow > 0:
+            logger.info(f"Evicted {len(expired)} idle and {max(overflow, 0)} excess chat sessions")
+
+
+def history_from_messages(messages: Sequence, max_turns: int) -> ChatHistory:
+    """Build (question, answer) pairs from the messages a client sends back"""
+    history = []
+    pending_question = None
+    for message in messages:
+        if message.role == "user":
+            pending_question = message.content
+        elif pending_question is not None:
+            history.append((pending_question, message.content))
+            pending_question = None
+    return history[-max_turns:] if max_turns else []
+
+
+def format_chat_history(chat_history: ChatHistory) -> str:
+    """Render history the way ConversationalRetrievalChain does"""
+    buffer = ""
+    for question, answer in chat_history:
+        buffer += f"\nHuman: {question}\nAssistant: {answer}"
+    return buffer
+
+
+@lru_cache()
+def get_session_memory() -> SessionMemoryStore:
+    return SessionMemoryStore(
+        max_turns=settings.MEMORY_MAX_TURNS,
+        idle_ttl=settings.MEMORY_SESSION_TTL,
+        max_sessions=settings.MEMORY_MAX_SESSIONS
+    )
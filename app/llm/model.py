@@ -1,31 +1,126 @@
+import itertools
+import json
 import logging
 from functools import lru_cache
 import os
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from langchain.llms.base import LLM
-from typing import Any, List, Mapping, Optional
+from langchain_core.outputs import GenerationChunk
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, List, Mapping, Optional
 from app.core.config import get_settings
+from app.llm.concurrency import get_llm_limiter
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+_SSE_DONE = object()
+
+
+def _parse_sse_line(line: str):
+    """Return the content delta of one SSE line, _SSE_DONE at the end, or None."""
+    if not line or not line.startswith("data:"):
+        return None
+
+    payload = line[len("data:"):].strip()
+    if payload == "[DONE]":
+        return _SSE_DONE
+
+    event = json.loads(payload)
+    choices = event.get("choices") or []
+    if not choices:
+        return None
+
+    return choices[0].get("delta", {}).get("content") or None
+
+
+def iter_sse_deltas(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the content deltas from a chat-completions SSE stream."""
+    for line in lines:
+        delta = _parse_sse_line(line)
+        if delta is _SSE_DONE:
+            break
+        if delta:
+            yield delta
+
+
+async def aiter_sse_deltas(lines: AsyncIterable[str]) -> AsyncIterator[str]:
+    """Async counterpart of iter_sse_deltas."""
+    async for line in lines:
+        delta = _parse_sse_line(line)
+        if delta is _SSE_DONE:
+            break
+        if delta:
+            yield delta
+
+
+def retry_after_seconds(response) -> Optional[float]:
+    """Seconds from a numeric Retry-After header, or None"""
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "")))
+    except ValueError:
+        return None
+
+
+@lru_cache()
+def get_http_session() -> requests.Session:
+    """Shared keep-alive session for the synchronous code paths"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.LLM_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@lru_cache()
+def get_async_http_client() -> httpx.AsyncClient:
+    """Shared, connection-pooled async client for the LLM backend"""
+    logger.info(
+        f"Creating async LLM HTTP client (pool={settings.LLM_POOL_SIZE}, http2={settings.LLM_HTTP2})"
+    )
+    return httpx.AsyncClient(
+        http2=settings.LLM_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.LLM_POOL_SIZE,
+            max_keepalive_connections=settings.LLM_POOL_KEEPALIVE
+        ),
+        timeout=httpx.Timeout(
+            settings.LLM_READ_TIMEOUT,
+            connect=settings.LLM_CONNECT_TIMEOUT,
+            pool=settings.LLM_POOL_TIMEOUT
+        )
+    )
+
+
+async def close_http_clients():
+    """Close the shared HTTP clients (called on application shutdown)"""
+    if get_async_http_client.cache_info().currsize:
+        await get_async_http_client().aclose()
+        get_async_http_client.cache_clear()
+    if get_http_session.cache_info().currsize:
+        get_http_session().close()
+        get_http_session.cache_clear()
+
 
 class MistralLLM(LLM):
     api_key: str
     model_name: str = "mistral-small"
     temperature: float = 0.7
     max_tokens: int = 500
+    api_url: str = "https://api.mistral.ai/v1/chat/completions"
 
     @property
     def _llm_type(self) -> str:
         return "mistral"
 
-    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
-        headers = {
+    def _headers(self) -> dict:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
 
+    def _payload(self, prompt: str, stop: Optional[List[str]] = None, stream: bool = False) -> dict:
         # Fix the payload structure for chat completions
         data = {
             "model": self.model_name,
@@ -38,11 +133,22 @@ class MistralLLM(LLM):
         if stop:
             data["stop"] = stop
 
+        if stream:
+            data["stream"] = True
+
+        return data
+
+    @staticmethod
+    def _timeout():
+        return (settings.LLM_CONNECT_TIMEOUT, settings.LLM_READ_TIMEOUT)
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
         try:
-            response = requests.post(
-                "https://api.mistral.ai/v1/chat/completions",
-                headers=headers,
-                json=data
+            response = get_http_session().post(
+                self.api_url,
+                headers=self._headers(),
+                json=self._payload(prompt, stop),
+                timeout=self._timeout()
             )
             response.raise_for_status()
             # Extract the content from response format
@@ -51,6 +157,76 @@ class MistralLLM(LLM):
             logger.error(f"Error calling Mistral API: {e}")
             raise
 
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        # Async calls pass the worker-wide limiter, which also retries provider 429s
+        limiter = get_llm_limiter()
+        try:
+            for attempt in itertools.count():
+                async with limiter.slot():
+                    response = await get_async_http_client().post(
+                        self.api_url,
+                        headers=self._headers(),
+                        json=self._payload(prompt, stop)
+                    )
+                if response.status_code != 429:
+                    break
+                limiter.throttled(retry_after_seconds(response), attempt)
+
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"]
+        except Exception as e:
+            logger.error(f"Error calling Mistral API: {e}")
+            raise
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        try:
+            with get_http_session().post(
+                self.api_url,
+                headers=self._headers(),
+                json=self._payload(prompt, stop, stream=True),
+                timeout=self._timeout(),
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                # SSE is always UTF-8; requests would otherwise guess latin-1 for text/event-stream
+                response.encoding = "utf-8"
+
+                for delta in iter_sse_deltas(response.iter_lines(decode_unicode=True)):
+                    chunk = GenerationChunk(text=delta)
+                    if run_manager:
+                        run_manager.on_llm_new_token(delta, chunk=chunk)
+                    yield chunk
+        except Exception as e:
+            logger.error(f"Error streaming from Mistral API: {e}")
+            raise
+
+    async def _astream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        limiter = get_llm_limiter()
+        try:
+            for attempt in itertools.count():
+                # The limiter slot is held for the whole stream
+                async with limiter.slot(), get_async_http_client().stream(
+                    "POST",
+                    self.api_url,
+                    headers=self._headers(),
+                    json=self._payload(prompt, stop, stream=True)
+                ) as response:
+                    if response.status_code == 429:
+                        # Nothing was streamed yet, so the call can be retried
+                        limiter.throttled(retry_after_seconds(response), attempt)
+                        continue
+                    response.raise_for_status()
+
+                    async for delta in aiter_sse_deltas(response.aiter_lines()):
+                        chunk = GenerationChunk(text=delta)
+                        if run_manager:
+                            await run_manager.on_llm_new_token(delta, chunk=chunk)
+                        yield chunk
+                    return
+        except Exception as e:
+            logger.error(f"Error streaming from Mistral API: {e}")
+            raise
+
     @property
     def _identifying_params(self) -> Mapping[str, Any]:
         return {
@@ -72,5 +248,6 @@ def get_llm_model():
         api_key=api_key,
         model_name=settings.MODEL_NAME,
         temperature=settings.TEMPERATURE,
-        max_tokens=settings.MAX_NEW_TOKENS
-    )
\ No newline at end of file
+        max_tokens=settings.MAX_NEW_TOKENS,
+        api_url=settings.MISTRAL_API_URL
+    )
@@ -1,6 +1,14 @@
 from typing import List, Dict, Any
 from langchain.prompts import PromptTemplate
 
+RESPONSE_MODES = ("freeform", "structured")
+
+
+def normalize_response_mode(response_mode: str) -> str:
+    """Map a requested mode onto one of RESPONSE_MODES (anything else is freeform)"""
+    return "structured" if response_mode.lower() == "structured" else "freeform"
+
+
 def get_system_prompt(response_mode: str) -> str:
     """Get the system prompt based on the response mode."""
     base_prompt = """
@@ -109,4 +117,33 @@ Assistant:"""
     return PromptTemplate(
         input_variables=["system_prompt", "context", "summary_type", "summary_target"],
         template=template
-    )
\ No newline at end of file
+    )
+
+def get_section_summary_prompt_template() -> PromptTemplate:
+    """Get the prompt that summarizes one section of a long chapter (map step)"""
+    template = """Summarize the following section of {chapter_name} of the Harry Potter books.
+Keep the events in order and mention every named character, place and magical object involved.
+Use only what the text says, in at most a few short paragraphs.
+
+# SECTION {section} OF {sections}
+{text}
+
+# SUMMARY
+"""
+    return PromptTemplate(
+        input_variables=["chapter_name", "section", "sections", "text"],
+        template=template
+    )
+
+def get_condense_question_prompt_template() -> PromptTemplate:
+    """Get the prompt that rewrites a follow-up into a standalone question"""
+    template = """Given the following conversation and a follow up question, rephrase the follow up question to be a standalone question, in its original language.
+
+Chat History:
+{chat_history}
+Follow Up Input: {question}
+Standalone question:"""
+    return PromptTemplate(
+        input_variables=["chat_history", "question"],
+        template=template
+    )
@@ -1,103 +1,525 @@
+import asyncio
+import hashlib
 import logging
-from typing import List, Tuple, Dict, Any
+import re
+import time
+from typing import AsyncIterator, List, Optional, Tuple, Dict, Any
 from functools import lru_cache
-# Updated imports for LangChain
-from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferWindowMemory
-from langchain.prompts import PromptTemplate
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from app.llm.bm25 import get_bm25_index, reciprocal_rank_fusion
+from app.llm.cache import ResponseCache, get_response_cache, normalize_query
+from app.llm.chapter_index import fetch_chapter, join_chunks, load_chapter_index
+from app.llm.concurrency import Overloaded, SingleFlight, get_stage_limiter, run_in_worker
+from app.llm.context import assemble_context, get_token_counter
+from app.llm.embedding_batcher import get_query_embedder
 from app.llm.embeddings import get_vector_store
-from app.llm.model import get_llm_model
-from app.llm.prompts import get_system_prompt, get_chat_prompt_template, get_summarization_prompt_template
+from app.llm.memory import ChatHistory, format_chat_history
+from app.llm.model import get_async_http_client, get_llm_model
+from app.llm.scope import resolve_scope, scope_label
+from app.llm.semantic_cache import get_semantic_cache
+from app.llm.summary_store import chapter_key, get_summary_store, parse_chapter_target
+from app.llm.reranker import create_reranker
+from app.llm.prompts import (
+    RESPONSE_MODES,
+    get_system_prompt,
+    get_chat_prompt_template,
+    get_condense_question_prompt_template,
+    get_section_summary_prompt_template,
+    get_summarization_prompt_template,
+    normalize_response_mode
+)
 from app.core.config import get_settings
+from app.monitoring.metrics import CONDENSE_DECISIONS, RETRIEVAL_SCOPE, track_stage
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Words that only make sense with the previous turns in view
+_ANAPHORA = re.compile(
+    r"\b(he|she|it|they|him|her|them|his|hers|its|their|theirs|this|that|these|those|"
+    r"there|then|one|ones|former|latter|same|other|else)\b",
+    re.IGNORECASE
+)
+# Elliptical openers such as "and Hermione?" or "what about the third task?"
+_ELLIPSIS = re.compile(
+    r"^\s*(and|but|so|also|or|what about|how about|what else|who else|tell me more|more|why not|then)\b",
+    re.IGNORECASE
+)
+
+
+def needs_condensing(query: str, chat_history: Optional[ChatHistory]) -> bool:
+    """Decide whether a question must be rewritten against the history before retrieval"""
+    if not chat_history:
+        return False
+
+    mode = settings.CONDENSE_QUESTION_MODE
+    if mode == "always":
+        return True
+    if mode == "never":
+        return False
+
+    # Very short follow-ups ("why?", "and Ron?") rarely stand on their own
+    if len(query.split()) <= 3:
+        return True
+    return bool(_ANAPHORA.search(query) or _ELLIPSIS.search(query))
+
 
 class RAGChain:
     def __init__(self):
         self.llm = get_llm_model()
         self.vector_store = get_vector_store()
-        self.retriever = self.vector_store.as_retriever(
-            search_kwargs={"k": settings.RETRIEVAL_K}
+        # Queries are embedded through the micro-batcher, then searched by vector
+        self.query_embedder = get_query_embedder()
+        # Lexical index fused with the vector results (None when disabled or not built)
+        self.bm25_index = get_bm25_index()
+        # Optional reranking of over-fetched candidates (None when RERANK_MODE=none)
+        self.reranker = create_reranker(self.vector_store)
+        # Conversation history is per session and passed in on every call
+        self.response_cache = get_response_cache()
+        self.semantic_cache = get_semantic_cache()
+        # Blocking stages run on the sized worker pool, each under its own cap
+        self.limits = get_stage_limiter()
+        # Identical requests in flight together share one computation
+        self.inflight = SingleFlight() if settings.ENABLE_REQUEST_COALESCING else None
+
+        # Prompts are stateless, so build them once per response mode
+        # instead of on every request
+        self.chat_prompts = {
+            mode: get_chat_prompt_template().partial(system_prompt=get_system_prompt(mode))
+            for mode in RESPONSE_MODES
+        }
+        self.summary_prompts = {
+            mode: get_summarization_prompt_template().partial(system_prompt=get_system_prompt(mode))
+            for mode in RESPONSE_MODES
+        }
+        self.condense_prompt = get_condense_question_prompt_template()
+
+        # Chapter summaries read the chapter itself, in order
+        self.chapter_index = load_chapter_index(self.vector_store)
+        self.section_prompt = get_section_summary_prompt_template()
+        self.section_llm = self.llm.model_copy(update={"max_tokens": settings.CHAPTER_SECTION_SUMMARY_TOKENS})
+        # Sized in the same tokens as the retrieval context budget
+        self.token_counter = get_token_counter()
+        self.section_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.CHAPTER_SECTION_TOKENS,
+            chunk_overlap=0,
+            length_function=self.token_counter.count,
+            separators=["\n\n", "\n", ". ", " "]
+        )
+
+    def _build_chat_prompt(self, question: str, context: str, history_text: str, response_mode: str) -> str:
+        """Render the chat prompt with the assembled passages "stuffed" into it"""
+        return self.chat_prompts[normalize_response_mode(response_mode)].format(
+            context=context,
+            chat_history=history_text,
+            question=question
+        )
+
+    @staticmethod
+    async def _assemble(docs) -> Tuple[str, List[str]]:
+        """Merge, dedupe and trim the retrieved chunks; returns the context and its sources"""
+        # Token counting is CPU work, so it runs off the event loop
+        with track_stage("assemble"):
+            context, used = await run_in_worker(assemble_context, docs)
+        return context, [doc.metadata.get("source", "Unknown") for doc in used]
+
+    def _cache_get(self, key: str):
+        return self.response_cache.get(key) if self.response_cache else None
+
+    def _cache_set(self, key: str, answer: str, sources: List[str]):
+        if self.response_cache:
+            self.response_cache.set(key, answer, sources)
+
+    @staticmethod
+    def _semantic_partition(query: str, response_mode: str, book: Optional[int], chapter: Optional[int]) -> str:
+        # Answers scoped to different books must not be served for each other
+        scope = scope_label(resolve_scope(query, book, chapter))
+        return f"{response_mode}|{scope}" if scope else response_mode
+
+    def chat_flight_key(
+        self,
+        query: str,
+        response_mode: str,
+        chat_history: Optional[ChatHistory] = None,
+        book: Optional[int] = None,
+        chapter: Optional[int] = None,
+        stream: bool = False
+    ) -> str:
+        """Requests with the same key get the same answer, so concurrent ones can share it"""
+        history = ""
+        if chat_history:
+            history = hashlib.sha1(format_chat_history(chat_history).encode("utf-8")).hexdigest()
+        partition = self._semantic_partition(query, normalize_response_mode(response_mode), book, chapter)
+        return "\0".join(["chat_stream" if stream else "chat", normalize_query(query), partition, history])
+
+    @staticmethod
+    def summary_flight_key(summary_type: str, summary_target: str, response_mode: str) -> str:
+        return "\0".join(["summary", summary_type, normalize_query(summary_target), normalize_response_mode(response_mode)])
+
+    def in_flight(self, key: str) -> bool:
+        return bool(self.inflight and self.inflight.in_flight(key))
+
+    async def _semantic_lookup(self, query: str, partition: str):
+        """Return (cached answer or None, question vector) for a first-turn query"""
+        if not self.semantic_cache:
+            return None, None
+
+        try:
+            vector = await self.semantic_cache.embed(query)
+            return self.semantic_cache.lookup(vector, partition), vector
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None, None
+
+    def _semantic_store(self, vector, query: str, partition: str, answer: str, sources: List[str]):
+        if self.semantic_cache and vector is not None:
+            self.semantic_cache.store(vector, partition, query, answer, sources)
+
+    async def _vector_search(self, vector, k: int, where: Optional[dict]):
+        with track_stage("search"):
+            return await self.limits.run("search", self.vector_store.similarity_search_by_vector, vector, k, filter=where)
+
+    async def _bm25_search(self, query: str, k: int, where: Optional[dict]):
+        with track_stage("bm25"):
+            return await self.limits.run("search", self.bm25_index.search, query, k, where)
+
+    async def _candidates(self, query: str, vector, k: int, where: Optional[dict]):
+        """Top k passages from the vector store, fused with BM25 when it is available"""
+        if not self.bm25_index:
+            return await self._vector_search(vector, k, where)
+
+        candidates = max(k, settings.HYBRID_CANDIDATES)
+        vector_docs, bm25_docs = await asyncio.gather(
+            self._vector_search(vector, candidates, where),
+            self._bm25_search(query, candidates, where)
         )
-        # Fix memory configuration with output_key specification
-        self.memory = ConversationBufferWindowMemory(
-            memory_key="chat_history",
-            return_messages=True,
-            output_key="answer",  # Specify which key to store in memory
-            k=5  # Keep only the last 5 exchanges for efficiency
+        return reciprocal_rank_fusion(
+            [vector_docs, bm25_docs],
+            [settings.RRF_VECTOR_WEIGHT, settings.RRF_BM25_WEIGHT],
+            k,
+            settings.RRF_K
         )
 
-    def get_conversation_chain(self, response_mode: str = "freeform"):
-        system_prompt = get_system_prompt(response_mode)
+    async def search(self, query: str, k: int = settings.RETRIEVAL_K, where: Optional[dict] = None, vector=None):
+        """Return the k best passages for a query, optionally within a metadata filter.
 
-        # Use the predefined chat prompt template from prompts.py
-        prompt = get_chat_prompt_template()
+        With a BM25 index, vector and keyword candidates are retrieved
+        concurrently and fused by reciprocal rank. With a reranker,
+        RERANK_CANDIDATES are fetched and reranked down to k, unless the
+        reranker is busy or over its latency budget. ``vector`` is the query's
+        embedding, when the caller already has it.
+        """
+        if vector is None:
+            # No stage cap here: the micro-batcher already runs one encode at a
+            # time, and capping its callers would shrink every batch to the cap
+            with track_stage("embed"):
+                vector = await self.query_embedder.aembed_query(query)
 
-        chain = ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
-            retriever=self.retriever,
-            memory=self.memory,
-            combine_docs_chain_kwargs={"prompt": prompt.partial(system_prompt=system_prompt)},
-            return_source_documents=True,
-            chain_type="stuff"
+        if not self.reranker:
+            return await self._candidates(query, vector, k, where)
+
+        docs = await self._candidates(query, vector, max(k, settings.RERANK_CANDIDATES), where)
+        if len(docs) > k:
+            with track_stage("rerank"):
+                reranked = await self.reranker.rerank(query, vector, docs, k)
+            if reranked is not None:
+                return reranked
+        return docs[:k]
+
+    async def _retrieve(
+        self,
+        query: str,
+        chat_history: Optional[ChatHistory],
+        history_text: str,
+        book: Optional[int] = None,
+        chapter: Optional[int] = None,
+        query_vector=None
+    ):
+        """Condense the question if the history requires it, then fetch its passages.
+
+        ``query_vector`` (the semantic cache's embedding of the query) is reused
+        for the search unless the question was condensed.
+        """
+        question = query
+        if needs_condensing(query, chat_history):
+            CONDENSE_DECISIONS.labels(decision="condensed").inc()
+            with track_stage("condense"):
+                condensed = await self.llm.ainvoke(
+                    self.condense_prompt.format(chat_history=history_text, question=query)
+                )
+            question = condensed.strip() or query
+        elif chat_history:
+            CONDENSE_DECISIONS.labels(decision="skipped").inc()
+
+        # Scope detection runs on the condensed question, so follow-ups keep their book
+        where = resolve_scope(question, book, chapter)
+        if book is not None or chapter is not None:
+            RETRIEVAL_SCOPE.labels(scope="requested").inc()
+        else:
+            RETRIEVAL_SCOPE.labels(scope="detected" if where else "none").inc()
+
+        with track_stage("retrieve"):
+            vector = query_vector.tolist() if query_vector is not None and question == query else None
+            docs = await self.search(question, where=where, vector=vector)
+        return question, docs
+
+    async def generate_response(
+        self,
+        query: str,
+        response_mode: str = "freeform",
+        chat_history: Optional[ChatHistory] = None,
+        book: Optional[int] = None,
+        chapter: Optional[int] = None
+    ) -> Tuple[str, List[str]]:
+        if not self.inflight:
+            return await self._generate_response(query, response_mode, chat_history, book, chapter)
+
+        key = self.chat_flight_key(query, response_mode, chat_history, book, chapter)
+        return await self.inflight.do(
+            key, "chat", lambda: self._generate_response(query, response_mode, chat_history, book, chapter)
         )
-        return chain
 
-    async def generate_response(self, query: str, response_mode: str = "freeform") -> Tuple[str, List[str]]:
+    async def _generate_response(
+        self,
+        query: str,
+        response_mode: str,
+        chat_history: Optional[ChatHistory],
+        book: Optional[int],
+        chapter: Optional[int]
+    ) -> Tuple[str, List[str]]:
         logger.info(f"Generating response for query: {query}")
-        chain = self.get_conversation_chain(response_mode)
 
-        # Execute the chain using the updated invoke method
         try:
-            # Replace chain() call with chain.invoke()
-            result = chain.invoke({"question": query})
+            question_vector = None
+            partition = self._semantic_partition(query, response_mode, book, chapter)
+            if not chat_history:
+                # First turn: the answer only depends on the question and its context
+                cached, question_vector = await self._semantic_lookup(query, partition)
+                if cached:
+                    return cached
+
+            history_text = format_chat_history(chat_history or [])
+            question, docs = await self._retrieve(query, chat_history, history_text, book, chapter, question_vector)
 
-            # Extract answer and sources
-            answer = result.get("answer", "Sorry, I couldn't generate a response.")
-            source_docs = result.get("source_documents", [])
-            sources = [doc.metadata.get("source", "Unknown") for doc in source_docs]
+            cache_key = None
+            if not chat_history:
+                cache_key = ResponseCache.make_key("chat", query, response_mode, docs)
+                cached = self._cache_get(cache_key)
+                if cached:
+                    self._semantic_store(question_vector, query, partition, *cached)
+                    return cached
+
+            context, sources = await self._assemble(docs)
+            with track_stage("generate"):
+                answer = await self.llm.ainvoke(
+                    self._build_chat_prompt(question, context, history_text, response_mode)
+                )
+
+            if cache_key:
+                self._cache_set(cache_key, answer, sources)
+                self._semantic_store(question_vector, query, partition, answer, sources)
 
             return answer, sources
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"Error in chain execution: {e}")
             return f"I encountered an error while processing your question: {str(e)}", []
 
+    def stream_response(
+        self,
+        query: str,
+        response_mode: str = "freeform",
+        chat_history: Optional[ChatHistory] = None,
+        book: Optional[int] = None,
+        chapter: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Stream the answer token by token; identical streams in flight are fanned out from one"""
+        if not self.inflight:
+            return self._stream_response(query, response_mode, chat_history, book, chapter)
+
+        key = self.chat_flight_key(query, response_mode, chat_history, book, chapter, stream=True)
+        return self.inflight.stream(
+            key, "chat_stream", lambda: self._stream_response(query, response_mode, chat_history, book, chapter)
+        )
+
+    async def _stream_response(
+        self,
+        query: str,
+        response_mode: str,
+        chat_history: Optional[ChatHistory],
+        book: Optional[int],
+        chapter: Optional[int]
+    ) -> AsyncIterator[str]:
+        logger.info(f"Streaming response for query: {query}")
+
+        question_vector = None
+        partition = self._semantic_partition(query, response_mode, book, chapter)
+        if not chat_history:
+            cached, question_vector = await self._semantic_lookup(query, partition)
+            if cached:
+                answer, _ = cached
+                yield answer
+                return
+
+        history_text = format_chat_history(chat_history or [])
+        question, docs = await self._retrieve(query, chat_history, history_text, book, chapter, question_vector)
+
+        cache_key = None
+        if not chat_history:
+            cache_key = ResponseCache.make_key("chat", query, response_mode, docs)
+            cached = self._cache_get(cache_key)
+            if cached:
+                answer, _ = cached
+                yield answer
+                return
+
+        context, sources = await self._assemble(docs)
+        prompt_text = self._build_chat_prompt(question, context, history_text, response_mode)
+
+        answer_parts = []
+        with track_stage("generate"):
+            async for delta in self.llm.astream(prompt_text):
+                answer_parts.append(delta)
+                yield delta
+
+        if cache_key:
+            answer = "".join(answer_parts)
+            self._cache_set(cache_key, answer, sources)
+            self._semantic_store(question_vector, query, partition, answer, sources)
+
     async def generate_summary(self, summary_type: str, summary_target: str, response_mode: str = "structured") -> Tuple[str, List[str]]:
+        if not self.inflight:
+            return await self._generate_summary(summary_type, summary_target, response_mode)
+
+        key = self.summary_flight_key(summary_type, summary_target, response_mode)
+        return await self.inflight.do(
+            key, "summary", lambda: self._generate_summary(summary_type, summary_target, response_mode)
+        )
+
+    async def _generate_summary(self, summary_type: str, summary_target: str, response_mode: str) -> Tuple[str, List[str]]:
         logger.info(f"Generating {summary_type} summary for: {summary_target}")
 
         try:
+            if summary_type == "chapter":
+                chapter = parse_chapter_target(summary_target)
+                if chapter and chapter in self.chapter_index:
+                    return await self._summarize_chapter(*chapter, response_mode)
+
             # Form a better retrieval query
             retrieval_query = f"{summary_type} {summary_target} Harry Potter"
-            docs = self.retriever.get_relevant_documents(retrieval_query)
+            with track_stage("retrieve"):
+                docs = await self.search(retrieval_query)
 
             if not docs:
                 return f"Sorry, I couldn't find enough information about {summary_target}.", []
 
-            context = "\n\n".join([doc.page_content for doc in docs])
-            system_prompt = get_system_prompt(response_mode)
-
-            # Use the summarization prompt template
-            prompt_template = get_summarization_prompt_template()
-            prompt_values = {
-                "system_prompt": system_prompt,
-                "context": context,
-                "summary_type": summary_type,
-                "summary_target": summary_target
-            }
-            
-            # Format the prompt and send to LLM
-            prompt_text = prompt_template.format(**prompt_values)
-            response = self.llm(prompt_text)
-            sources = [doc.metadata.get("source", "Unknown") for doc in docs]
+            cache_key = ResponseCache.make_key(f"summary:{summary_type}", summary_target, response_mode, docs)
+            cached = self._cache_get(cache_key)
+            if cached:
+                return cached
+
+            context, sources = await self._assemble(docs)
+
+            # Format the prebuilt summarization prompt and send to LLM
+            prompt_text = self.summary_prompts[normalize_response_mode(response_mode)].format(
+                context=context,
+                summary_type=summary_type,
+                summary_target=summary_target
+            )
+            with track_stage("summarize"):
+                response = await self.llm.ainvoke(prompt_text)
+            self._cache_set(cache_key, response, sources)
 
             return response, sources
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"Error generating summary: {e}")
             return f"I encountered an error while generating the summary: {str(e)}", []
 
+    async def _summarize_chapter(self, book: int, chapter: int, response_mode: str) -> Tuple[str, List[str]]:
+        """Summarize a chapter from its full text rather than from searched passages"""
+        with track_stage("retrieve"):
+            docs = await self.limits.run("search", fetch_chapter, self.vector_store, self.chapter_index, book, chapter)
+
+        if not docs:
+            return f"Sorry, I couldn't find the text of book {book}, chapter {chapter}.", []
+
+        cache_key = ResponseCache.make_key("summary:chapter", chapter_key(book, chapter), response_mode, docs)
+        cached = self._cache_get(cache_key)
+        if cached:
+            return cached
+
+        chapter_name = f"Book {book}, Chapter {chapter}"
+        context = join_chunks(docs, settings.CHUNK_OVERLAP)
+        if await run_in_worker(self.token_counter.count, context) > settings.CHAPTER_CONTEXT_TOKENS:
+            context = await self._condense_chapter(context, chapter_name)
+
+        prompt_text = self.summary_prompts[normalize_response_mode(response_mode)].format(
+            context=context,
+            summary_type="chapter",
+            summary_target=chapter_name
+        )
+        with track_stage("summarize"):
+            response = await self.llm.ainvoke(prompt_text)
+        sources = [docs[0].metadata.get("source", f"Harry Potter {chapter_name}")]
+        self._cache_set(cache_key, response, sources)
+
+        return response, sources
+
+    async def _condense_chapter(self, text: str, chapter_name: str) -> str:
+        """Map step: summarize sections in parallel until the chapter fits the context budget"""
+        semaphore = asyncio.Semaphore(settings.CHAPTER_MAP_CONCURRENCY)
+
+        async def summarize_section(number: int, total: int, section: str) -> str:
+            async with semaphore:
+                summary = await self.section_llm.ainvoke(self.section_prompt.format(
+                    chapter_name=chapter_name, section=number, sections=total, text=section
+                ))
+            return f"Section {number}: {summary.strip()}"
+
+        tokens = await run_in_worker(self.token_counter.count, text)
+        while tokens > settings.CHAPTER_CONTEXT_TOKENS:
+            sections = await run_in_worker(self.section_splitter.split_text, text)
+            with track_stage("summarize_map"):
+                summaries = await asyncio.gather(*(
+                    summarize_section(number, len(sections), section)
+                    for number, section in enumerate(sections, 1)
+                ))
+            condensed = "\n\n".join(summaries)
+            condensed_tokens = await run_in_worker(self.token_counter.count, condensed)
+
+            # Stop if a pass no longer shrinks the text; the prompt is then just long
+            if condensed_tokens >= tokens:
+                break
+            text, tokens = condensed, condensed_tokens
+
+        return text
+
 
 @lru_cache()
 def get_rag_chain():
-    return RAGChain()
\ No newline at end of file
+    return RAGChain()
+
+
+def warm_up():
+    """Build the RAG singletons and exercise them once so the first request is not cold"""
+    start = time.perf_counter()
+    rag_chain = get_rag_chain()
+    get_async_http_client()
+    get_summary_store()
+    get_token_counter()
+
+    # One embedding and one search load the model weights and index pages, and
+    # let torch pick its kernels
+    vector = rag_chain.query_embedder.embed_query("Who is Harry Potter?")
+    rag_chain.vector_store.similarity_search_by_vector(vector, settings.RETRIEVAL_K)
+    if rag_chain.bm25_index:
+        rag_chain.bm25_index.search("Who is Harry Potter?", settings.RETRIEVAL_K)
+    if rag_chain.reranker:
+        # Loads the cross-encoder, if that is the configured reranker
+        docs = rag_chain.vector_store.similarity_search_by_vector(vector, settings.RERANK_CANDIDATES)
+        rag_chain.reranker.warm_up("Who is Harry Potter?", vector, docs, settings.RETRIEVAL_K)
+
+    logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f} seconds")
@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.config import get_settings
+from app.llm.concurrency import run_in_worker
+from app.llm.embedding_cache import CachedEmbeddings, normalize_text
+from app.llm.embeddings import get_embeddings_model
+from app.monitoring.metrics import CACHE_HITS, CACHE_MISSES, RERANK_SKIPPED
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def mmr_select(query_vector: np.ndarray, doc_vectors: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """Maximal marginal relevance over normalized vectors; returns the chosen row indices"""
+    relevance = doc_vectors @ query_vector
+    similarity = doc_vectors @ doc_vectors.T
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    while len(selected) < min(k, len(doc_vectors)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+
+class Reranker(ABC):
+    """Reorders over-fetched candidates, within a latency budget.
+
+    Reranking runs on the worker pool. It is skipped (and the candidates are
+    kept in retrieval order) when ``max_concurrent`` reranks are already
+    running, or abandoned when it takes longer than ``budget`` seconds; an
+    abandoned run still finishes in the background and fills the caches.
+    """
+
+    def __init__(self, budget: float, max_concurrent: int):
+        self.budget = budget
+        self.max_concurrent = max_concurrent
+        self._running = 0
+
+    def _release(self, task: asyncio.Future):
+        self._running -= 1
+        # Retrieve the outcome so failures of abandoned runs aren't reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    async def rerank(self, query: str, query_vector, docs: Sequence[Document], k: int) -> Optional[List[Document]]:
+        if self._running >= self.max_concurrent:
+            RERANK_SKIPPED.labels(reason="busy").inc()
+            return None
+
+        self._running += 1
+        task = asyncio.ensure_future(run_in_worker(self._rerank, query, query_vector, list(docs), k))
+        task.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.budget)
+        except asyncio.TimeoutError:
+            RERANK_SKIPPED.labels(reason="timeout").inc()
+        except Exception as e:
+            logger.warning(f"Reranking failed: {e}")
+            RERANK_SKIPPED.labels(reason="error").inc()
+        return None
+
+    def warm_up(self, query: str, query_vector, docs: Sequence[Document], k: int):
+        """Reranks once, inline and without the budget, so models and caches are loaded"""
+        self._rerank(query, query_vector, list(docs), k)
+
+    @abstractmethod
+    def _rerank(self, query: str, query_vector, docs: List[Document], k: int) -> List[Document]:
+        ...
+
+
+class MMRReranker(Reranker):
+    """Diversifies the candidates with MMR on their stored embeddings.
+
+    Chunk vectors are read back from the vector store by id (or embedded,
+    for candidates without one) and kept in a byte-bounded cache.
+    """
+
+    def __init__(self, vector_store, embeddings, lambda_mult: float, cache_bytes: int, **kwargs):
+        super().__init__(**kwargs)
+        self.vector_store = vector_store
+        self.lambda_mult = lambda_mult
+        self.vectors = CachedEmbeddings(embeddings, max_bytes=cache_bytes, name="rerank_vectors")
+
+    def _doc_vectors(self, docs: List[Document]) -> np.ndarray:
+        missing = [doc for doc in docs if getattr(doc, "id", None) and doc.page_content not in self.vectors]
+        if missing:
+            stored = self.vector_store.get(ids=[doc.id for doc in missing], include=["documents", "embeddings"])
+            for text, vector in zip(stored["documents"], stored["embeddings"]):
+                self.vectors.add(text, vector)
+
+        return np.asarray(self.vectors.embed_documents([doc.page_content for doc in docs]), dtype=np.float32)
+
+    def _rerank(self, query: str, query_vector, docs: List[Document], k: int) -> List[Document]:
+        selected = mmr_select(np.asarray(query_vector, dtype=np.float32), self._doc_vectors(docs), k, self.lambda_mult)
+        return [docs[i] for i in selected]
+
+
+class CrossEncoderReranker(Reranker):
+    """Scores (question, passage) pairs with a small local cross-encoder.
+
+    Only pairs missing from the score cache go to the model, in one batch.
+    """
+
+    def __init__(self, model_name: str, batch_size: int, cache_size: int, **kwargs):
+        super().__init__(**kwargs)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._scores: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+
+            logger.info(f"Loading cross-encoder: {self.model_name}")
+            self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    @staticmethod
+    def _key(query: str, text: str) -> str:
+        raw = normalize_text(query) + "\0" + text
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def score(self, query: str, docs: List[Document]) -> List[float]:
+        keys = [self._key(query, doc.page_content) for doc in docs]
+        with self._lock:
+            scores = [self._scores.get(key) for key in keys]
+            for key, score in zip(keys, scores):
+                if score is not None:
+                    self._scores.move_to_end(key)
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        CACHE_HITS.labels(cache="rerank_scores").inc(len(docs) - len(missing))
+        CACHE_MISSES.labels(cache="rerank_scores").inc(len(missing))
+        if missing:
+            pairs = [(query, docs[i].page_content) for i in missing]
+            predicted = self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+            with self._lock:
+                for i, score in zip(missing, predicted):
+                    scores[i] = float(score)
+                    self._scores[keys[i]] = scores[i]
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+        return scores
+
+    def _rerank(self, query: str, query_vector, docs: List[Document], k: int) -> List[Document]:
+        scores = self.score(query, docs)
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [docs[i] for i in order[:k]]
+
+
+def create_reranker(vector_store) -> Optional[Reranker]:
+    """Reranker selected by RERANK_MODE ("none", "mmr" or "cross_encoder")"""
+    gate = {
+        "budget": settings.RERANK_LATENCY_BUDGET_MS / 1000,
+        "max_concurrent": settings.RERANK_MAX_CONCURRENT
+    }
+    if settings.RERANK_MODE == "mmr":
+        return MMRReranker(
+            vector_store,
+            get_embeddings_model(),
+            lambda_mult=settings.MMR_LAMBDA,
+            cache_bytes=settings.RERANK_CACHE_MB * 1024 * 1024,
+            **gate
+        )
+    if settings.RERANK_MODE == "cross_encoder":
+        return CrossEncoderReranker(
+            settings.CROSS_ENCODER_MODEL,
+            batch_size=settings.RERANK_BATCH_SIZE,
+            cache_size=settings.RERANK_CACHE_SIZE,
+            **gate
+        )
+    if settings.RERANK_MODE != "none":
+        logger.warning(f"Unknown RERANK_MODE {settings.RERANK_MODE!r}; reranking disabled")
+    return None
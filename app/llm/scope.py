@@ -0,0 +1,80 @@
+import json
+import re
+from typing import Callable, Optional
+
+import numpy as np
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Title phrases (and their common misspellings) for the four books
+BOOK_TITLES = {
+    1: ("philosopher's stone", "philosophers stone", "sorcerer's stone", "sorcerers stone"),
+    2: ("chamber of secrets",),
+    3: ("prisoner of azkaban",),
+    4: ("goblet of fire",),
+}
+_ORDINALS = {"first": 1, "second": 2, "third": 3, "fourth": 4, "one": 1, "two": 2, "three": 3, "four": 4}
+
+_TITLE_PATTERNS = {
+    book: re.compile(r"\b(" + "|".join(re.escape(title) for title in titles) + r")\b", re.IGNORECASE)
+    for book, titles in BOOK_TITLES.items()
+}
+_BOOK_NUMBER = re.compile(r"\bbook\s+(\d|one|two|three|four)\b", re.IGNORECASE)
+_ORDINAL_BOOK = re.compile(r"\b(first|second|third|fourth)\s+book\b", re.IGNORECASE)
+
+
+def detect_book(query: str) -> Optional[int]:
+    """The book a question is explicitly about ("in Goblet of Fire, ..."), if exactly one"""
+    books = {book for book, pattern in _TITLE_PATTERNS.items() if pattern.search(query)}
+
+    for match in _BOOK_NUMBER.finditer(query):
+        word = match.group(1).lower()
+        books.add(int(word) if word.isdigit() else _ORDINALS[word])
+    for match in _ORDINAL_BOOK.finditer(query):
+        books.add(_ORDINALS[match.group(1).lower()])
+
+    books &= set(BOOK_TITLES)
+    return books.pop() if len(books) == 1 else None
+
+
+def resolve_scope(query: str, book: Optional[int] = None, chapter: Optional[int] = None) -> Optional[dict]:
+    """Chroma ``where`` filter for a question: the requested scope, else one detected in the text"""
+    # A chapter number alone is ambiguous across books, so the book is still
+    # detected from the question when only the chapter was given
+    if book is None and settings.AUTO_DETECT_SCOPE:
+        book = detect_book(query)
+
+    conditions = []
+    if book is not None:
+        conditions.append({"book": {"$eq": book}})
+    if chapter is not None:
+        conditions.append({"chapter": {"$eq": chapter}})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def where_mask(where: dict, column: Callable[[str], np.ndarray], size: int) -> np.ndarray:
+    """Evaluate an equality filter as produced by resolve_scope over columnar metadata.
+
+    Supports ``{"field": value}``, ``{"field": {"$eq": value}}`` and ``$and``
+    of those; ``column(field)`` returns the field's values for every row.
+    """
+    mask = np.ones(size, dtype=bool)
+    for field, condition in where.items():
+        if field == "$and":
+            for sub_condition in condition:
+                mask &= where_mask(sub_condition, column, size)
+            continue
+        if isinstance(condition, dict) and set(condition) != {"$eq"}:
+            raise ValueError(f"Unsupported filter on {field!r}: {condition}")
+        mask &= column(field) == (condition["$eq"] if isinstance(condition, dict) else condition)
+    return mask
+
+
+def scope_label(where: Optional[dict]) -> str:
+    """Stable string for a filter, used to keep cached answers of different scopes apart"""
+    return json.dumps(where, sort_keys=True) if where else ""
@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.llm.embedding_batcher import get_query_embedder
+from app.monitoring.metrics import CACHE_HITS, CACHE_MISSES, CACHE_EVICTIONS, LLM_CALLS_SAVED
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class _Partition:
+    """Fixed-size vector index of past questions for one response mode and scope"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.vectors: Optional[np.ndarray] = None
+        self.entries: List[Optional[dict]] = [None] * max_entries
+        self.last_used = np.zeros(max_entries, dtype=np.float64)
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def claim_slot(self) -> Tuple[int, Optional[str]]:
+        """Pick a slot for a new entry and the eviction reason, if any"""
+        if self.size < self.max_entries:
+            self.size += 1
+            return self.size - 1, None
+
+        slot = int(np.argmin(self.last_used))
+        # Expired slots were already counted when they were found stale
+        return slot, ("lru" if self.last_used[slot] > 0 else None)
+
+
+class SemanticCache:
+    """Answers to past questions, looked up by embedding similarity.
+
+    Questions are embedded with the (normalized) retrieval model, so the dot
+    product of two vectors is their cosine similarity. Each response mode and
+    retrieval scope gets its own partition, bounded in size with
+    least-recently-used eviction. At most ``max_partitions`` are kept; the
+    least recently used one is dropped whole to make room for a new one.
+    """
+
+    def __init__(self, embeddings, threshold: float, max_entries: int, ttl: int, max_partitions: int):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_partitions = max_partitions
+        self._partitions: "OrderedDict[str, _Partition]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def embed(self, query: str) -> np.ndarray:
+        # The same text retrieval embeds, so the vector can be reused for the search
+        vector = await self.embeddings.aembed_query(query)
+        return np.asarray(vector, dtype=np.float32)
+
+    def _partition(self, response_mode: str, create: bool = False) -> Optional[_Partition]:
+        with self._lock:
+            partition = self._partitions.get(response_mode)
+            if partition is not None:
+                self._partitions.move_to_end(response_mode)
+            elif create:
+                partition = self._partitions[response_mode] = _Partition(self.max_entries)
+                while len(self._partitions) > self.max_partitions:
+                    _, evicted = self._partitions.popitem(last=False)
+                    CACHE_EVICTIONS.labels(cache="semantic", reason="partition").inc(evicted.size)
+            return partition
+
+    def lookup(self, vector: np.ndarray, response_mode: str) -> Optional[Tuple[str, List[str]]]:
+        partition = self._partition(response_mode)
+        if partition is None:
+            CACHE_MISSES.labels(cache="semantic").inc()
+            return None
+
+        with partition.lock:
+            hit = None
+            if partition.size:
+                scores = partition.vectors[:partition.size] @ vector
+                matches = np.flatnonzero(scores >= self.threshold)
+                now = time.monotonic()
+                # Best match first; expired ones are purged and the next one tried
+                for slot in matches[np.argsort(-scores[matches])]:
+                    entry = partition.entries[slot]
+                    if entry["expires_at"] < now:
+                        # Forget the stale vector and leave the slot to be reused first
+                        partition.vectors[slot] = 0
+                        partition.last_used[slot] = 0
+                        CACHE_EVICTIONS.labels(cache="semantic", reason="ttl").inc()
+                        continue
+
+                    partition.last_used[slot] = now
+                    hit = entry
+                    logger.info(
+                        f"Semantic cache hit ({scores[slot]:.3f}) for cached question: {entry['question']}"
+                    )
+                    break
+
+        if hit is None:
+            CACHE_MISSES.labels(cache="semantic").inc()
+            return None
+
+        CACHE_HITS.labels(cache="semantic").inc()
+        LLM_CALLS_SAVED.labels(cache="semantic").inc()
+        return hit["answer"], list(hit["sources"])
+
+    def store(self, vector: np.ndarray, response_mode: str, question: str, answer: str, sources: Sequence[str]):
+        partition = self._partition(response_mode, create=True)
+
+        with partition.lock:
+            if partition.vectors is None:
+                partition.vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            slot, reason = partition.claim_slot()
+            if reason:
+                CACHE_EVICTIONS.labels(cache="semantic", reason=reason).inc()
+
+            partition.vectors[slot] = vector
+            partition.entries[slot] = {
+                "question": question,
+                "answer": answer,
+                "sources": list(sources),
+                "expires_at": time.monotonic() + self.ttl
+            }
+            partition.last_used[slot] = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+
+
+@lru_cache()
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Get the semantic answer cache, or None when it is disabled"""
+    if not settings.ENABLE_SEMANTIC_CACHE or settings.SEMANTIC_CACHE_SIZE <= 0:
+        return None
+
+    logger.info(
+        f"Using semantic cache (threshold={settings.SEMANTIC_CACHE_THRESHOLD}, "
+        f"size={settings.SEMANTIC_CACHE_SIZE} per partition, {settings.SEMANTIC_CACHE_PARTITIONS} partitions)"
+    )
+    return SemanticCache(
+        get_query_embedder(),
+        threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+        max_entries=settings.SEMANTIC_CACHE_SIZE,
+        ttl=settings.SEMANTIC_CACHE_TTL,
+        max_partitions=settings.SEMANTIC_CACHE_PARTITIONS
+    )
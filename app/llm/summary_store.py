@@ -0,0 +1,150 @@
+import gzip
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.monitoring.metrics import CACHE_HITS, CACHE_MISSES
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+STORE_VERSION = 1
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+_BOOK_CHAPTER = re.compile(r"\bbook\s*(\d+)\D+?(\d+)\b")
+_CHAPTER_BOOK = re.compile(r"\bchapter\s*(\d+)\D+?\bbook\s*(\d+)\b")
+_DOTTED = re.compile(r"^(\d+)\s*[.:]\s*(\d+)$")
+
+
+def normalize_target(target: str) -> str:
+    """Lower-case, drop punctuation and a leading "the" ("The Burrow" == "burrow")"""
+    text = _NON_WORD.sub("", target.lower().replace("-", " "))
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text[4:] if text.startswith("the ") else text
+
+
+def parse_chapter_target(target: str) -> Optional[Tuple[int, int]]:
+    """Parse "Book 1 Chapter 3", "chapter 3 of book 1" or "1.3" into (book, chapter)"""
+    text = target.lower().strip()
+    match = _BOOK_CHAPTER.search(text) or _DOTTED.match(text)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+
+    match = _CHAPTER_BOOK.search(text)
+    if match:
+        return int(match.group(2)), int(match.group(1))
+    return None
+
+
+def chapter_key(book: int, chapter: int) -> str:
+    return f"book {book} chapter {chapter}"
+
+
+def build_aliases(names: Dict[str, Iterable[str]]) -> Dict[str, str]:
+    """Map normalized aliases to canonical names.
+
+    Every canonical name answers to itself, its explicit aliases and, when no
+    other name in the same list shares them, its first and last words
+    ("Harry" and "Potter" only if nobody else is called that).
+    """
+    aliases: Dict[str, str] = {}
+    word_owners: Dict[str, set] = {}
+
+    for name, explicit in names.items():
+        aliases[normalize_target(name)] = name
+        for alias in explicit:
+            aliases[normalize_target(alias)] = name
+
+        words = normalize_target(name).split()
+        if len(words) > 1:
+            for word in (words[0], words[-1]):
+                word_owners.setdefault(word, set()).add(name)
+
+    for word, owners in word_owners.items():
+        if len(owners) == 1 and word not in aliases:
+            aliases[word] = next(iter(owners))
+
+    return aliases
+
+
+class SummaryStore:
+    """Precomputed summaries served by (type, response_mode, canonical target)"""
+
+    def __init__(self, entries: Optional[dict] = None, aliases: Optional[dict] = None):
+        self.entries: Dict[str, dict] = entries or {}
+        self.aliases: Dict[str, Dict[str, str]] = aliases or {}
+
+    @staticmethod
+    def make_key(summary_type: str, response_mode: str, canonical: str) -> str:
+        return f"{summary_type}|{response_mode}|{normalize_target(canonical)}"
+
+    def resolve(self, summary_type: str, target: str) -> Optional[str]:
+        """Canonical name of a requested target, or None if it is unknown"""
+        if summary_type == "chapter":
+            parsed = parse_chapter_target(target)
+            return chapter_key(*parsed) if parsed else None
+        return self.aliases.get(summary_type, {}).get(normalize_target(target))
+
+    def lookup(self, summary_type: str, target: str, response_mode: str) -> Optional[Tuple[str, List[str]]]:
+        canonical = self.resolve(summary_type, target)
+        entry = self.entries.get(self.make_key(summary_type, response_mode, canonical)) if canonical else None
+
+        if entry is None:
+            CACHE_MISSES.labels(cache="summary_store").inc()
+            return None
+
+        CACHE_HITS.labels(cache="summary_store").inc()
+        return entry["summary"], list(entry["sources"])
+
+    def add(self, summary_type: str, response_mode: str, canonical: str, summary: str, sources: List[str]):
+        self.entries[self.make_key(summary_type, response_mode, canonical)] = {
+            "summary": summary,
+            "sources": sources
+        }
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def save(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        payload = {"version": STORE_VERSION, "aliases": self.aliases, "entries": self.entries}
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path) -> "SummaryStore":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+
+        if payload.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported summary store version: {payload.get('version')}")
+        return cls(payload["entries"], payload["aliases"])
+
+
+@lru_cache()
+def get_summary_store() -> SummaryStore:
+    """Get the precomputed summary store (empty if it hasn't been built)"""
+    path = Path(settings.SUMMARY_STORE_PATH)
+    if not path.exists():
+        logger.info(f"No precomputed summaries at {path}; summaries will be generated live")
+        return SummaryStore()
+
+    try:
+        store = SummaryStore.load(path)
+        logger.info(f"Loaded {len(store)} precomputed summaries from {path}")
+        return store
+    except Exception as e:
+        logger.error(f"Could not load precomputed summaries from {path}: {e}")
+        return SummaryStore()
@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.llm.scope import where_mask
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+QUANTIZATIONS = ("int8", "binary")
+
+# int8 codes are upcast and scored this many rows at a time, so the float
+# copy stays in cache
+_INT8_BLOCK_ROWS = 256
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class VectorStore(ABC):
+    """The part of a vector store the RAG pipeline uses.
+
+    ``similarity_search_by_vector`` and ``get`` follow the signatures of
+    LangChain's Chroma wrapper, so backends are interchangeable.
+    """
+
+    embeddings = None
+
+    @abstractmethod
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        ...
+
+    @abstractmethod
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[dict] = None,
+            include: Sequence[str] = ("documents", "metadatas"), **kwargs) -> dict:
+        ...
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k, filter=filter)
+
+
+class ChromaVectorStore(VectorStore):
+    """Adapter over LangChain's Chroma store (data/processed/chroma_db)"""
+
+    def __init__(self, persist_directory, embeddings):
+        from langchain_chroma import Chroma
+
+        self.embeddings = embeddings
+        self.store = Chroma(persist_directory=str(persist_directory), embedding_function=embeddings)
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        return self.store.similarity_search_by_vector(embedding, k, filter=filter, **kwargs)
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas"), **kwargs) -> dict:
+        return self.store.get(ids=ids, where=where, include=list(include), **kwargs)
+
+
+class FlatVectorStore(VectorStore):
+    """Exact search over a memory-mapped matrix of normalized vectors.
+
+    The directory holds ``vectors.npy`` (float32 or float16, one row per
+    chunk) and a ``metadata.json`` sidecar with ids, texts and metadata. A
+    search is one matrix-vector product over the (filtered) rows. Float32
+    matrices are memory-mapped, so every worker reading the file shares the
+    same pages; float16 halves the file but is decoded to float32 on open,
+    because converting it on every query costs more than the search itself.
+    """
+
+    def __init__(self, directory, embeddings=None, mmap: bool = True):
+        directory = Path(directory)
+        with open(directory / "metadata.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported vector store version: {meta.get('version')}")
+
+        self.directory = directory
+        self.embeddings = embeddings
+        self.ids: List[str] = meta["ids"]
+        self.documents: List[str] = meta["documents"]
+        self.metadatas: List[dict] = meta["metadatas"]
+        self.vectors = self._load_vectors(directory, mmap)
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _load_vectors(directory: Path, mmap: bool) -> np.ndarray:
+        vectors = np.load(directory / "vectors.npy", mmap_mode="r" if mmap else None)
+        return vectors if vectors.dtype == np.float32 else vectors.astype(np.float32)
+
+    def _column(self, field: str) -> np.ndarray:
+        column = self._columns.get(field)
+        if column is None:
+            column = self._columns[field] = np.array([metadata.get(field) for metadata in self.metadatas], dtype=object)
+        return column
+
+    def _rows(self, where: Optional[dict]) -> Optional[np.ndarray]:
+        return np.flatnonzero(where_mask(where, self._column, len(self))) if where else None
+
+    def _search(self, query: np.ndarray, k: int, where: Optional[dict]) -> List[int]:
+        rows = self._rows(where)
+        scores = (self.vectors if rows is None else self.vectors[rows]) @ query
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return (top if rows is None else rows[top]).tolist()
+
+    def _document(self, i: int) -> Document:
+        return Document(page_content=self.documents[i], metadata=dict(self.metadatas[i]), id=self.ids[i])
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        query = np.asarray(embedding, dtype=np.float32)
+        return [self._document(i) for i in self._search(query, k, filter)]
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas"), limit=None, offset=None, **kwargs) -> dict:
+        if ids is not None:
+            rows = [self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions]
+        else:
+            rows = list(range(len(self)))
+        if where:
+            allowed = set(self._rows(where).tolist())
+            rows = [i for i in rows if i in allowed]
+        rows = rows[offset or 0:][:limit]
+
+        result = {"ids": [self.ids[i] for i in rows]}
+        if "documents" in include:
+            result["documents"] = [self.documents[i] for i in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[i] for i in rows]
+        if "embeddings" in include:
+            result["embeddings"] = np.asarray(self.vectors[rows], dtype=np.float32)
+        return result
+
+
+class HNSWVectorStore(FlatVectorStore):
+    """Flat store with an hnswlib graph (``hnsw.bin``) for approximate top-k.
+
+    Filtered searches run exactly over the matching rows instead, which is
+    both precise and cheap once a book or chapter narrows the candidates.
+    Requires the optional ``hnswlib`` package.
+    """
+
+    def __init__(self, directory, embeddings=None, ef_search: int = 64):
+        super().__init__(directory, embeddings)
+        import hnswlib
+
+        self.index = hnswlib.Index(space="ip", dim=self.vectors.shape[1])
+        self.index.load_index(str(self.directory / "hnsw.bin"), max_elements=len(self))
+        self.ef_search = ef_search
+        self.index.set_ef(ef_search)
+
+    def _search(self, query: np.ndarray, k: int, where: Optional[dict]) -> List[int]:
+        if where:
+            return super()._search(query, k, where)
+
+        k = min(k, len(self))
+        if k > self.ef_search:
+            self.ef_search = k
+            self.index.set_ef(k)
+        labels, _ = self.index.knn_query(query, k=k)
+        return labels[0].tolist()
+
+
+def _hamming(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Bit differences between each row of packed codes and the query's code"""
+    if hasattr(np, "bitwise_count") and codes.shape[1] % 8 == 0:
+        return np.bitwise_count(codes.view(np.uint64) ^ query_code.view(np.uint64)).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[codes ^ query_code].sum(axis=1, dtype=np.int32)
+
+
+class QuantizedVectorStore(FlatVectorStore):
+    """Flat store that scans compact codes and rescores the best candidates.
+
+    ``int8`` keeps per-dimension scalar-quantized codes (4x smaller than
+    float32); ``binary`` keeps one bit per dimension, whether the value is
+    above that dimension's mean (32x smaller), and ranks by Hamming
+    distance. Only the codes are held in memory. The best
+    ``k * rescore_multiplier`` candidates are rescored against the
+    full-precision vectors, which stay memory-mapped on disk and are paged
+    in for those rows only.
+    """
+
+    def __init__(self, directory, embeddings=None, quantization: str = "int8", rescore_multiplier: int = 8):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization!r}")
+        super().__init__(directory, embeddings)
+        self.quantization = quantization
+        self.rescore_multiplier = rescore_multiplier
+        self.codes = np.load(self.directory / f"codes_{quantization}.npy")
+        if quantization == "int8":
+            self.scales = np.load(self.directory / "int8_scales.npy")
+        else:
+            self.thresholds = np.load(self.directory / "binary_thresholds.npy")
+
+    @staticmethod
+    def _load_vectors(directory: Path, mmap: bool) -> np.ndarray:
+        # Left on disk in whatever precision it was exported; rescoring reads a few rows
+        return np.load(directory / "vectors.npy", mmap_mode="r")
+
+    def _approximate_scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        if self.quantization == "binary":
+            return -_hamming(codes, np.packbits(query > self.thresholds))
+
+        scaled_query = query * self.scales
+        scores = np.empty(len(codes), dtype=np.float32)
+        block = np.empty((_INT8_BLOCK_ROWS, codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(codes), _INT8_BLOCK_ROWS):
+            rows = codes[start:start + _INT8_BLOCK_ROWS]
+            np.copyto(block[:len(rows)], rows, casting="unsafe")
+            np.dot(block[:len(rows)], scaled_query, out=scores[start:start + len(rows)])
+        return scores
+
+    def _search(self, query: np.ndarray, k: int, where: Optional[dict]) -> List[int]:
+        rows = self._rows(where)
+        approximate = self._approximate_scores(query, self.codes if rows is None else self.codes[rows])
+
+        n_candidates = min(len(approximate), k * self.rescore_multiplier)
+        if n_candidates < len(approximate):
+            candidates = np.argpartition(-approximate, n_candidates - 1)[:n_candidates]
+        else:
+            candidates = np.arange(len(approximate))
+        # Sorted row order reads the mapped file front to back
+        candidates = np.sort(candidates if rows is None else rows[candidates])
+
+        exact = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+        top = np.argsort(-exact, kind="stable")[:k]
+        return candidates[top].tolist()
+
+
+def write_vector_store(directory, ids, vectors, documents, metadatas, dtype: str = "float32") -> None:
+    """Write a FlatVectorStore directory; vectors are L2-normalized on the way"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    np.save(directory / "vectors.npy", vectors.astype(dtype))
+
+    # Written last: a directory without it is an incomplete export
+    tmp_path = directory / "metadata.json.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": STORE_VERSION, "ids": list(ids), "documents": list(documents), "metadatas": list(metadatas)},
+            f,
+            ensure_ascii=False
+        )
+    os.replace(tmp_path, directory / "metadata.json")
+
+
+def build_hnsw_index(directory, m: int = 16, ef_construction: int = 200) -> None:
+    """Build ``hnsw.bin`` for an exported FlatVectorStore directory"""
+    import hnswlib
+
+    vectors = np.load(Path(directory) / "vectors.npy").astype(np.float32)
+    index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+    index.init_index(max_elements=len(vectors), M=m, ef_construction=ef_construction)
+    index.add_items(vectors, np.arange(len(vectors)))
+    index.save_index(str(Path(directory) / "hnsw.bin"))
+
+
+def write_quantized_codes(directory, quantization: str) -> None:
+    """Quantize an exported store's vectors for QuantizedVectorStore"""
+    directory = Path(directory)
+    vectors = np.load(directory / "vectors.npy").astype(np.float32)
+
+    if quantization == "binary":
+        # Centering first: embedding dimensions are rarely balanced around zero
+        thresholds = vectors.mean(axis=0)
+        np.save(directory / "binary_thresholds.npy", thresholds)
+        np.save(directory / "codes_binary.npy", np.packbits(vectors > thresholds, axis=1))
+        return
+
+    scales = np.abs(vectors).max(axis=0) / 127
+    scales[scales == 0] = 1
+    codes = np.clip(np.round(vectors / scales), -127, 127).astype(np.int8)
+    np.save(directory / "int8_scales.npy", scales.astype(np.float32))
+    np.save(directory / "codes_int8.npy", codes)
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 from fastapi import FastAPI, Request, status
@@ -18,21 +19,46 @@ logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
+async def run_warmup(app: FastAPI):
+    """Load models, the vector store and the RAG chain before serving users"""
+    try:
+        from app.llm.rag import warm_up
+        await asyncio.to_thread(warm_up)
+        app.state.ready = True
+    except Exception as e:
+        app.state.warmup_error = str(e)
+        logger.error(f"Warm-up failed: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting Storybook AI application")
     os.makedirs(settings.DATA_DIR, exist_ok=True)
 
-    try:
-        from app.llm.embeddings import get_vector_store
-        _ = get_vector_store()
-        logger.info("Vector store loaded successfully")
-    except Exception as e:
-        logger.error(f"Error loading vector store: {e}")
+    app.state.ready = False
+    app.state.warmup_error = None
+    if settings.WARMUP_IN_BACKGROUND:
+        # Serve /health and /ready immediately; /ready flips once warm
+        warmup_task = asyncio.create_task(run_warmup(app))
+    else:
+        # Don't accept traffic until warm, so other workers take it meanwhile
+        warmup_task = None
+        await run_warmup(app)
 
     yield
     logger.info("Shutting down Storybook AI application")
 
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+
+    from app.llm.embedding_batcher import close_embedding_batcher, save_query_embedding_cache
+    from app.llm.concurrency import shutdown_executor
+    from app.llm.model import close_http_clients
+    await close_embedding_batcher()
+    save_query_embedding_cache()
+    await close_http_clients()
+    shutdown_executor()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -81,6 +107,19 @@ async def root_health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: only ready once warm-up has finished"""
+    if app.state.ready:
+        return {"status": "ready"}
+
+    detail = "failed" if app.state.warmup_error else "warming_up"
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": detail, "error": app.state.warmup_error}
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
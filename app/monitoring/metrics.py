@@ -1,4 +1,5 @@
 import time
+from contextlib import contextmanager
 from prometheus_client import Counter, Histogram, Gauge
 from prometheus_fastapi_instrumentator import Instrumentator, metrics
 from prometheus_fastapi_instrumentator.metrics import Info
@@ -33,6 +34,142 @@ ACTIVE_REQUESTS = Gauge(
     "Number of active requests"
 )
 
+CACHE_HITS = Counter(
+    "storybook_cache_hits_total",
+    "Number of cache hits",
+    ["cache"]
+)
+
+CACHE_MISSES = Counter(
+    "storybook_cache_misses_total",
+    "Number of cache misses",
+    ["cache"]
+)
+
+CACHE_EVICTIONS = Counter(
+    "storybook_cache_evictions_total",
+    "Number of cache entries evicted",
+    ["cache", "reason"]
+)
+
+LLM_CALLS_SAVED = Counter(
+    "storybook_llm_calls_saved_total",
+    "Number of LLM calls avoided by serving a cached answer",
+    ["cache"]
+)
+
+STAGE_LATENCY = Histogram(
+    "storybook_stage_latency_seconds",
+    "Latency of the RAG pipeline stages",
+    ["stage"],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0]
+)
+
+CONDENSE_DECISIONS = Counter(
+    "storybook_condense_decisions_total",
+    "Whether follow-up questions were condensed with an extra LLM call",
+    ["decision"]
+)
+
+RETRIEVAL_SCOPE = Counter(
+    "storybook_retrieval_scope_total",
+    "How chat retrieval was scoped: requested book/chapter, detected in the question, or unscoped",
+    ["scope"]
+)
+
+RERANK_SKIPPED = Counter(
+    "storybook_rerank_skipped_total",
+    "Searches returned in retrieval order because reranking was skipped",
+    ["reason"]
+)
+
+CONTEXT_TOKENS_SAVED = Histogram(
+    "storybook_context_tokens_saved",
+    "Prompt tokens saved per request by merging, deduplicating and trimming retrieved chunks",
+    buckets=[0, 25, 50, 100, 200, 400, 800, 1600, 3200]
+)
+
+EMBEDDING_BATCH_SIZE = Histogram(
+    "storybook_embedding_batch_size",
+    "Number of queries embedded per batched encode",
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128]
+)
+
+EMBEDDING_BATCH_WAIT = Histogram(
+    "storybook_embedding_batch_wait_seconds",
+    "Time a query waited in the embedding batcher before its batch ran",
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5]
+)
+
+
+PIPELINE_ACTIVE = Gauge(
+    "storybook_pipeline_active_requests",
+    "Requests admitted to the RAG pipeline and running"
+)
+
+PIPELINE_QUEUED = Gauge(
+    "storybook_pipeline_queued_requests",
+    "Requests waiting for a slot in the RAG pipeline"
+)
+
+REQUESTS_SHED = Counter(
+    "storybook_requests_shed_total",
+    "Requests rejected because the pipeline queue was full (429) or the wait timed out (503)",
+    ["reason"]
+)
+
+STAGE_IN_FLIGHT = Gauge(
+    "storybook_stage_in_flight",
+    "Requests currently inside a concurrency-limited pipeline stage",
+    ["stage"]
+)
+
+STAGE_QUEUE_WAIT = Histogram(
+    "storybook_stage_queue_wait_seconds",
+    "Time spent waiting for a slot in the admission queue or a limited stage",
+    ["stage"],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+)
+
+
+COALESCED_REQUESTS = Counter(
+    "storybook_coalesced_requests_total",
+    "Requests served by joining an identical computation already in flight",
+    ["kind"]
+)
+
+LLM_IN_FLIGHT = Gauge(
+    "storybook_llm_in_flight",
+    "Outbound LLM requests (and streams) currently open"
+)
+
+LLM_LIMITER_WAIT = Histogram(
+    "storybook_llm_limiter_wait_seconds",
+    "Time an LLM call waited for the global concurrency and rate limiter",
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+)
+
+LLM_CALLS_THROTTLED = Counter(
+    "storybook_llm_calls_throttled_total",
+    "LLM calls answered 429 by the provider"
+)
+
+LLM_CALLS_REJECTED = Counter(
+    "storybook_llm_calls_rejected_total",
+    "LLM calls given up: limiter wait timed out, or still rate limited after the retries",
+    ["reason"]
+)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """Record the duration of a pipeline stage in STAGE_LATENCY"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
 
 # Custom metrics
 def response_time(metric_name: str = "http_response_time_seconds"):
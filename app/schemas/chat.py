@@ -1,6 +1,10 @@
 from typing import List, Optional, Literal
 from pydantic import BaseModel, Field
 
+# Upper bounds for the requested scope; each scope gets its own semantic cache partition
+MAX_BOOK = 100
+MAX_CHAPTER = 500
+
 class Message(BaseModel):
     """Chat message"""
     role: Literal["user", "assistant"] = Field(..., description="Role of the message sender")
@@ -14,6 +18,15 @@ class ChatRequest(BaseModel):
         description="Type of response format - conversational or structured"
     )
     stream: bool = Field(False, description="Whether to stream the response")
+    session_id: Optional[str] = Field(
+        None,
+        description="Conversation id for server-side memory; without it the history is taken from messages"
+    )
+    book: Optional[int] = Field(
+        None, ge=1, le=MAX_BOOK,
+        description="Only search this book (its number in the corpus manifest); by default a book named in the question is used"
+    )
+    chapter: Optional[int] = Field(None, ge=1, le=MAX_CHAPTER, description="Only search this chapter (of `book`, or of the book named in the question)")
 
 class ChatResponse(BaseModel):
     """Chat response schema"""
@@ -0,0 +1,93 @@
+"""
+Per-request overhead of preparing the conversation chain and prompt.
+
+"before" is the path RAGChain.get_conversation_chain used to take on every
+request: build the system prompt and the partial prompt template, construct
+a ConversationalRetrievalChain around them, and format the prompt. "after"
+is RAGChain._build_chat_prompt, which looks up the prompt prebuilt per
+response mode in RAGChain.__init__ and only formats the per-request values.
+No model, retrieval or LLM call is involved, so the numbers isolate the
+construction cost:
+
+    python -m benchmarks.bench_chain_overhead --iterations 2000
+"""
+import argparse
+import statistics
+import time
+from typing import List
+
+from langchain.chains import ConversationalRetrievalChain
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.language_models.fake import FakeListLLM
+from langchain_core.retrievers import BaseRetriever
+
+from app.llm.prompts import RESPONSE_MODES, get_chat_prompt_template, get_system_prompt
+from app.llm.rag import RAGChain
+
+DOCS = [Document(page_content="Hagrid is the keeper of keys and grounds at Hogwarts. " * 8)] * 5
+CONTEXT = "\n\n".join(doc.page_content for doc in DOCS)
+HISTORY = "Human: Who is Harry?\nAssistant: Harry Potter is a wizard."
+QUESTION = "Who is Hagrid?"
+
+
+class StaticRetriever(BaseRetriever):
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return DOCS
+
+
+def per_request_before(llm, retriever, response_mode):
+    prompt = get_chat_prompt_template().partial(system_prompt=get_system_prompt(response_mode))
+    ConversationalRetrievalChain.from_llm(
+        llm=llm,
+        retriever=retriever,
+        combine_docs_chain_kwargs={"prompt": prompt},
+        return_source_documents=True,
+        chain_type="stuff"
+    )
+    return prompt.format(context=CONTEXT, chat_history=HISTORY, question=QUESTION)
+
+
+def prompt_only_chain():
+    """A RAGChain holding only its prebuilt chat prompts, without models or stores"""
+    chain = RAGChain.__new__(RAGChain)
+    chain.chat_prompts = {
+        mode: get_chat_prompt_template().partial(system_prompt=get_system_prompt(mode))
+        for mode in RESPONSE_MODES
+    }
+    return chain
+
+
+def measure(fn, iterations):
+    samples = []
+    for i in range(iterations):
+        mode = RESPONSE_MODES[i % len(RESPONSE_MODES)]
+        start = time.perf_counter()
+        fn(mode)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.mean(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request chain construction overhead")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    llm = FakeListLLM(responses=["ok"])
+    retriever = StaticRetriever()
+    chain = prompt_only_chain()
+    for mode in RESPONSE_MODES:
+        assert chain._build_chat_prompt(QUESTION, CONTEXT, HISTORY, mode) == per_request_before(llm, retriever, mode)
+
+    before = measure(lambda mode: per_request_before(llm, retriever, mode), args.iterations)
+    after = measure(lambda mode: chain._build_chat_prompt(QUESTION, CONTEXT, HISTORY, mode), args.iterations)
+
+    print(f"{'':8} {'mean (us)':>10} {'p99 (us)':>10}")
+    print(f"{'before':8} {before[0]:10.1f} {before[1]:10.1f}")
+    print(f"{'after':8} {after[0]:10.1f} {after[1]:10.1f}")
+    print(f"speedup: {before[0] / after[0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
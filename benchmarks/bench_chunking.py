@@ -0,0 +1,121 @@
+"""
+Throughput, size spread and retrieval recall of chunking strategies.
+
+Compares the old character splitter (RecursiveCharacterTextSplitter,
+CHUNK_SIZE / CHUNK_OVERLAP characters) with the token-aware sentence
+chunker at several sizes. Chunk sizes are measured in the embedding
+model's tokens; "over limit" is the share of chunks MiniLM truncates, so
+part of their text is never embedded. Recall queries are sentences sampled
+from the chapters with some words dropped; a query is a hit when a
+retrieved chunk contains the whole sentence:
+
+    python -m benchmarks.bench_chunking --tokens 128 200 --queries 300
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.core.config import get_settings
+from app.llm.embeddings import get_embeddings_model
+from preprocessing.chunker import TokenChunker, load_tokenizer, sentence_spans
+from preprocessing.process_books import load_chapters
+
+settings = get_settings()
+
+# MiniLM reads 256 word pieces, two of which are [CLS] and [SEP]
+MODEL_TOKEN_LIMIT = 254
+
+
+class CharacterChunker:
+    """The previous splitter, behind the TokenChunker interface"""
+
+    def __init__(self, chunk_size, chunk_overlap):
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=["\n\n", "\n", ".", "?", "!"],
+            add_start_index=True
+        )
+
+    def split(self, text):
+        return [
+            (doc.metadata["start_index"], doc.metadata["start_index"] + len(doc.page_content))
+            for doc in self.splitter.create_documents([text])
+        ]
+
+
+def sample_queries(chapters, count, drop_words, seed):
+    """(query, sentence) pairs from random chapter sentences"""
+    rng = random.Random(seed)
+    sentences = [
+        text[start:end].strip()
+        for text in chapters
+        for start, end in sentence_spans(text)
+        if 60 <= len(text[start:end].strip()) <= 200
+    ]
+    queries = []
+    for sentence in rng.sample(sentences, min(count, len(sentences))):
+        words = [word for word in sentence.split() if rng.random() >= drop_words]
+        queries.append((" ".join(words), sentence))
+    return queries
+
+
+def recall_at_k(chunks, queries, query_vectors, embeddings, k):
+    vectors = np.asarray(embeddings.embed_documents(chunks), dtype=np.float32)
+    hits = 0
+    for (_, sentence), query_vector in zip(queries, query_vectors):
+        top = np.argsort(-(vectors @ query_vector))[:k]
+        hits += any(sentence in chunks[i] for i in top)
+    return hits / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunking strategies")
+    parser.add_argument("--chapters", default=str(settings.CHAPTERS_PATH))
+    parser.add_argument("--tokens", nargs="+", type=int, default=[96, 128, 200], help="Token chunk sizes to compare")
+    parser.add_argument("--overlap", type=float, default=0.25, help="Token overlap as a fraction of the chunk size")
+    parser.add_argument("--tokenizer", default=settings.EMBEDDING_TOKENIZER)
+    parser.add_argument("--queries", type=int, default=300, help="Recall queries; 0 skips the recall measurement")
+    parser.add_argument("--drop-words", type=float, default=0.3)
+    parser.add_argument("--k", type=int, default=settings.RETRIEVAL_K)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    chapters = [chapter["text"] for chapter in load_chapters(args.chapters)]
+    megabytes = sum(len(text) for text in chapters) / 2 ** 20
+    tokenizer = load_tokenizer(args.tokenizer)
+    counter = TokenChunker(tokenizer)
+
+    strategies = [(f"chars {settings.CHUNK_SIZE}/{settings.CHUNK_OVERLAP}",
+                   CharacterChunker(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP))]
+    for size in args.tokens:
+        overlap = int(size * args.overlap)
+        strategies.append((f"tokens {size}/{overlap}", TokenChunker(tokenizer, size, overlap)))
+
+    embeddings = get_embeddings_model() if args.queries else None
+    if args.queries:
+        queries = sample_queries(chapters, args.queries, args.drop_words, args.seed)
+        query_vectors = np.asarray(embeddings.embed_documents([query for query, _ in queries]), dtype=np.float32)
+
+    print(f"{len(chapters)} chapters, {megabytes:.1f} MB; token counts from {args.tokenizer}")
+    print(f"{'strategy':>16} {'chunks':>7} {'MB/s':>6} {'tok p50':>7} {'tok p95':>7} {'tok max':>7} "
+          f"{'over limit':>10} {'recall@k':>9}")
+    for name, chunker in strategies:
+        start = time.perf_counter()
+        chunks = [text[begin:end] for text in chapters for begin, end in chunker.split(text)]
+        elapsed = time.perf_counter() - start
+
+        sizes = np.array([len(counter.token_starts(chunk)) for chunk in chunks])
+        over = np.mean(sizes > MODEL_TOKEN_LIMIT)
+        recall = recall_at_k(chunks, queries, query_vectors, embeddings, args.k) if args.queries else float("nan")
+        print(
+            f"{name:>16} {len(chunks):>7} {megabytes / elapsed:>6.1f} {np.percentile(sizes, 50):>7.0f} "
+            f"{np.percentile(sizes, 95):>7.0f} {sizes.max():>7} {over:>10.1%} {recall:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
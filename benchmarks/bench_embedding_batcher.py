@@ -0,0 +1,66 @@
+"""
+Query-embedding throughput and tail latency, one-at-a-time vs micro-batched.
+
+"direct" embeds every query with its own embed_query call on the default
+thread pool, as retrieval used to. "batched" goes through EmbeddingBatcher.
+Each concurrency level runs closed-loop clients, each issuing queries
+back to back:
+
+    python -m benchmarks.bench_embedding_batcher --concurrency 1 4 16 64 --queries 512
+"""
+import argparse
+import asyncio
+import time
+
+from app.llm.embedding_batcher import EmbeddingBatcher
+from app.llm.embeddings import get_embeddings_model
+
+QUESTIONS = [
+    "Who is Hagrid?", "What is Quidditch?", "Tell me about the Mirror of Erised",
+    "Who are Harry's parents?", "What happens in the Triwizard Tournament?",
+    "Where is the Chamber of Secrets?", "Who is Sirius Black?", "What does Expelliarmus do?",
+]
+
+
+async def run(embed, queries, concurrency):
+    latencies = []
+    counter = iter(range(queries))
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            await embed(f"{QUESTIONS[i % len(QUESTIONS)]} ({i})")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return queries / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def main_async(args):
+    model = get_embeddings_model()
+    model.embed_query("warm up")
+
+    print(f"{'concurrency':>11} {'mode':>8} {'QPS':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for concurrency in args.concurrency:
+        batcher = EmbeddingBatcher(model, max_batch_size=args.max_batch, max_wait=args.max_wait_ms / 1000)
+        for mode, embed in (("direct", model.aembed_query), ("batched", batcher.aembed_query)):
+            qps, p50, p99 = await run(embed, args.queries, concurrency)
+            print(f"{concurrency:>11} {mode:>8} {qps:>8.1f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f}")
+        await batcher.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the embedding micro-batcher")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Ingestion throughput on a synthetic corpus of TXT and EPUB books.
+
+Generates --books books with numbered chapters (headings in digits, roman
+numerals and words, some past the hundredth chapter, plus running page
+headers) and ingests growing prefixes of the corpus: chapter extraction
+with preprocessing/process_books.py, then chunking with stable ids as
+create_embeddings.py does before embedding. Time per book should stay flat
+as the corpus grows:
+
+    python -m benchmarks.bench_ingestion --books 100 --sizes 10 25 50 100
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from preprocessing.create_embeddings import chunk_ids, create_document_chunks
+from preprocessing.process_books import process_books
+
+_UNITS = ["", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven", "twelve",
+          "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+_TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+_ROMAN = [(1000, "M"), (900, "CM"), (500, "D"), (400, "CD"), (100, "C"), (90, "XC"), (50, "L"), (40, "XL"),
+          (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I")]
+
+
+def number_words(n):
+    if n >= 100:
+        rest = n % 100
+        return f"{_UNITS[n // 100]} hundred" + (f" and {number_words(rest)}" if rest else "")
+    if n < 20:
+        return _UNITS[n]
+    return _TENS[n // 10] + (f"-{_UNITS[n % 10]}" if n % 10 else "")
+
+
+def roman(n):
+    numeral = ""
+    for value, symbol in _ROMAN:
+        while n >= value:
+            numeral += symbol
+            n -= value
+    return numeral
+
+
+def headings(book):
+    styles = [
+        lambda n: f"CHAPTER {n}",
+        lambda n: f"Chapter {roman(n)}",
+        lambda n: f"CHAPTER {number_words(n).upper()}",
+        lambda n: f"Chapter {number_words(n).title()}"
+    ]
+    return styles[book % len(styles)]
+
+
+def make_book(rng, words, book, n_chapters, chapter_chars):
+    """Chapter texts of one book, with a running header every ~2000 characters"""
+    heading = headings(book)
+    chapters = []
+    for number in range(1, n_chapters + 1):
+        paragraphs, size = [f"{heading(number)}\nThe {rng.choice(words).title()}\n"], 0
+        while size < chapter_chars:
+            paragraph = " ".join(rng.choice(words) for _ in range(rng.randint(40, 120))) + ".\n\n"
+            paragraphs.append(paragraph)
+            size += len(paragraph)
+            if size // 2000 != (size - len(paragraph)) // 2000:
+                paragraphs.append(f"{heading(number)}\n")
+        chapters.append("".join(paragraphs))
+    return chapters
+
+
+def write_epub(path, title, chapters):
+    with zipfile.ZipFile(path, "w") as epub:
+        epub.writestr("mimetype", "application/epub+zip")
+        epub.writestr(
+            "META-INF/container.xml",
+            '<?xml version="1.0"?><container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            '</rootfiles></container>'
+        )
+        items, spine = [], []
+        for i, chapter in enumerate(chapters):
+            body = "".join(f"<p>{line}</p>" for line in chapter.split("\n") if line)
+            epub.writestr(f"OEBPS/ch{i}.xhtml", f"<html><head><title>{title}</title></head><body>{body}</body></html>")
+            items.append(f'<item id="ch{i}" href="ch{i}.xhtml" media-type="application/xhtml+xml"/>')
+            spine.append(f'<itemref idref="ch{i}"/>')
+        epub.writestr(
+            "OEBPS/content.opf",
+            '<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+            f'<manifest>{"".join(items)}</manifest><spine>{"".join(spine)}</spine></package>'
+        )
+
+
+def make_corpus(directory, n_books, chapters, chapter_chars, seed):
+    """Writes the books; returns (file name, chapter count) per book"""
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9))) for _ in range(5000)]
+    books = []
+    for book in range(1, n_books + 1):
+        # Every tenth book runs past a hundred chapters
+        n_chapters = 120 if book % 10 == 0 else rng.randint(chapters // 2, chapters * 3 // 2)
+        texts = make_book(rng, words, book, n_chapters, chapter_chars)
+        if book % 2:
+            name = f"book{book:03d}.txt"
+            (directory / name).write_text("Title page\nContents\n\n" + "".join(texts), encoding="utf-8")
+        else:
+            name = f"book{book:03d}.epub"
+            write_epub(directory / name, f"Book {book}", texts)
+        books.append((name, n_chapters))
+    return books
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark corpus ingestion on synthetic books")
+    parser.add_argument("--books", type=int, default=100)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 25, 50, 100])
+    parser.add_argument("--chapters", type=int, default=30, help="Typical chapters per book")
+    parser.add_argument("--chapter-chars", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "source"
+        source.mkdir()
+        books = make_corpus(source, args.books, args.chapters, args.chapter_chars, args.seed)
+
+        print(f"{'books':>6} {'MB':>7} {'chapters':>9} {'expected':>9} {'chunks':>8} "
+              f"{'extract s':>9} {'chunk s':>8} {'ms/book':>8} {'MB/s':>6}")
+        for size in args.sizes:
+            corpus = Path(tmp) / f"corpus{size}"
+            output = Path(tmp) / f"output{size}"
+            corpus.mkdir()
+            for name, _ in books[:size]:
+                os.link(source / name, corpus / name)
+            megabytes = sum((corpus / name).stat().st_size for name, _ in books[:size]) / 2 ** 20
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                chapters_path = process_books(corpus, output, workers=args.workers)
+                extracted = time.perf_counter() - start
+
+                start = time.perf_counter()
+                chunks = create_document_chunks(chapters_path)
+                ids = chunk_ids(chunks)
+                chunked = time.perf_counter() - start
+
+            n_chapters = sum(1 for _ in open(chapters_path, encoding="utf-8"))
+            if len(set(ids)) != len(ids):
+                print(f"warning: {len(ids) - len(set(ids))} duplicate chunk ids")
+            total = extracted + chunked
+            print(
+                f"{size:>6} {megabytes:>7.1f} {n_chapters:>9} {sum(n for _, n in books[:size]):>9} {len(chunks):>8} "
+                f"{extracted:>9.2f} {chunked:>8.2f} {total / size * 1000:>8.1f} {megabytes / total:>6.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Throughput of the Mistral client against the local fake completion server.
+
+Compares the blocking _call path (one request at a time, as the old
+requests.post code behaved inside async handlers) with the pooled async
+_acall path issuing many completions concurrently from one event loop:
+
+    python -m benchmarks.bench_llm_concurrency --requests 100 --concurrency 50 --latency 0.25
+"""
+import argparse
+import asyncio
+import time
+
+from app.llm.model import MistralLLM, close_http_clients
+from benchmarks.fake_mistral_server import start_fake_server
+
+
+def run_sequential(llm, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        llm.invoke("Who is Hagrid?")
+    return time.perf_counter() - start
+
+
+async def run_concurrent(llm, n, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await llm.ainvoke("Who is Hagrid?")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    await close_http_clients()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync vs pooled async LLM calls")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.25, help="Fake server latency per completion")
+    parser.add_argument("--sequential-requests", type=int, default=10)
+    args = parser.parse_args()
+
+    server, url = start_fake_server(latency=args.latency)
+    llm = MistralLLM(api_key="fake", api_url=url)
+
+    try:
+        sequential = run_sequential(llm, args.sequential_requests)
+        concurrent = asyncio.run(run_concurrent(llm, args.requests, args.concurrency))
+    finally:
+        server.shutdown()
+
+    print(f"Fake server latency: {args.latency * 1000:.0f} ms per completion")
+    print(f"sync _call:    {args.sequential_requests / sequential:8.1f} req/s "
+          f"({args.sequential_requests} requests in {sequential:.2f}s)")
+    print(f"async _acall:  {args.requests / concurrent:8.1f} req/s "
+          f"({args.requests} requests, concurrency {args.concurrency}, in {concurrent:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
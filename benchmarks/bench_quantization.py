@@ -0,0 +1,76 @@
+"""
+Recall@k, memory and latency of quantized vector search.
+
+Compares int8 and binary codes (with exact rescoring of the best
+k * multiplier candidates) against exact float32 search over the same
+export. Memory is what each store keeps resident: the float32 matrix for
+the flat store, the codes (plus int8 scales) for the quantized ones, whose
+full-precision vectors stay on disk. Query vectors are stored chunk
+vectors with noise added, so no embedding model is needed. Export the
+index with its codes first:
+
+    python -m preprocessing.export_vector_store --quantize int8 binary
+    python -m benchmarks.bench_quantization --multipliers 1 2 4 8 16
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.llm.vector_store import QUANTIZATIONS, FlatVectorStore, QuantizedVectorStore
+
+settings = get_settings()
+
+
+def run(store, queries, k):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(store._search(query, k, None))
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return results, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark int8 / binary quantized vector search")
+    parser.add_argument("--index", default=str(settings.VECTOR_INDEX_DIR))
+    parser.add_argument("--quantizations", nargs="+", default=list(QUANTIZATIONS), choices=QUANTIZATIONS)
+    parser.add_argument("--multipliers", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=settings.RETRIEVAL_K)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    flat = FlatVectorStore(args.index, mmap=False)
+    rng = np.random.default_rng(args.seed)
+    queries = flat.vectors[rng.integers(0, len(flat), args.queries)].copy()
+    queries += rng.normal(0, args.noise, queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact, p50, p99 = run(flat, queries, args.k)
+    float32_mb = len(flat) * flat.vectors.shape[1] * 4 / 2 ** 20
+
+    print(f"{len(flat)} chunks, {args.queries} queries, k={args.k}")
+    print(f"{'store':>8} {'rescore':>7} {'memory MB':>9} {'vs f32':>6} {'recall@k':>9} {'p50 ms':>7} {'p99 ms':>7}")
+    print(f"{'float32':>8} {'-':>7} {float32_mb:>9.2f} {1:>5.0f}x {1:>9.3f} {p50 * 1000:>7.3f} {p99 * 1000:>7.3f}")
+
+    for quantization in args.quantizations:
+        store = QuantizedVectorStore(args.index, quantization=quantization)
+        extra = store.scales if quantization == "int8" else store.thresholds
+        memory_mb = (store.codes.nbytes + extra.nbytes) / 2 ** 20
+        for multiplier in args.multipliers:
+            store.rescore_multiplier = multiplier
+            results, p50, p99 = run(store, queries, args.k)
+            recall = np.mean([len(set(got) & set(want)) / len(want) for got, want in zip(results, exact)])
+            print(
+                f"{quantization:>8} {multiplier:>6}x {memory_mb:>9.2f} {float32_mb / memory_mb:>5.0f}x "
+                f"{recall:>9.3f} {p50 * 1000:>7.3f} {p99 * 1000:>7.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
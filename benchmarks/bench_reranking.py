@@ -0,0 +1,115 @@
+"""
+Latency added by reranking vs the precision it buys.
+
+Candidates are retrieved once per query (RERANK_CANDIDATES, hybrid when a
+BM25 index is built), then cut to k in retrieval order ("none") or by each
+reranker. Queries come from benchmarks.eval_retrieval: sampled chunk
+sentences by default, or a labelled questions file. Reported per mode:
+hit@1 and MRR@k for the gold passage, the share of top-k pairs that are
+near-duplicates, and the time spent reranking. Reranking is timed
+directly, without the latency budget that would skip it in production:
+
+    python -m benchmarks.bench_reranking --queries 200 --modes none mmr cross_encoder
+"""
+import argparse
+import asyncio
+import re
+import time
+
+from app.core.config import get_settings
+from app.llm.embeddings import get_embeddings_model
+from app.llm.rag import RAGChain
+from app.llm.reranker import CrossEncoderReranker, MMRReranker
+from benchmarks.eval_retrieval import load_queries, sample_queries
+
+settings = get_settings()
+
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text):
+    words = _WORD.findall(text.lower())
+    return {tuple(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+
+def redundancy(docs):
+    """Share of passage pairs sharing at least half of their 3-word shingles"""
+    sets = [shingles(doc.page_content) for doc in docs]
+    pairs = [(a, b) for i, a in enumerate(sets) for b in sets[i + 1:]]
+    if not pairs:
+        return 0.0
+    return sum(len(a & b) >= 0.5 * min(len(a), len(b)) for a, b in pairs) / len(pairs)
+
+
+def make_reranker(mode, rag_chain):
+    gate = {"budget": 0, "max_concurrent": 0}
+    if mode == "mmr":
+        return MMRReranker(
+            rag_chain.vector_store, get_embeddings_model(), lambda_mult=settings.MMR_LAMBDA,
+            cache_bytes=settings.RERANK_CACHE_MB * 1024 * 1024, **gate
+        )
+    if mode == "cross_encoder":
+        return CrossEncoderReranker(
+            settings.CROSS_ENCODER_MODEL, batch_size=settings.RERANK_BATCH_SIZE,
+            cache_size=settings.RERANK_CACHE_SIZE, **gate
+        )
+    return None
+
+
+async def main_async(args):
+    rag_chain = RAGChain()
+    if args.queries_file:
+        queries = load_queries(args.queries_file)
+    else:
+        if not rag_chain.bm25_index:
+            raise SystemExit("Sampling queries needs the BM25 index (python -m preprocessing.build_bm25_index)")
+        queries = sample_queries(rag_chain.bm25_index, args.queries, args.drop_words, args.seed)
+
+    vectors = get_embeddings_model().embed_documents([query for query, _ in queries])
+    candidates = [
+        await rag_chain._candidates(query, vector, args.candidates, None)
+        for (query, _), vector in zip(queries, vectors)
+    ]
+
+    print(f"{len(queries)} queries, {args.candidates} candidates reranked to k={args.k}")
+    print(f"{'mode':>13} {'hit@1':>7} {'MRR@k':>7} {'dup pairs':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode in args.modes:
+        reranker = make_reranker(mode, rag_chain)
+        if reranker:
+            # Load the model outside the timed loop
+            reranker.warm_up(queries[0][0], vectors[0], candidates[0], args.k)
+
+        latencies, hits, reciprocal_ranks, duplicates = [], 0, 0.0, 0.0
+        for (query, is_hit), vector, docs in zip(queries, vectors, candidates):
+            start = time.perf_counter()
+            top = reranker._rerank(query, vector, docs, args.k) if reranker else docs[:args.k]
+            latencies.append(time.perf_counter() - start)
+
+            ranks = [rank for rank, doc in enumerate(top, 1) if is_hit(doc)]
+            hits += bool(ranks and ranks[0] == 1)
+            reciprocal_ranks += 1 / ranks[0] if ranks else 0.0
+            duplicates += redundancy(top)
+
+        latencies.sort()
+        n = len(queries)
+        print(
+            f"{mode:>13} {hits / n:>7.3f} {reciprocal_ranks / n:>7.3f} {duplicates / n:>9.3f} "
+            f"{latencies[n // 2] * 1000:>8.2f} {latencies[int(n * 0.99) - 1] * 1000:>8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval reranking")
+    parser.add_argument("--modes", nargs="+", default=["none", "mmr", "cross_encoder"],
+                        choices=["none", "mmr", "cross_encoder"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--queries-file", default=None)
+    parser.add_argument("--drop-words", type=float, default=0.3)
+    parser.add_argument("--k", type=int, default=settings.RETRIEVAL_K)
+    parser.add_argument("--candidates", type=int, default=settings.RERANK_CANDIDATES)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
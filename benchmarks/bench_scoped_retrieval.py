@@ -0,0 +1,72 @@
+"""
+Search latency and recall@k with and without a book filter.
+
+Queries are sentences sampled from the indexed chunks, so each one has a
+known gold chunk and book. "unscoped" searches the whole collection,
+"scoped" pushes a ``where`` filter on the query's book into the store, as
+/api/chat does when a book is requested or named in the question:
+
+    python -m benchmarks.bench_scoped_retrieval --queries 300 --k 5
+"""
+import argparse
+import random
+import re
+import time
+
+from app.llm.embeddings import get_embeddings_model, get_vector_store
+from app.llm.scope import resolve_scope
+
+_SENTENCE = re.compile(r"[^.!?]{60,200}[.!?]")
+
+
+def sample_queries(vector_store, count, seed):
+    """(question, gold chunk id, book) triples taken from random chunks"""
+    result = vector_store.get(include=["documents", "metadatas"])
+    candidates = list(zip(result["ids"], result["documents"], result["metadatas"]))
+    random.Random(seed).shuffle(candidates)
+
+    queries = []
+    for chunk_id, text, metadata in candidates:
+        sentences = _SENTENCE.findall(text)
+        if sentences and isinstance(metadata.get("book"), int):
+            queries.append((sentences[len(sentences) // 2].strip(), chunk_id, metadata["book"]))
+        if len(queries) == count:
+            break
+    return queries
+
+
+def run(vector_store, vectors, queries, k, scoped):
+    latencies = []
+    hits = 0
+    for vector, (_, gold_id, book) in zip(vectors, queries):
+        where = resolve_scope("", book=book) if scoped else None
+        start = time.perf_counter()
+        docs = vector_store.similarity_search_by_vector(vector, k, filter=where)
+        latencies.append(time.perf_counter() - start)
+        hits += any(doc.id == gold_id for doc in docs)
+
+    latencies.sort()
+    return hits / len(queries), latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark book-scoped retrieval")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vector_store = get_vector_store()
+    queries = sample_queries(vector_store, args.queries, args.seed)
+    # Embed up front so only the search itself is timed
+    vectors = get_embeddings_model().embed_documents([question for question, _, _ in queries])
+
+    print(f"{len(queries)} queries, k={args.k}")
+    print(f"{'mode':>9} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode in ("unscoped", "scoped"):
+        recall, p50, p99 = run(vector_store, vectors, queries, args.k, mode == "scoped")
+        print(f"{mode:>9} {recall:>9.3f} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Cold start, memory and query latency of the vector store backends.
+
+Each backend is measured in a fresh subprocess: time to open the store and
+answer a first query, RSS growth from opening it and running the queries,
+and p50/p99 latency of top-k searches. Query vectors are stored chunk
+vectors with noise added, so no embedding model is needed; recall@k is
+measured against the exact (flat) results. Export the flat/HNSW index
+first with preprocessing/export_vector_store.py:
+
+    python -m benchmarks.bench_vector_store --backends chroma flat hnsw --queries 1000
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import psutil
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+def open_store(backend):
+    from app.llm.vector_store import ChromaVectorStore, FlatVectorStore, HNSWVectorStore
+
+    if backend == "chroma":
+        return ChromaVectorStore(settings.CHROMA_DB_DIR, embeddings=None)
+    if backend == "hnsw":
+        return HNSWVectorStore(settings.VECTOR_INDEX_DIR, ef_search=settings.HNSW_EF_SEARCH)
+    return FlatVectorStore(settings.VECTOR_INDEX_DIR)
+
+
+def worker(backend, queries_path, k):
+    """Runs in the subprocess; prints one JSON line of measurements"""
+    process = psutil.Process()
+    queries = np.load(queries_path)
+    rss_before = process.memory_info().rss
+
+    start = time.perf_counter()
+    store = open_store(backend)
+    store.similarity_search_by_vector(queries[0].tolist(), k)
+    cold_start = time.perf_counter() - start
+
+    latencies, results = [], []
+    for query in queries:
+        vector = query.tolist()
+        start = time.perf_counter()
+        docs = store.similarity_search_by_vector(vector, k)
+        latencies.append(time.perf_counter() - start)
+        results.append([doc.id for doc in docs])
+
+    latencies.sort()
+    print(json.dumps({
+        "cold_start": cold_start,
+        "rss_mb": (process.memory_info().rss - rss_before) / 2 ** 20,
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "results": results
+    }))
+
+
+def make_queries(count, noise, seed, path):
+    from app.llm.vector_store import FlatVectorStore
+
+    vectors = FlatVectorStore(settings.VECTOR_INDEX_DIR).vectors
+    rng = np.random.default_rng(seed)
+    queries = np.asarray(vectors[rng.integers(0, len(vectors), count)], dtype=np.float32)
+    queries += rng.normal(0, noise, queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    np.save(path, queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector store backends")
+    parser.add_argument("--backends", nargs="+", default=["chroma", "flat", "hnsw"], choices=["chroma", "flat", "hnsw"])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=settings.RETRIEVAL_K)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--queries-path", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.queries_path, args.k)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queries_path = str(Path(tmp) / "queries.npy")
+        make_queries(args.queries, args.noise, args.seed, queries_path)
+
+        measurements = {}
+        for backend in ["flat"] + [backend for backend in args.backends if backend != "flat"]:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_vector_store", "--worker", backend,
+                 "--queries-path", queries_path, "--k", str(args.k)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            measurements[backend] = json.loads(output.strip().splitlines()[-1])
+
+    exact = measurements["flat"]["results"]
+    print(f"{args.queries} queries, k={args.k}")
+    print(f"{'backend':>8} {'cold start ms':>13} {'RSS MB':>7} {'p50 ms':>7} {'p99 ms':>7} {'recall@k':>9}")
+    for backend in args.backends:
+        m = measurements[backend]
+        recall = np.mean([len(set(got) & set(want)) / len(want) for got, want in zip(m["results"], exact)])
+        print(
+            f"{backend:>8} {m['cold_start'] * 1000:>13.1f} {m['rss_mb']:>7.1f} "
+            f"{m['p50'] * 1000:>7.3f} {m['p99'] * 1000:>7.3f} {recall:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
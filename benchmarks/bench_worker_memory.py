@@ -0,0 +1,96 @@
+"""
+Per-worker memory of a gunicorn deployment with and without model preloading.
+
+Starts gunicorn with gunicorn.conf.py for each worker count, waits until
+every worker has finished its warm-up, then reports RSS, PSS and USS per
+worker (Linux only; PSS splits shared pages between the processes sharing
+them, so it is the number that shows copy-on-write sharing):
+
+    python -m benchmarks.bench_worker_memory --workers 1 4 8
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import psutil
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+MB = 1024 * 1024
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_warm(master, port, workers, timeout):
+    """Wait until all workers exist and the server has answered /ready repeatedly"""
+    deadline = time.time() + timeout
+    ready_streak = 0
+    while time.time() < deadline:
+        if len(master.children()) == workers:
+            try:
+                ok = requests.get(f"http://127.0.0.1:{port}/ready", timeout=5).status_code == 200
+            except requests.RequestException:
+                ok = False
+            ready_streak = ready_streak + 1 if ok else 0
+            # Workers only accept connections once warm, so many consecutive
+            # successes mean the accept queue is being served by all of them
+            if ready_streak >= workers * 4:
+                time.sleep(2)
+                return
+        time.sleep(0.5)
+    raise TimeoutError(f"gunicorn did not become ready within {timeout}s")
+
+
+def measure(workers, preload, timeout):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}",
+               PRELOAD_MODELS="true" if preload else "false")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        master = psutil.Process(process.pid)
+        wait_until_warm(master, port, workers, timeout)
+        stats = [child.memory_full_info() for child in master.children()]
+        master_stats = master.memory_full_info()
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    count = len(stats)
+    return {
+        "rss": sum(s.rss for s in stats) / count,
+        "pss": sum(s.pss for s in stats) / count,
+        "uss": sum(s.uss for s in stats) / count,
+        # The master holds its share of the preloaded pages, so it counts too
+        "total_pss": sum(s.pss for s in stats) + master_stats.pss,
+        "master_pss": master_stats.pss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-worker RSS/PSS with and without preloading")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'preload':>7} {'RSS/worker':>11} {'PSS/worker':>11} {'USS/worker':>11} "
+          f"{'total PSS':>10} {'master PSS':>11}")
+    for workers in args.workers:
+        for preload in (False, True):
+            m = measure(workers, preload, args.timeout)
+            print(f"{workers:>7} {str(preload):>7} {m['rss'] / MB:>9.0f}MB {m['pss'] / MB:>9.0f}MB "
+                  f"{m['uss'] / MB:>9.0f}MB {m['total_pss'] / MB:>8.0f}MB {m['master_pss'] / MB:>9.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
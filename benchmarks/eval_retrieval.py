@@ -0,0 +1,111 @@
+"""
+Offline recall and latency of vector, BM25 and hybrid (RRF) retrieval.
+
+By default queries are sentences sampled from the book chunks, with a
+fraction of their words dropped so they are not verbatim copies; a query
+is a hit when a retrieved passage contains its sentence. Sentence queries
+favour lexical matching, so for a fairer picture pass hand-labelled
+questions as JSONL ({"question": ..., "source": "Harry Potter Book 1,
+Chapter 3"}); those count as hits when a passage comes from that source:
+
+    python -m benchmarks.eval_retrieval --queries 300 --k 5
+    python -m benchmarks.eval_retrieval --queries-file questions.jsonl
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from app.core.config import get_settings
+from app.llm.bm25 import BM25Index, reciprocal_rank_fusion
+from app.llm.embeddings import get_embeddings_model, get_vector_store
+
+settings = get_settings()
+
+_SENTENCE = re.compile(r"[^.!?\n]{60,200}[.!?]")
+
+
+def sample_queries(index, count, drop_words, seed):
+    """(query, hit test) pairs built from random chunk sentences"""
+    rng = random.Random(seed)
+    documents = list(index.documents)
+    rng.shuffle(documents)
+
+    queries = []
+    for document in documents:
+        sentences = _SENTENCE.findall(document["text"])
+        if not sentences:
+            continue
+        sentence = sentences[len(sentences) // 2].strip()
+        words = [word for word in sentence.split() if rng.random() >= drop_words]
+        queries.append((" ".join(words), lambda doc, sentence=sentence: sentence in doc.page_content))
+        if len(queries) == count:
+            break
+    return queries
+
+
+def load_queries(path):
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                queries.append((item["question"], lambda doc, source=item["source"]: doc.metadata.get("source") == source))
+    return queries
+
+
+def evaluate(retrieve, queries, vectors, k):
+    latencies = []
+    hits = 0
+    for (query, is_hit), vector in zip(queries, vectors):
+        start = time.perf_counter()
+        docs = retrieve(query, vector)
+        latencies.append(time.perf_counter() - start)
+        hits += any(is_hit(doc) for doc in docs[:k])
+
+    latencies.sort()
+    return hits / len(queries), latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate vector, BM25 and hybrid retrieval")
+    parser.add_argument("--index", default=str(settings.BM25_INDEX_DIR))
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--queries-file", default=None)
+    parser.add_argument("--drop-words", type=float, default=0.3, help="Fraction of words removed from sampled sentences")
+    parser.add_argument("--k", type=int, default=settings.RETRIEVAL_K)
+    parser.add_argument("--candidates", type=int, default=settings.HYBRID_CANDIDATES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    index = BM25Index.load(args.index)
+    vector_store = get_vector_store()
+    if args.queries_file:
+        queries = load_queries(args.queries_file)
+    else:
+        queries = sample_queries(index, args.queries, args.drop_words, args.seed)
+
+    # Embedding is the same for every mode, so it is done up front and not timed
+    vectors = get_embeddings_model().embed_documents([query for query, _ in queries])
+    weights = [settings.RRF_VECTOR_WEIGHT, settings.RRF_BM25_WEIGHT]
+
+    def vector_search(query, vector, k=args.k):
+        return vector_store.similarity_search_by_vector(vector, k)
+
+    def bm25_search(query, vector, k=args.k):
+        return index.search(query, k)
+
+    def hybrid_search(query, vector):
+        rankings = [vector_search(query, vector, args.candidates), bm25_search(query, vector, args.candidates)]
+        return reciprocal_rank_fusion(rankings, weights, args.k, settings.RRF_K)
+
+    print(f"{len(queries)} queries, k={args.k}, {args.candidates} candidates per retriever before fusion")
+    print(f"{'mode':>7} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode, retrieve in (("vector", vector_search), ("bm25", bm25_search), ("hybrid", hybrid_search)):
+        recall, p50, p99 = evaluate(retrieve, queries, vectors, args.k)
+        print(f"{mode:>7} {recall:>9.3f} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
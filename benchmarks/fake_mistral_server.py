@@ -0,0 +1,187 @@
+"""
+Local stand-in for the Mistral chat-completions API.
+
+Serves POST /v1/chat/completions in both the regular JSON mode and the
+``stream=true`` server-sent-events mode, so the LLM client and the
+/api/chat streaming path can be exercised without an API key:
+
+    python -m benchmarks.fake_mistral_server --port 8001 --token-delay 0.02
+    MISTRAL_API_URL=http://127.0.0.1:8001/v1/chat/completions uvicorn app.main:app
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "Harry Potter is a young wizard who learns on his eleventh birthday that he is "
+    "famous in the wizarding world.\n\nHe attends Hogwarts School of Witchcraft and Wizardry."
+)
+
+
+class FakeMistralHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Overridden per server in make_server()
+    reply = DEFAULT_REPLY
+    latency = 0.0
+    token_delay = 0.0
+    error_status = None
+    rate_limited = 0
+    retry_after = "1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        model = body.get("model", "mistral-small")
+
+        with self.server.lock:
+            self.server.requests_served += 1
+            throttled = self.server.requests_served <= self.rate_limited
+        if throttled:
+            self.send_response(429)
+            self.send_header("Retry-After", self.retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.error_status:
+            self.send_error(self.error_status)
+            return
+
+        # Time to first token / full response for the non-streaming mode
+        if self.latency:
+            time.sleep(self.latency)
+
+        if body.get("stream"):
+            self._send_stream(model)
+        else:
+            self._send_completion(model)
+
+    def _send_completion(self, model):
+        payload = json.dumps({
+            "id": f"cmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.reply},
+                "finish_reason": "stop"
+            }]
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, model):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        completion_id = f"cmpl-{uuid.uuid4().hex}"
+        words = self.reply.split(" ")
+        for i, word in enumerate(words):
+            token = word if i == len(words) - 1 else word + " "
+            self._write_event({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+            })
+            if self.token_delay:
+                time.sleep(self.token_delay)
+
+        self._write_event({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        })
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _write_event(self, event):
+        self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+class FakeMistralServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Benchmarks open many connections at once; the default backlog of 5 resets them
+    request_queue_size = 256
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests_served = 0
+
+
+def make_server(host="127.0.0.1", port=0, reply=DEFAULT_REPLY, latency=0.0, token_delay=0.0, error_status=None,
+                rate_limited=0, retry_after="1"):
+    """Create (but do not start) a fake server; port 0 picks a free port.
+
+    With ``error_status`` every request is answered with that HTTP error.
+    The first ``rate_limited`` requests get 429 with ``Retry-After:
+    retry_after``. The server counts ``connections`` and ``requests_served``.
+    """
+    handler = type("ConfiguredFakeMistralHandler", (FakeMistralHandler,), {
+        "reply": reply,
+        "latency": latency,
+        "token_delay": token_delay,
+        "error_status": error_status,
+        "rate_limited": rate_limited,
+        "retry_after": retry_after,
+    })
+    return FakeMistralServer((host, port), handler)
+
+
+def start_fake_server(**kwargs):
+    """Start a fake server on a background thread and return (server, completions_url)."""
+    server = make_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1/chat/completions"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Mistral chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first byte")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, latency=args.latency, token_delay=args.token_delay)
+    print(f"Fake Mistral API listening on http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Build the BM25 index used for hybrid retrieval.
+
+The chunks are produced exactly as create_embeddings.py produces them for
+the vector store, so both retrievers rank the same passages:
+
+    python -m preprocessing.build_bm25_index
+"""
+import argparse
+import time
+
+from app.core.config import get_settings
+from app.llm.bm25 import BM25Index
+from preprocessing.create_embeddings import create_document_chunks
+
+settings = get_settings()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the BM25 index for hybrid retrieval")
+    parser.add_argument("--chapters", default=str(settings.CHAPTERS_PATH))
+    parser.add_argument("--output", default=str(settings.BM25_INDEX_DIR))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    chunks = create_document_chunks(args.chapters)
+    index = BM25Index.build(chunks)
+    index.save(args.output)
+
+    print(
+        f"Indexed {len(index)} chunks ({len(index.terms)} terms, {len(index.doc_ids)} postings) "
+        f"at {args.output} in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
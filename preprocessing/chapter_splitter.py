@@ -0,0 +1,143 @@
+"""
+Chapter splitting for ingested books.
+
+A splitter turns the stream of cleaned page texts of one book into chapter
+records. The default, HeadingSplitter, looks for "CHAPTER <number>" headings
+in a single pass with one precompiled pattern; the number may be written in
+digits, roman numerals or words ("Chapter Forty-Two", "CHAPTER ONE HUNDRED
+AND SEVEN"), with no upper limit. Books select a splitter by name in the
+corpus manifest.
+"""
+import re
+from abc import ABC, abstractmethod
+
+_UNITS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+    "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19
+}
+_TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90
+}
+_SCALES = {"thousand": 1000, "million": 1000000}
+_ROMAN = {"I": 1, "V": 5, "X": 10, "L": 50, "C": 100, "D": 500, "M": 1000}
+
+_NUMBER_WORD = "|".join(sorted([*_UNITS, *_TENS, *_SCALES, "hundred"], key=len, reverse=True))
+# Well-formed numerals only, so words like "DID" are not read as numbers
+_ROMAN_NUMERAL = r"(?=[MDCLXVI])M*(?:C[MD]|D?C{0,3})(?:X[CL]|L?X{0,3})(?:I[XV]|V?I{0,3})"
+
+
+def words_to_number(text):
+    """ "forty-two" -> 42, "one hundred and seven" -> 107; None if a word isn't a number"""
+    total = current = 0
+    words = [word for word in re.split(r"[\s-]+", text.lower()) if word and word != "and"]
+    if not words:
+        return None
+    for word in words:
+        if word in _UNITS:
+            current += _UNITS[word]
+        elif word in _TENS:
+            current += _TENS[word]
+        elif word == "hundred":
+            current = max(current, 1) * 100
+        elif word in _SCALES:
+            total += max(current, 1) * _SCALES[word]
+            current = 0
+        else:
+            return None
+    return total + current
+
+
+def roman_to_int(text):
+    values = [_ROMAN[char] for char in text.upper()]
+    return sum(-value if i + 1 < len(values) and value < values[i + 1] else value for i, value in enumerate(values))
+
+
+def parse_number(text):
+    """Chapter number from digits, a roman numeral or words; None if it is none of them"""
+    text = text.strip()
+    if text.isdigit():
+        return int(text)
+    if re.fullmatch(_ROMAN_NUMERAL, text):
+        return roman_to_int(text)
+    return words_to_number(text)
+
+
+def heading_pattern(keywords=("CHAPTER", "Chapter")):
+    """Pattern for "<keyword> <number>"; the number never continues past the line"""
+    words = rf"(?i:(?:{_NUMBER_WORD})\b(?:[ \t-]+(?:and[ \t-]+)?(?:{_NUMBER_WORD})\b)*)"
+    keyword = "|".join(re.escape(keyword) for keyword in keywords)
+    # The lookbehind keeps the numeral from matching empty before a non-numeral word
+    roman = rf"{_ROMAN_NUMERAL}(?<=[MDCLXVI])\b"
+    return re.compile(rf"\b(?:{keyword})[ \t]+(?P<number>\d+\b|{roman}|{words})")
+
+
+HEADING_PATTERN = heading_pattern()
+
+
+class ChapterSplitter(ABC):
+    """Turns a book's cleaned page texts into chapter records, yielding each once it ends"""
+
+    @abstractmethod
+    def split(self, pages, book, book_title=None):
+        ...
+
+    @staticmethod
+    def chapter(book, number, text, book_title=None):
+        record = {"book": book, "chapter": number, "text": text.strip()}
+        if book_title:
+            record["book_title"] = book_title
+        return record
+
+
+class HeadingSplitter(ChapterSplitter):
+    """Starts a chapter at every numbered heading.
+
+    A heading repeating the current chapter's number is a running page
+    header, not a new chapter, and is left in the text. Text before the
+    first heading (title pages, contents) is dropped.
+    """
+
+    def __init__(self, keywords=None):
+        self.pattern = heading_pattern(tuple(keywords)) if keywords else HEADING_PATTERN
+
+    def split(self, pages, book, book_title=None):
+        number = None
+        parts = []
+        for page in pages:
+            position = 0
+            # Headings never span pages: every page ends with a newline
+            for match in self.pattern.finditer(page):
+                heading_number = parse_number(match.group("number"))
+                if heading_number is None or heading_number == number:
+                    continue
+                if number is not None:
+                    parts.append(page[position:match.start()])
+                    yield self.chapter(book, number, "".join(parts), book_title)
+                number = heading_number
+                parts = []
+                position = match.start()
+            if number is not None:
+                parts.append(page[position:])
+
+        if number is not None:
+            yield self.chapter(book, number, "".join(parts), book_title)
+
+
+class WholeBookSplitter(ChapterSplitter):
+    """The whole book as chapter 1, for texts without chapter headings"""
+
+    def split(self, pages, book, book_title=None):
+        yield self.chapter(book, 1, "".join(pages), book_title)
+
+
+SPLITTERS = {
+    "heading": HeadingSplitter,
+    "whole": WholeBookSplitter
+}
+
+
+def get_splitter(name="heading", **options):
+    if name not in SPLITTERS:
+        raise ValueError(f"Unknown chapter splitter {name!r}; choose from {', '.join(SPLITTERS)}")
+    return SPLITTERS[name](**options)
@@ -0,0 +1,109 @@
+"""
+Token-aware chunking on sentence boundaries.
+
+Chunks are measured in the embedding model's own tokens, so none runs past
+what the model embeds (MiniLM reads at most 256 word pieces) and prompt
+budgets can rely on their size. A chunk is a run of whole sentences; only a
+single sentence longer than the budget is cut, at a token boundary.
+Consecutive chunks share up to ``overlap_tokens`` of trailing sentences.
+
+Each chunk is returned as character offsets into the text, so that
+neighbouring chunks can later be stitched together exactly.
+"""
+import os
+import re
+
+import numpy as np
+
+# End of a sentence: punctuation, optional closing quotes or brackets, whitespace
+_SENTENCE_END = re.compile(r"[.!?]+[\"'”’)\]]*\s+")
+
+
+def load_tokenizer(name):
+    """The HF tokenizer ``name``, downloaded once from the hub.
+
+    Raises instead of falling back to estimates: chunks measured in guessed
+    tokens can run past what the embedding model reads, for the whole index.
+    """
+    try:
+        from tokenizers import Tokenizer
+
+        return Tokenizer.from_pretrained(name, token=os.getenv("HF_TOKEN"))
+    except Exception as e:
+        raise RuntimeError(f"Could not load tokenizer {name} (set HF_TOKEN if the repo is gated): {e}") from e
+
+
+def sentence_spans(text):
+    """(start, end) of each sentence, trailing whitespace included"""
+    spans = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        spans.append((start, match.end()))
+        start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+class TokenChunker:
+    """Packs whole sentences into chunks of at most ``max_tokens`` tokens"""
+
+    def __init__(self, tokenizer=None, max_tokens=128, overlap_tokens=32):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def token_starts(self, text):
+        """Character offset where each token starts; one token per 4 characters without a tokenizer"""
+        if self.tokenizer is None:
+            return np.arange(0, len(text), 4)
+        encoding = self.tokenizer.encode(text, add_special_tokens=False)
+        return np.array([start for start, _ in encoding.offsets], dtype=np.int64)
+
+    def split(self, text):
+        """Chunk offsets (start, end) in reading order; text[start:end] is the chunk"""
+        spans = sentence_spans(text)
+        if not spans:
+            return []
+
+        # One tokenization of the whole text gives every sentence's length
+        starts = self.token_starts(text)
+        bounds = np.searchsorted(starts, [start for start, _ in spans] + [len(text)])
+        counts = np.diff(bounds)
+
+        chunks = []
+        i = 0
+        while i < len(spans):
+            j, tokens = i, 0
+            while j < len(spans) and tokens + counts[j] <= self.max_tokens:
+                tokens += counts[j]
+                j += 1
+
+            if j == i:
+                # A single sentence over budget: cut it every max_tokens tokens
+                cuts = starts[bounds[i]:bounds[i + 1]:self.max_tokens].tolist()[1:]
+                edges = [spans[i][0]] + cuts + [spans[i][1]]
+                chunks.extend(zip(edges, edges[1:]))
+                i += 1
+                continue
+
+            chunks.append((spans[i][0], spans[j - 1][1]))
+            if j == len(spans):
+                break
+
+            # Start the next chunk with the trailing sentences that fit the overlap
+            k, overlap = j, 0
+            while k - 1 > i and overlap + counts[k - 1] <= self.overlap_tokens:
+                overlap += counts[k - 1]
+                k -= 1
+            i = k
+
+        return [self._trim(text, start, end) for start, end in chunks if text[start:end].strip()]
+
+    @staticmethod
+    def _trim(text, start, end):
+        """Offsets without the surrounding whitespace"""
+        chunk = text[start:end]
+        return start + len(chunk) - len(chunk.lstrip()), start + len(chunk.rstrip())
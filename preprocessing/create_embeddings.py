@@ -1,84 +1,232 @@
 # backend/create_embeddings.py
-import os
-import json
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
+"""
+Chunk the chapters and embed them into the Chroma store the API reads.
+
+Incremental: every chunk carries a hash of its text (and the embedding
+model) in its metadata, so a re-run only embeds chunks that are new or
+changed. Chunks whose text is already stored under another id, such as
+after a chunking change renumbers them, reuse the stored vector. Chunks
+are embedded in batches by a small worker pool, and each batch is written
+as soon as it is ready. The store is therefore its own checkpoint: an
+interrupted run resumes where it stopped when restarted.
+
+    python -m preprocessing.create_embeddings --batch-size 64 --workers 2
+"""
+import argparse
+import hashlib
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 from langchain.docstore.document import Document
+from app.core.config import get_settings
+from app.llm.chapter_index import ChapterIndex
+from preprocessing.chunker import TokenChunker, load_tokenizer
+from preprocessing.process_books import load_chapters
+
+settings = get_settings()
+
+# The collection langchain_chroma opens by default, which the API reads
+COLLECTION_NAME = "langchain"
 
 
-def create_document_chunks(chapters_json_path):
+def create_document_chunks(chapters_json_path, chunker=None):
     """
-    Load chapters and split them into smaller chunks for embedding.
+    Load chapters and split them into token-bounded chunks for embedding.
     """
-    # Load chapters
-    with open(chapters_json_path, "r", encoding="utf-8") as f:
-        chapters = json.load(f)
+    chunker = chunker or TokenChunker(
+        load_tokenizer(settings.EMBEDDING_TOKENIZER),
+        settings.CHUNK_TOKENS,
+        settings.CHUNK_OVERLAP_TOKENS
+    )
 
-    # Convert to LangChain documents
-    documents = []
+    chunks = []
+    n_chapters = 0
+    # Where each entry starts in its chapter's text; older chapter files
+    # split a chapter over several entries, read as joined by newlines
+    chapter_offsets = {}
 
-    for chapter in chapters:
+    for chapter in load_chapters(chapters_json_path):
+        n_chapters += 1
         # Create metadata for better retrieval context
+        book_title = chapter.get("book_title") or f"Harry Potter Book {chapter['book']}"
         metadata = {
             "book": chapter["book"],
             "chapter": chapter["chapter"],
-            "source": f"Harry Potter Book {chapter['book']}, Chapter {chapter['chapter']}"
+            "source": f"{book_title}, Chapter {chapter['chapter']}"
         }
 
-        # Create document with text and metadata
-        doc = Document(
-            page_content=chapter["text"],
-            metadata=metadata
-        )
+        text = chapter["text"]
+        book_chapter = (chapter["book"], chapter["chapter"])
+        offset = chapter_offsets.get(book_chapter, 0)
+        chapter_offsets[book_chapter] = offset + len(text) + 1
 
-        documents.append(doc)
+        for start, end in chunker.split(text):
+            chunks.append(Document(
+                page_content=text[start:end],
+                metadata={**metadata, "start_index": offset + start, "end_index": offset + end}
+            ))
 
-    # Split documents into smaller chunks for better retrieval
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=512,
-        chunk_overlap=128,
-        separators=["\n\n", "\n", ".", "?", "!"]
-    )
+    # A chapter spans several entries; number its chunks in reading order so
+    # chapter summaries can fetch the whole chapter back in sequence
+    positions = {}
+    for chunk in chunks:
+        book_chapter = (chunk.metadata["book"], chunk.metadata["chapter"])
+        chunk.metadata["chunk_index"] = positions.get(book_chapter, 0)
+        positions[book_chapter] = chunk.metadata["chunk_index"] + 1
 
-    chunks = text_splitter.split_documents(documents)
-    print(f"Created {len(chunks)} chunks from {len(documents)} chapters")
+    print(f"Created {len(chunks)} chunks from {n_chapters} chapters")
 
     return chunks
 
 
-def create_vector_store(chunks, persist_directory):
+def chunk_ids(chunks):
+    """Stable ids: book{b}-chapter{c}-{position in the chapter}"""
+    return [
+        f"book{chunk.metadata['book']}-chapter{chunk.metadata['chapter']}-{chunk.metadata['chunk_index']}"
+        for chunk in chunks
+    ]
+
+
+def content_hash(text, model_name):
+    return hashlib.sha1(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _upsert(collection, entries, vectors):
+    """Write (id, chunk) entries with their vectors"""
+    collection.upsert(
+        ids=[chunk_id for chunk_id, _ in entries],
+        embeddings=[list(map(float, vector)) for vector in vectors],
+        documents=[chunk.page_content for _, chunk in entries],
+        metadatas=[chunk.metadata for _, chunk in entries]
+    )
+
+
+def create_vector_store(chunks, ids, persist_directory, embeddings, model_name, batch_size=64, workers=2):
     """
-    Create vector embeddings and store them in ChromaDB.
+    Bring the Chroma store in line with the chunks, embedding only what changed.
     """
-    # Initialize HuggingFace embeddings
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-
-    # Create vector store
-    vectordb = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=persist_directory
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=str(persist_directory)).get_or_create_collection(COLLECTION_NAME)
+    stored = collection.get(include=["metadatas"])
+    stored_metadata = dict(zip(stored["ids"], stored["metadatas"]))
+    stored_by_hash = {
+        metadata["content_hash"]: chunk_id
+        for chunk_id, metadata in stored_metadata.items()
+        if metadata and "content_hash" in metadata
+    }
+
+    # Chunks to write, grouped by text so repeated passages are embedded once
+    pending = {}
+    for chunk, chunk_id in zip(chunks, ids):
+        chunk.metadata["content_hash"] = content_hash(chunk.page_content, model_name)
+        if stored_metadata.get(chunk_id) != chunk.metadata:
+            pending.setdefault(chunk.metadata["content_hash"], []).append((chunk_id, chunk))
+    stale = sorted(set(stored_metadata) - set(ids))
+
+    reusable = [text_hash for text_hash in pending if text_hash in stored_by_hash]
+    to_embed = [text_hash for text_hash in pending if text_hash not in stored_by_hash]
+    print(
+        f"{len(chunks)} chunks: {len(chunks) - sum(map(len, pending.values()))} unchanged, "
+        f"{len(reusable)} texts with stored vectors, {len(to_embed)} texts to embed, {len(stale)} stale"
     )
 
-    # Persist vector store to disk
-    vectordb.persist()
-    print(f"Created vector store with {len(chunks)} chunks at {persist_directory}")
+    for batch in _batches(reusable, batch_size):
+        found = collection.get(ids=[stored_by_hash[text_hash] for text_hash in batch], include=["embeddings"])
+        vectors = dict(zip(found["ids"], found["embeddings"]))
+        entries, entry_vectors = [], []
+        for text_hash in batch:
+            vector = vectors.get(stored_by_hash[text_hash])
+            if vector is None:
+                to_embed.append(text_hash)
+                continue
+            entries.extend(pending[text_hash])
+            entry_vectors.extend([vector] * len(pending[text_hash]))
+        if entries:
+            _upsert(collection, entries, entry_vectors)
+
+    def write(batch, future):
+        nonlocal embedded
+        vectors = future.result()
+        entries, entry_vectors = [], []
+        for text_hash, vector in zip(batch, vectors):
+            entries.extend(pending[text_hash])
+            entry_vectors.extend([vector] * len(pending[text_hash]))
+        _upsert(collection, entries, entry_vectors)
+        embedded += len(batch)
+        elapsed = time.perf_counter() - start
+        print(f"Embedded {embedded}/{len(to_embed)} texts ({embedded / elapsed:.1f} chunks/s)")
+
+    embedded = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Bounded so the chunks stream through instead of all being queued at once
+        in_flight = deque()
+        for batch in _batches(to_embed, batch_size):
+            texts = [pending[text_hash][0][1].page_content for text_hash in batch]
+            in_flight.append((batch, pool.submit(embeddings.embed_documents, texts)))
+            if len(in_flight) >= workers * 2:
+                write(*in_flight.popleft())
+        while in_flight:
+            write(*in_flight.popleft())
+
+    # Removed last, so an interrupted run never leaves the store missing chunks
+    for batch in _batches(stale, batch_size):
+        collection.delete(ids=batch)
+
+    elapsed = time.perf_counter() - start
+    if embedded:
+        print(f"Embedded {embedded} texts in {elapsed:.1f}s ({embedded / elapsed:.1f} chunks/s)")
+    print(f"Vector store at {persist_directory} holds {collection.count()} chunks")
+
+    return collection
+
+
+def create_chapter_index(chunks, ids, index_path):
+    """
+    Save the (book, chapter) -> ordered chunk ids index used for chapter summaries.
+    """
+    index = ChapterIndex()
+    for chunk, chunk_id in zip(chunks, ids):
+        if isinstance(chunk.metadata["chapter"], int):
+            index.add(chunk.metadata["book"], chunk.metadata["chapter"], chunk_id)
 
-    return vectordb
+    index.save(index_path)
+    print(f"Indexed {len(index)} chapters at {index_path}")
 
 
 def main():
-    # Paths
-    data_dir = r"C:\Users\sumit jha\Desktop\codes\Storybook\backend\data\processed"
-    chapters_path = os.path.join(data_dir, "all_chapters.json")
-    vector_store_dir = os.path.join(data_dir, "chroma_db")
-
-    # Create chunks from chapters
-    chunks = create_document_chunks(chapters_path)
+    parser = argparse.ArgumentParser(description="Embed the book chunks into the Chroma store")
+    parser.add_argument("--chapters", default=str(settings.CHAPTERS_PATH))
+    parser.add_argument("--persist-dir", default=str(settings.CHROMA_DB_DIR))
+    parser.add_argument("--chapter-index", default=str(settings.CHAPTER_INDEX_PATH))
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--tokenizer", default=settings.EMBEDDING_TOKENIZER, help="Tokenizer chunks are measured in")
+    parser.add_argument("--chunk-tokens", type=int, default=settings.CHUNK_TOKENS)
+    parser.add_argument("--chunk-overlap-tokens", type=int, default=settings.CHUNK_OVERLAP_TOKENS)
+    parser.add_argument("--batch-size", type=int, default=64, help="Texts per embed_documents call")
+    parser.add_argument("--workers", type=int, default=2, help="Batches embedded concurrently")
+    args = parser.parse_args()
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    embeddings = HuggingFaceEmbeddings(
+        model_name=args.model,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
 
-    # Create and save vector store
-    create_vector_store(chunks, vector_store_dir)
+    chunker = TokenChunker(load_tokenizer(args.tokenizer), args.chunk_tokens, args.chunk_overlap_tokens)
+    chunks = create_document_chunks(args.chapters, chunker)
+    ids = chunk_ids(chunks)
+    create_vector_store(chunks, ids, args.persist_dir, embeddings, args.model, args.batch_size, args.workers)
+    create_chapter_index(chunks, ids, args.chapter_index)
 
 
 if __name__ == "__main__":
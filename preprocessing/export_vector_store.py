@@ -0,0 +1,69 @@
+"""
+Export the Chroma collection to the in-process vector index.
+
+Reads every chunk (id, text, metadata and the embedding Chroma already
+computed) from data/processed/chroma_db and writes the memory-mapped flat
+index served with VECTOR_STORE_BACKEND=flat (or auto). --hnsw also builds
+the graph for VECTOR_STORE_BACKEND=hnsw (needs hnswlib), and --quantize
+writes the codes for VECTOR_STORE_BACKEND=int8 / binary:
+
+    python -m preprocessing.export_vector_store --dtype float16 --hnsw
+    python -m preprocessing.export_vector_store --quantize int8 binary
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.llm.vector_store import QUANTIZATIONS, build_hnsw_index, write_quantized_codes, write_vector_store
+
+settings = get_settings()
+
+
+def read_chroma(persist_directory, batch_size):
+    from langchain_chroma import Chroma
+
+    store = Chroma(persist_directory=str(persist_directory))
+    total = store._collection.count()
+
+    ids, vectors, documents, metadatas = [], [], [], []
+    for offset in range(0, total, batch_size):
+        batch = store.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+        ids.extend(batch["ids"])
+        vectors.extend(batch["embeddings"])
+        documents.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+    return ids, np.asarray(vectors, dtype=np.float32), documents, metadatas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Chroma to the flat/HNSW vector index")
+    parser.add_argument("--chroma-dir", default=str(settings.CHROMA_DB_DIR))
+    parser.add_argument("--output", default=str(settings.VECTOR_INDEX_DIR))
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--hnsw", action="store_true", help="Also build the HNSW graph")
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--hnsw-ef-construction", type=int, default=200)
+    parser.add_argument("--quantize", nargs="+", default=[], choices=QUANTIZATIONS, help="Also write quantized codes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ids, vectors, documents, metadatas = read_chroma(args.chroma_dir, args.batch_size)
+    write_vector_store(args.output, ids, vectors, documents, metadatas, dtype=args.dtype)
+    print(f"Exported {len(ids)} chunks ({vectors.shape[1]} dims, {args.dtype}) to {args.output}")
+
+    if args.hnsw:
+        build_hnsw_index(args.output, m=args.hnsw_m, ef_construction=args.hnsw_ef_construction)
+        print(f"Built HNSW index (M={args.hnsw_m}, ef_construction={args.hnsw_ef_construction})")
+
+    for quantization in args.quantize:
+        write_quantized_codes(args.output, quantization)
+        print(f"Wrote {quantization} codes")
+
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Precompute /api/summarize answers for the known target space.
+
+Generates summaries for every chapter in all_chapters.jsonl and for the
+characters, locations, spells and houses listed in summary_targets.json, in
+every response mode, and writes them to the compact store the API serves
+from. Existing entries are kept unless --force is given, so an interrupted
+run can simply be restarted:
+
+    python -m preprocessing.precompute_summaries --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from app.core.config import get_settings
+from app.llm.prompts import RESPONSE_MODES
+from app.llm.rag import get_rag_chain
+from app.llm.summary_store import SummaryStore, build_aliases, chapter_key
+from preprocessing.process_books import load_chapters
+
+settings = get_settings()
+HERE = Path(__file__).resolve().parent
+
+
+def load_targets(targets_path, chapters_path):
+    """Return the aliases per type and the (type, canonical name) pairs to summarize"""
+    with open(targets_path, "r", encoding="utf-8") as f:
+        named_targets = json.load(f)
+
+    aliases = {summary_type: build_aliases(names) for summary_type, names in named_targets.items()}
+    targets = [(summary_type, name) for summary_type, names in named_targets.items() for name in names]
+
+    seen = set()
+    for chapter in load_chapters(chapters_path):
+        if not isinstance(chapter["chapter"], int):
+            continue
+        key = chapter_key(chapter["book"], chapter["chapter"])
+        if key not in seen:
+            seen.add(key)
+            targets.append(("chapter", key))
+
+    return aliases, targets
+
+
+async def precompute(store, targets, modes, concurrency, checkpoint_every, output_path, force):
+    rag_chain = get_rag_chain()
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+    failed = 0
+
+    jobs = [
+        (summary_type, name, mode)
+        for summary_type, name in targets
+        for mode in modes
+        if force or SummaryStore.make_key(summary_type, mode, name) not in store
+    ]
+    print(f"{len(jobs)} summaries to generate ({len(store)} already stored)")
+
+    async def run(summary_type, name, mode):
+        nonlocal done, failed
+        async with semaphore:
+            summary, sources = await rag_chain.generate_summary(summary_type, name, mode)
+
+        # generate_summary reports failures as text without sources
+        if sources:
+            store.add(summary_type, mode, name, summary, sources)
+            done += 1
+        else:
+            failed += 1
+            print(f"Skipped {summary_type} '{name}' ({mode}): {summary[:80]}")
+
+        if done and done % checkpoint_every == 0:
+            store.save(output_path)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(*job) for job in jobs))
+    store.save(output_path)
+
+    elapsed = time.perf_counter() - start
+    print(f"Generated {done} summaries ({failed} failed) in {elapsed:.1f}s; store has {len(store)} entries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute summaries for /api/summarize")
+    parser.add_argument("--targets", default=str(HERE / "summary_targets.json"))
+    parser.add_argument("--chapters", default=str(settings.CHAPTERS_PATH))
+    parser.add_argument("--output", default=str(settings.SUMMARY_STORE_PATH))
+    parser.add_argument("--modes", nargs="+", default=list(RESPONSE_MODES), choices=RESPONSE_MODES)
+    parser.add_argument("--types", nargs="+", default=None, help="Only these summary types (default: all)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Summaries generated in parallel")
+    parser.add_argument("--checkpoint-every", type=int, default=20)
+    parser.add_argument("--force", action="store_true", help="Regenerate entries that already exist")
+    args = parser.parse_args()
+
+    aliases, targets = load_targets(args.targets, args.chapters)
+    if args.types:
+        targets = [target for target in targets if target[0] in args.types]
+
+    output_path = Path(args.output)
+    store = SummaryStore.load(output_path) if output_path.exists() else SummaryStore()
+    store.aliases = aliases
+
+    asyncio.run(precompute(store, targets, args.modes, args.concurrency, args.checkpoint_every, output_path, args.force))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,134 @@
 # backend/process_books.py
+"""
+Extract the chapters of the corpus books into all_chapters.jsonl.
+
+The books are listed in manifest.json in the corpus directory, which
+gives each file its book number, title and chapter splitter. PDF, EPUB
+and TXT files found in the directory but missing from the manifest are
+appended to it with the next free numbers, so a book keeps its number
+(and its chunks keep their ids) as the corpus grows.
+
+Pages of all books are extracted in parallel by a process pool and streamed,
+in reading order, through cleaning and chapter splitting; each chapter is
+written as one JSON line as soon as it is complete. A book whose content
+hash and manifest entry match the previous run is not extracted again: its
+chapters are copied over from the previous output.
+
+    python -m preprocessing.process_books --workers 4
+"""
+import argparse
+import hashlib
+import json
 import os
+import posixpath
 import re
-import json
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
 from pypdf import PdfReader
 
+from app.core.config import get_settings
+from preprocessing.chapter_splitter import get_splitter
+
+settings = get_settings()
+
+BOOK_FORMATS = (".pdf", ".epub", ".txt")
+MANIFEST_NAME = "manifest.json"
+# TXT files are handed to the pipeline in blocks of about this many characters
+TXT_BLOCK_CHARS = 1 << 16
+
+_EPUB_NS = {
+    "container": "urn:oasis:names:tc:opendocument:xmlns:container",
+    "opf": "http://www.idpf.org/2007/opf"
+}
+_BLOCK_TAGS = {"p", "div", "br", "li", "tr", "section", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote"}
 
 def extract_text_from_pdf(pdf_path):
     """Extract text content from a PDF file."""
     reader = PdfReader(pdf_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text
+    return "".join(page.extract_text() + "\n" for page in reader.pages)
+
+
+def extract_pages(pdf_path, start, end):
+    """Text of pages [start, end) of a PDF; runs in the worker processes."""
+    reader = PdfReader(pdf_path)
+    return [reader.pages[i].extract_text() + "\n" for i in range(start, end)]
+
+
+class _HTMLText(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style", "head"):
+            self._skip += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style", "head"):
+            self._skip = max(0, self._skip - 1)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def extract_epub_sections(epub_path):
+    """Text of each document in an EPUB's reading order (its spine)."""
+    with zipfile.ZipFile(epub_path) as epub:
+        container = ElementTree.fromstring(epub.read("META-INF/container.xml"))
+        opf_path = container.find(".//container:rootfile", _EPUB_NS).get("full-path")
+        opf = ElementTree.fromstring(epub.read(opf_path))
+        hrefs = {item.get("id"): item.get("href") for item in opf.iterfind(".//opf:manifest/opf:item", _EPUB_NS)}
+
+        sections = []
+        for itemref in opf.iterfind(".//opf:spine/opf:itemref", _EPUB_NS):
+            href = posixpath.normpath(posixpath.join(posixpath.dirname(opf_path), unquote(hrefs[itemref.get("idref")])))
+            parser = _HTMLText()
+            parser.feed(epub.read(href).decode("utf-8", errors="replace"))
+            sections.append("".join(parser.parts) + "\n")
+        return sections
+
+
+def extract_txt_blocks(txt_path):
+    """A TXT file in blocks of whole lines."""
+    blocks, lines, size = [], [], 0
+    with open(txt_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            lines.append(line)
+            size += len(line)
+            if size >= TXT_BLOCK_CHARS:
+                blocks.append("".join(lines))
+                lines, size = [], 0
+    blocks.append("".join(lines))
+    if not blocks[-1].endswith("\n"):
+        blocks[-1] += "\n"
+    return blocks
+
+
+def extraction_tasks(path, pages_per_task):
+    """(function, *args) tasks whose results, in order, are the book's pages"""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".pdf":
+        n_pages = len(PdfReader(path).pages)
+        return [
+            (extract_pages, path, start, min(start + pages_per_task, n_pages))
+            for start in range(0, n_pages, pages_per_task)
+        ]
+    if suffix == ".epub":
+        return [(extract_epub_sections, path)]
+    return [(extract_txt_blocks, path)]
 
 
 def clean_text(text):
@@ -21,89 +138,195 @@ def clean_text(text):
     return text
 
 
+def clean_pages(pages):
+    """Clean page by page, with the same result as cleaning the joined text."""
+    for i, page in enumerate(pages):
+        page = clean_text(page)
+        # Every page ends with a newline, so a leading one would double it
+        yield page.lstrip("\n") if i else page
+
+
 def extract_chapters(text, book_number):
-    chapter_pattern = re.compile(r'CHAPTER (\d+|[IVX]+|[A-Z ]+)')
-    chapter_matches = list(chapter_pattern.finditer(text))
+    return list(get_splitter().split([text], book_number))
+
+
+def load_chapters(path):
+    """Yield chapters from all_chapters.jsonl (or an older all_chapters.json list)."""
+    path = Path(path)
+    if not path.exists() and path.with_suffix(".json").exists():
+        path = path.with_suffix(".json")
+
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".json":
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
 
-    number_map = {
-        'ONE': 1, 'TWO': 2, 'THREE': 3, 'FOUR': 4, 'FIVE': 5,
-        'SIX': 6, 'SEVEN': 7, 'EIGHT': 8, 'NINE': 9, 'TEN': 10,
-        'ELEVEN': 11, 'TWELVE': 12, 'THIRTEEN': 13, 'FOURTEEN': 14, 'FIFTEEN': 15,
-        'SIXTEEN': 16, 'SEVENTEEN': 17, 'EIGHTEEN': 18, 'NINETEEN': 19, 'TWENTY': 20,
-        'TWENTY ONE': 21, 'TWENTY TWO': 22, 'TWENTY THREE': 23, 'TWENTY FOUR': 24, 'TWENTY FIVE': 25,
-        'TWENTY SIX': 26, 'TWENTY SEVEN': 27, 'TWENTY EIGHT': 28, 'TWENTY NINE': 29, 'THIRTY': 30,
-        'THIRTY ONE': 31, 'THIRTY TWO': 32, 'THIRTY THREE': 33, 'THIRTY FOUR': 34, 'THIRTY FIVE': 35,
-        'THIRTY SIX': 36, 'THIRTY SEVEN': 37, 'THIRTY EIGHT': 38, 'THIRTY NINE': 39, 'FORTY': 40
-    }
 
-    chapters = []
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-    for i in range(len(chapter_matches)):
-        start_pos = chapter_matches[i].start()
-        end_pos = chapter_matches[i + 1].start() if i < len(chapter_matches) - 1 else len(text)
-        chapter_text = text[start_pos:end_pos]
 
-        chapter_header = chapter_matches[i].group(0)
-        chapter_num = chapter_matches[i].group(1)
+def _ordered_results(pool, tasks, window):
+    """Run (fn, *args) tasks on the pool, yielding results in task order.
 
-        # Normalize the chapter number
-        chapter_num_stripped = chapter_num.upper().strip()
-        if chapter_num_stripped in number_map:
-            chapter_id = number_map[chapter_num_stripped]
-        else:
-            chapter_id = chapter_num
+    At most ``window`` tasks are pending at a time, so pages are not piling
+    up in memory faster than they are consumed.
+    """
+    pending = deque()
+    tasks = iter(tasks)
+    for task in tasks:
+        pending.append(pool.submit(*task))
+        if len(pending) >= window:
+            break
+    while pending:
+        result = pending.popleft().result()
+        for task in tasks:
+            pending.append(pool.submit(*task))
+            break
+        yield result
 
-        chapter = {
-            "book": book_number,
-            "chapter": int(chapter_id) if str(chapter_id).isdigit() else chapter_id,
-            "text": chapter_text.strip()
-        }
 
-        chapters.append(chapter)
+def _natural_key(path):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", path)]
 
-    return chapters
 
+def load_manifest(corpus_dir):
+    """The corpus manifest, with books found in the directory but not yet listed appended"""
+    corpus_dir = Path(corpus_dir)
+    manifest_path = corpus_dir / MANIFEST_NAME
+    books = []
+    if manifest_path.exists():
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            books = json.load(f)["books"]
 
-def process_books(pdf_dir, output_dir):
+    listed = {entry["file"] for entry in books}
+    found = sorted(
+        (
+            path.relative_to(corpus_dir).as_posix()
+            for path in corpus_dir.rglob("*")
+            if path.suffix.lower() in BOOK_FORMATS and path.is_file()
+        ),
+        key=_natural_key
+    )
+    new = [path for path in found if path not in listed]
+    if new:
+        next_book = max((entry["book"] for entry in books), default=0) + 1
+        for number, path in enumerate(new, next_book):
+            books.append({"book": number, "file": path, "title": Path(path).stem})
+            print(f"Added {path} to the manifest as book {number}")
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"books": books}, f, indent=2)
+
+    return books
+
+
+def _previous_lines(output_path):
+    """The previous output's JSON lines, by book"""
+    lines = {}
+    if os.path.exists(output_path):
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    lines.setdefault(json.loads(line)["book"], []).append(line)
+    return lines
+
+
+def process_books(corpus_dir, output_dir, workers=None, pages_per_task=16, force=False):
     os.makedirs(output_dir, exist_ok=True)
-    all_chapters = []
+    output_path = os.path.join(output_dir, "all_chapters.jsonl")
+    state_path = os.path.join(output_dir, "extraction_manifest.json")
+
+    state = {}
+    if os.path.exists(state_path) and not force:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    previous = _previous_lines(output_path)
+
+    books = []  # (manifest entry, path, fingerprint, extraction tasks or None when unchanged)
+    for entry in load_manifest(corpus_dir):
+        filepath = os.path.join(corpus_dir, entry["file"])
+        if not os.path.exists(filepath):
+            print(f"Warning: Book {entry['book']} file not found at {filepath}")
+            continue
+        # The entry is part of the fingerprint: a new title or splitter re-extracts the book
+        fingerprint = file_hash(filepath) + ":" + json.dumps(entry, sort_keys=True)
+        unchanged = state.get(entry["file"]) == fingerprint and entry["book"] in previous
+        books.append((entry, filepath, fingerprint, None if unchanged else extraction_tasks(filepath, pages_per_task)))
+
+    tasks = [task for _, _, _, book_tasks in books if book_tasks for task in book_tasks]
+    workers = workers or os.cpu_count()
+    total_chapters = 0
+    total_pages = 0
+    start_time = time.perf_counter()
+
+    tmp_path = output_path + ".tmp"
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(tmp_path, "w", encoding="utf-8") as out:
+        results = _ordered_results(pool, tasks, window=workers * 2)
 
-    books = {
-        1: "HP1.pdf",
-        2: "HP2.pdf",
-        3: "HP3.pdf",
-        4: "HP4.pdf"
-    }
+        for entry, filepath, fingerprint, book_tasks in books:
+            book_num = entry["book"]
+            if book_tasks is None:
+                out.writelines(previous[book_num])
+                total_chapters += len(previous[book_num])
+                print(f"Book {book_num} unchanged, kept {len(previous[book_num])} chapters")
+                continue
 
-    for book_num, filename in books.items():
-        filepath = os.path.join(pdf_dir, filename)
+            def book_pages(n_tasks=len(book_tasks)):
+                nonlocal total_pages
+                for _ in range(n_tasks):
+                    pages = next(results)
+                    total_pages += len(pages)
+                    yield from pages
 
-        if os.path.exists(filepath):
-            print(f"Processing Book {book_num}...")
+            print(f"Processing Book {book_num} ({entry['file']})...")
+            splitter = get_splitter(entry.get("splitter", "heading"), **entry.get("splitter_options", {}))
+            chapters = 0
+            with open(os.path.join(output_dir, f"book_{book_num}_raw.txt"), "w", encoding="utf-8") as raw:
+                def written(pages, raw=raw):
+                    for page in pages:
+                        raw.write(page)
+                        yield page
 
-            text = extract_text_from_pdf(filepath)
-            text = clean_text(text)
+                for chapter in splitter.split(written(clean_pages(book_pages())), book_num, entry.get("title")):
+                    out.write(json.dumps(chapter, ensure_ascii=False) + "\n")
+                    chapters += 1
 
-            with open(os.path.join(output_dir, f"book_{book_num}_raw.txt"), "w", encoding="utf-8") as f:
-                f.write(text)
+            total_chapters += chapters
+            state[entry["file"]] = fingerprint
+            elapsed = time.perf_counter() - start_time
+            print(f"Extracted {chapters} chapters from Book {book_num} ({total_pages / elapsed:.1f} pages/s so far)")
 
-            chapters = extract_chapters(text, book_num)
+    os.replace(tmp_path, output_path)
+    # Written after the output, so a failed run never marks a book as done
+    with open(state_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
 
-            for chapter in chapters:
-                all_chapters.append(chapter)
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"Processed {total_chapters} chapters total from {len(books)} books; "
+        f"extracted {total_pages} pages in {elapsed:.1f}s ({total_pages / max(elapsed, 1e-9):.1f} pages/s)"
+    )
+    return output_path
 
-            print(f"Extracted {len(chapters)} chapters from Book {book_num}")
-        else:
-            print(f"Warning: Book {book_num} file not found at {filepath}")
 
-    with open(os.path.join(output_dir, "all_chapters.json"), "w", encoding="utf-8") as f:
-        json.dump(all_chapters, f, indent=2)
+def main():
+    parser = argparse.ArgumentParser(description="Extract chapters from the corpus books")
+    parser.add_argument("--corpus-dir", default=str(settings.DATA_DIR / "Pdfs"), help="Holds the books and manifest.json")
+    parser.add_argument("--output-dir", default=str(settings.DATA_DIR / "processed"))
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: CPU count)")
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--force", action="store_true", help="Re-extract PDFs even if unchanged")
+    args = parser.parse_args()
 
-    print(f"Processed {len(all_chapters)} chapters total from {len(books)} books")
-    return all_chapters
+    process_books(args.corpus_dir, args.output_dir, args.workers, args.pages_per_task, args.force)
 
 
 if __name__ == "__main__":
-    pdf_dir = "../data/Pdfs"
-    output_dir = "../data/processed"
-    process_books(pdf_dir, output_dir)
+    main()
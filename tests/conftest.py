@@ -0,0 +1,103 @@
+import sys
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.llm.concurrency import get_llm_limiter
+from app.llm.model import MistralLLM, get_async_http_client
+from app.main import app
+from benchmarks.fake_mistral_server import start_fake_server
+
+
+class LLMOnlyChain:
+    """RAGChain stand-in for route tests: answers straight from the LLM, without retrieval"""
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    def chat_flight_key(self, query, *args, **kwargs):
+        return query
+
+    def summary_flight_key(self, summary_type, summary_target, response_mode):
+        return summary_target
+
+    def in_flight(self, key):
+        return False
+
+    async def generate_response(self, query, **kwargs):
+        return await self.llm.ainvoke(query), []
+
+    async def stream_response(self, query, *args):
+        async for delta in self.llm.astream(query):
+            yield delta
+
+
+@pytest.fixture(autouse=True)
+def fresh_http_client():
+    # The shared async client is bound to the event loop that first used it,
+    # and the limiter keeps provider pauses; neither may leak between tests
+    get_async_http_client.cache_clear()
+    get_llm_limiter.cache_clear()
+    yield
+    get_async_http_client.cache_clear()
+    get_llm_limiter.cache_clear()
+
+
+@pytest.fixture
+def fake_server():
+    """Starts fake Mistral APIs with the given options; returns (server, completions URL)"""
+    servers = []
+
+    def start(**kwargs):
+        server, url = start_fake_server(**kwargs)
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def make_llm(fake_server):
+    def make(**kwargs):
+        _, url = fake_server(**kwargs)
+        return MistralLLM(api_key="test", api_url=url)
+
+    return make
+
+
+@pytest.fixture
+def chat_client(monkeypatch):
+    """Test client whose routes answer with the given LLM (the app's lifespan is not run)"""
+
+    def make(llm):
+        monkeypatch.setattr(routes, "get_rag_chain", lambda: LLMOnlyChain(llm))
+        return TestClient(app)
+
+    return make
+
+
+@pytest.fixture
+def fake_tokenizers(monkeypatch):
+    """Replaces the tokenizers package; returns the stand-in Tokenizer class and the hub loads it saw"""
+
+    def install(error=None):
+        loaded = []
+
+        class Tokenizer:
+            # Same signature as tokenizers 0.23: an unknown keyword raises TypeError
+            @classmethod
+            def from_pretrained(cls, identifier, revision="main", token=None):
+                if error:
+                    raise error
+                loaded.append((identifier, token))
+                return cls()
+
+        monkeypatch.setitem(sys.modules, "tokenizers", types.SimpleNamespace(Tokenizer=Tokenizer))
+        return Tokenizer, loaded
+
+    return install
@@ -0,0 +1,175 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import BackgroundTasks
+
+from app.api import routes
+from app.core.config import get_settings
+from app.llm.concurrency import SingleFlight, get_admission_queue
+from app.main import app
+from app.schemas.chat import ChatRequest
+from tests.conftest import LLMOnlyChain
+
+settings = get_settings()
+
+CHAT = {"messages": [{"role": "user", "content": "Who is Harry?"}]}
+
+
+@pytest.fixture
+def admission(monkeypatch, make_llm):
+    """One pipeline slot, answered by a fake LLM that takes 0.3s per request"""
+
+    def configure(max_queue=0, timeout=10.0):
+        monkeypatch.setattr(settings, "RAG_MAX_ACTIVE", 1)
+        monkeypatch.setattr(settings, "RAG_MAX_QUEUE", max_queue)
+        monkeypatch.setattr(settings, "RAG_QUEUE_TIMEOUT", timeout)
+        monkeypatch.setattr(settings, "RAG_RETRY_AFTER", 2)
+        get_admission_queue.cache_clear()
+        llm = make_llm(latency=0.3)
+        monkeypatch.setattr(routes, "get_rag_chain", lambda: LLMOnlyChain(llm))
+
+    yield configure
+    get_admission_queue.cache_clear()
+
+
+async def busy_then(request):
+    """Status of a slow first request, and the response to ``request`` sent while it runs"""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        first = asyncio.ensure_future(client.post("/api/chat", json=CHAT))
+        await asyncio.sleep(0.1)
+        second = await request(client)
+        return (await first).status_code, second
+
+
+def test_full_queue_answers_429(admission):
+    admission(max_queue=0)
+
+    first, second = asyncio.run(busy_then(lambda client: client.post("/api/chat", json=CHAT)))
+
+    assert first == 200
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "2"
+
+
+def test_queue_timeout_answers_503(admission):
+    admission(max_queue=1, timeout=0.05)
+
+    first, second = asyncio.run(busy_then(
+        lambda client: client.post("/api/summarize", json={"type": "character", "target": "Neville"})
+    ))
+
+    assert first == 200
+    assert second.status_code == 503
+    assert second.headers["Retry-After"] == "2"
+
+
+def test_health_is_not_queued(admission):
+    admission(max_queue=0)
+
+    first, second = asyncio.run(busy_then(lambda client: client.get("/health")))
+
+    assert first == 200
+    assert second.status_code == 200
+
+
+def test_slots_are_released_after_each_request(admission):
+    admission(max_queue=0)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            chat = await client.post("/api/chat", json=CHAT)
+            stream = await client.post("/api/chat", json={**CHAT, "stream": True})
+            again = await client.post("/api/chat", json=CHAT)
+            return chat.status_code, stream.status_code, again.status_code
+
+    assert asyncio.run(run()) == (200, 200, 200)
+
+
+def test_disconnect_during_the_stream_releases_the_slot(admission):
+    admission(max_queue=0)
+    body = json.dumps({**CHAT, "stream": True}).encode("utf-8")
+
+    async def disconnecting_client():
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            # The client leaves right after sending its request
+            return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+        async def send(message):
+            pass
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/api/chat", "raw_path": b"/api/chat", "query_string": b"",
+            "root_path": "", "headers": [(b"content-type", b"application/json")],
+            "client": ("127.0.0.1", 1234), "server": ("test", 80)
+        }
+        await app(scope, receive, send)
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return (await client.post("/api/chat", json=CHAT)).status_code
+
+    # With the slot leaked, the follow-up request would get 429
+    assert asyncio.run(disconnecting_client()) == 200
+
+
+def test_stream_never_started_is_released_by_the_background_task(admission):
+    admission(max_queue=0)
+
+    async def run():
+        response = await routes.chat(ChatRequest(**CHAT, stream=True), BackgroundTasks())
+        # The client left before the body was iterated: only the background task runs
+        await response.background()
+        release = await get_admission_queue().acquire()
+        release()
+
+    # A leaked slot would make acquire() shed the request
+    asyncio.run(run())
+
+
+class CoalescingChain(LLMOnlyChain):
+    """Streams identical questions once, like RAGChain with ENABLE_REQUEST_COALESCING"""
+
+    def __init__(self, llm):
+        super().__init__(llm)
+        self.inflight = SingleFlight()
+        self.streams_started = 0
+
+    def in_flight(self, key):
+        return self.inflight.in_flight(key)
+
+    def stream_response(self, query, *args):
+        def start():
+            self.streams_started += 1
+            return LLMOnlyChain.stream_response(self, query, *args)
+
+        return self.inflight.stream(query, "chat_stream", start)
+
+
+def test_stream_joiner_never_leads_without_a_slot(admission, monkeypatch, make_llm):
+    admission(max_queue=0)
+    chain = CoalescingChain(make_llm(latency=0.1))
+    monkeypatch.setattr(routes, "get_rag_chain", lambda: chain)
+    request = ChatRequest(**CHAT, stream=True)
+
+    async def body(response):
+        return "".join([chunk async for chunk in response.body_iterator])
+
+    async def run():
+        leader = await routes.chat(request, BackgroundTasks())
+        # Joins while the leader's stream is in flight, so it takes no slot...
+        joiner = await routes.chat(request, BackgroundTasks())
+        # ...and must still share that stream when its body is read after the flight ended
+        first = await body(leader)
+        second = await body(joiner)
+        await leader.background()
+        await joiner.background()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert "[DONE]" in second
+    assert chain.streams_started == 1
@@ -0,0 +1,18 @@
+import pytest
+
+from preprocessing.chunker import load_tokenizer
+
+
+def test_load_tokenizer_passes_the_hf_token(monkeypatch, fake_tokenizers):
+    Tokenizer, loaded = fake_tokenizers()
+    monkeypatch.setenv("HF_TOKEN", "hf_test")
+
+    assert isinstance(load_tokenizer("sentence-transformers/all-MiniLM-L6-v2"), Tokenizer)
+    assert loaded == [("sentence-transformers/all-MiniLM-L6-v2", "hf_test")]
+
+
+def test_load_tokenizer_raises_instead_of_estimating(fake_tokenizers):
+    fake_tokenizers(error=OSError("repository not found"))
+
+    with pytest.raises(RuntimeError, match="repository not found"):
+        load_tokenizer("missing/tokenizer")
@@ -0,0 +1,212 @@
+import asyncio
+
+import pytest
+
+from app.llm.concurrency import LLMLimiter, Overloaded, SingleFlight
+
+
+class Upstream:
+    """Counts calls; streams ``chunks`` with a pause between them, optionally failing midway"""
+
+    def __init__(self, chunks=("a", "b", "c"), delay=0.01, fail_after=None):
+        self.chunks = chunks
+        self.delay = delay
+        self.fail_after = fail_after
+        self.calls = 0
+        self.finished = False
+
+    async def call(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail_after is not None:
+            raise RuntimeError("upstream failed")
+        return "".join(self.chunks)
+
+    async def stream(self):
+        self.calls += 1
+        for i, chunk in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise RuntimeError("upstream failed")
+            await asyncio.sleep(self.delay)
+            yield chunk
+        self.finished = True
+
+
+async def collect(stream):
+    return "".join([chunk async for chunk in stream])
+
+
+def test_do_shares_one_call():
+    flight, upstream = SingleFlight(), Upstream()
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("key", "chat", upstream.call) for _ in range(10)))
+        return results, flight.in_flight("key")
+
+    results, still_in_flight = asyncio.run(run())
+    assert results == ["abc"] * 10
+    assert upstream.calls == 1
+    assert not still_in_flight
+
+
+def test_do_propagates_errors_to_every_caller():
+    flight, upstream = SingleFlight(), Upstream(fail_after=0)
+
+    async def run():
+        return await asyncio.gather(
+            *(flight.do("key", "chat", upstream.call) for _ in range(5)), return_exceptions=True
+        )
+
+    errors = asyncio.run(run())
+    assert upstream.calls == 1
+    assert all(isinstance(error, RuntimeError) for error in errors)
+
+
+def test_do_survives_a_cancelled_caller():
+    flight, upstream = SingleFlight(), Upstream(delay=0.05)
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("key", "chat", upstream.call))
+        follower = asyncio.ensure_future(flight.do("key", "chat", upstream.call))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower, leader.cancelled()
+
+    result, leader_cancelled = asyncio.run(run())
+    assert leader_cancelled
+    assert result == "abc"
+    assert upstream.calls == 1
+
+
+def test_stream_fans_out_to_every_subscriber():
+    flight, upstream = SingleFlight(), Upstream()
+
+    async def run():
+        first = [flight.stream("key", "chat_stream", upstream.stream) for _ in range(5)]
+        await asyncio.sleep(0.015)
+        # A late subscriber first receives the chunks already produced
+        late = flight.stream("key", "chat_stream", upstream.stream)
+        return await asyncio.gather(*(collect(stream) for stream in first + [late]))
+
+    assert asyncio.run(run()) == ["abc"] * 6
+    assert upstream.calls == 1
+
+
+def test_stream_propagates_errors_to_every_subscriber():
+    flight, upstream = SingleFlight(), Upstream(fail_after=1)
+
+    async def run():
+        streams = [flight.stream("key", "chat_stream", upstream.stream) for _ in range(3)]
+        received = [[] for _ in streams]
+
+        async def consume(stream, into):
+            async for chunk in stream:
+                into.append(chunk)
+
+        errors = await asyncio.gather(
+            *(consume(stream, into) for stream, into in zip(streams, received)), return_exceptions=True
+        )
+        return received, errors
+
+    received, errors = asyncio.run(run())
+    assert upstream.calls == 1
+    assert received == [["a"]] * 3
+    assert all(isinstance(error, RuntimeError) for error in errors)
+
+
+def test_cancelled_subscriber_does_not_stop_the_producer():
+    flight, upstream = SingleFlight(), Upstream(delay=0.02)
+
+    async def run():
+        leaving = asyncio.ensure_future(collect(flight.stream("key", "chat_stream", upstream.stream)))
+        staying = asyncio.ensure_future(collect(flight.stream("key", "chat_stream", upstream.stream)))
+        await asyncio.sleep(0.03)
+        leaving.cancel()
+        result = await staying
+        return result, leaving.cancelled()
+
+    result, left = asyncio.run(run())
+    assert left
+    assert result == "abc"
+    assert upstream.finished
+    assert upstream.calls == 1
+
+
+def test_stream_producer_finishes_without_subscribers():
+    flight, upstream = SingleFlight(), Upstream(delay=0.01)
+
+    async def run():
+        subscriber = asyncio.ensure_future(collect(flight.stream("key", "chat_stream", upstream.stream)))
+        await asyncio.sleep(0.005)
+        subscriber.cancel()
+        # Give the producer time to run to completion on its own
+        await asyncio.sleep(0.1)
+        return flight.in_flight("key")
+
+    assert not asyncio.run(run())
+    assert upstream.finished
+
+
+def limiter(**kwargs):
+    options = dict(max_concurrent=100, rate=20, burst=5, timeout=5, max_retries=2, backoff=1, retry_after=2)
+    options.update(kwargs)
+    return LLMLimiter(**options)
+
+
+def test_limiter_admits_a_burst_then_paces_at_the_rate():
+    gate = limiter(rate=20, burst=5)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        begin = loop.time()
+        starts = []
+
+        async def call():
+            async with gate.slot():
+                starts.append(loop.time() - begin)
+
+        await asyncio.gather(*(call() for _ in range(15)))
+        return sorted(starts)
+
+    starts = asyncio.run(run())
+    # The burst starts at once; every later call is scheduled one interval
+    # (50 ms) after the previous one. A late wake-up does not move the others.
+    assert starts[4] < 0.03
+    scheduled = [max(0, i - 4) * 0.05 for i in range(15)]
+    assert all(-0.01 <= start - slot <= 0.1 for start, slot in zip(starts, scheduled))
+    assert 0.45 <= starts[-1] <= 0.65
+
+
+def test_limiter_rejects_calls_that_cannot_start_in_time():
+    gate = limiter(rate=1, burst=1, timeout=0.1)
+
+    async def run():
+        async with gate.slot():
+            pass
+        async with gate.slot():
+            pass
+
+    with pytest.raises(Overloaded) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 503
+
+
+def test_limiter_caps_concurrent_calls():
+    gate = limiter(max_concurrent=2, rate=0)
+    open_calls = []
+
+    async def run():
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with gate.slot():
+                open_calls.append(1)
+                peak = max(peak, len(open_calls))
+                await asyncio.sleep(0.01)
+                open_calls.pop()
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return peak
+
+    assert asyncio.run(run()) == 2
@@ -0,0 +1,52 @@
+import logging
+
+import pytest
+
+from app.core.config import get_settings
+from app.llm.context import estimate_tokens, get_token_counter
+
+settings = get_settings()
+
+
+@pytest.fixture
+def token_counter(monkeypatch):
+    """get_token_counter() for the given CONTEXT_TOKENIZER, uncached"""
+
+    def load(name):
+        monkeypatch.setattr(settings, "CONTEXT_TOKENIZER", name)
+        get_token_counter.cache_clear()
+        return get_token_counter()
+
+    yield load
+    get_token_counter.cache_clear()
+
+
+def test_missing_tokenizer_falls_back_with_a_warning(token_counter, tmp_path, caplog):
+    with caplog.at_level(logging.WARNING, logger="app.llm.context"):
+        counter = token_counter(str(tmp_path / "missing" / "tokenizer.json"))
+
+    assert counter.tokenizer is None
+    assert counter.count("Harry Potter") == estimate_tokens("Harry Potter")
+    assert "falling back to ~4 characters per token" in caplog.text
+
+
+def test_local_tokenizer_file(token_counter, tmp_path):
+    tokenizers = pytest.importorskip("tokenizers")
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel({"harry": 0, "potter": 1, "[UNK]": 2}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+
+    counter = token_counter(str(tmp_path))
+
+    assert counter.tokenizer is not None
+    assert counter.count("harry potter harry") == 3
+
+
+def test_hub_tokenizer_is_loaded_with_the_hf_token(token_counter, monkeypatch, fake_tokenizers):
+    Tokenizer, loaded = fake_tokenizers()
+    monkeypatch.setenv("HF_TOKEN", "hf_test")
+
+    counter = token_counter("some-org/some-model")
+
+    assert isinstance(counter.tokenizer, Tokenizer)
+    assert loaded == [("some-org/some-model", "hf_test")]
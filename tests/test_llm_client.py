@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.core.config import get_settings
+from app.llm.concurrency import Overloaded
+from app.llm.model import MistralLLM, get_async_http_client, retry_after_seconds
+from benchmarks.fake_mistral_server import DEFAULT_REPLY
+
+settings = get_settings()
+
+
+@pytest.fixture
+def llm_for(fake_server):
+    def make(**kwargs):
+        server, url = fake_server(**kwargs)
+        return server, MistralLLM(api_key="test", api_url=url)
+
+    return make
+
+
+def test_acall_reuses_the_pooled_client(llm_for):
+    server, llm = llm_for()
+
+    async def run():
+        client = get_async_http_client()
+        answers = [await llm.ainvoke("Who is Harry?") for _ in range(3)]
+        return answers, client is get_async_http_client()
+
+    answers, same_client = asyncio.run(run())
+    assert answers == [DEFAULT_REPLY] * 3
+    assert same_client
+    # One kept-alive connection served every request
+    assert server.requests_served == 3
+    assert server.connections == 1
+
+
+def test_acall_read_timeout(monkeypatch, llm_for):
+    monkeypatch.setattr(settings, "LLM_READ_TIMEOUT", 0.2)
+    _, llm = llm_for(latency=1.0)
+
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(llm.ainvoke("Who is Harry?"))
+
+
+def test_acall_waits_out_retry_after_then_succeeds(monkeypatch, llm_for):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_RETRIES", 2)
+    server, llm = llm_for(rate_limited=2, retry_after="0.2")
+
+    start = time.perf_counter()
+    answer = asyncio.run(llm.ainvoke("Who is Harry?"))
+
+    assert answer == DEFAULT_REPLY
+    assert server.requests_served == 3
+    # Each 429 paused the next attempt for its Retry-After
+    assert time.perf_counter() - start >= 0.4
+
+
+def test_acall_gives_up_after_the_retries(monkeypatch, llm_for):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_RETRIES", 2)
+    server, llm = llm_for(rate_limited=10, retry_after="0")
+
+    with pytest.raises(Overloaded) as error:
+        asyncio.run(llm.ainvoke("Who is Harry?"))
+
+    assert error.value.status_code == 503
+    assert error.value.reason == "llm_provider_429"
+    assert server.requests_served == 3
+
+
+def test_astream_retries_a_429_before_streaming(llm_for):
+    server, llm = llm_for(rate_limited=1, retry_after="0")
+
+    async def collect():
+        return [chunk.text async for chunk in llm._astream("Who is Harry?")]
+
+    assert "".join(asyncio.run(collect())) == DEFAULT_REPLY
+    assert server.requests_served == 2
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "3"})) == 3.0
+    assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"})) is None
+    assert retry_after_seconds(httpx.Response(429)) is None
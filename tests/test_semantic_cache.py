@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from pydantic import ValidationError
+
+from app.llm.concurrency import get_stage_limiter
+from app.llm.prompts import RESPONSE_MODES, get_chat_prompt_template, get_system_prompt
+from app.llm.rag import RAGChain
+from app.llm.semantic_cache import SemanticCache
+from app.schemas.chat import MAX_CHAPTER, ChatRequest
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def cache(**kwargs):
+    options = dict(embeddings=None, threshold=0.9, max_entries=4, ttl=60, max_partitions=2)
+    options.update(kwargs)
+    return SemanticCache(**options)
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.texts = []
+
+    async def aembed_query(self, text):
+        self.texts.append(text)
+        return unit(1, 0).tolist()
+
+
+class OneDocStore:
+    def __init__(self):
+        self.vectors = []
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        self.vectors.append(embedding)
+        return [Document(page_content="Harry Potter is a wizard.", metadata={"source": "book1"})]
+
+
+def test_expired_best_match_falls_back_to_the_next_one():
+    semantic = cache(ttl=60)
+    semantic.store(unit(1, 0), "freeform", "best", "stale answer", [])
+    semantic.store(unit(1, 0.2), "freeform", "second", "fresh answer", [])
+    semantic._partitions["freeform"].entries[0]["expires_at"] = time.monotonic() - 1
+
+    assert semantic.lookup(unit(1, 0), "freeform") == ("fresh answer", [])
+    # The expired row is purged and never matches again
+    assert not semantic._partitions["freeform"].vectors[0].any()
+
+
+def test_first_turn_embeds_the_question_once(make_llm):
+    embedder, store = CountingEmbedder(), OneDocStore()
+    chain = RAGChain.__new__(RAGChain)
+    chain.llm = make_llm()
+    chain.query_embedder = embedder
+    chain.semantic_cache = cache(embeddings=embedder)
+    chain.vector_store = store
+    chain.bm25_index = chain.reranker = chain.response_cache = chain.inflight = None
+    chain.limits = get_stage_limiter()
+    chain.chat_prompts = {
+        mode: get_chat_prompt_template().partial(system_prompt=get_system_prompt(mode)) for mode in RESPONSE_MODES
+    }
+
+    answer, sources = asyncio.run(chain.generate_response("Who is Harry?"))
+
+    assert sources == ["book1"]
+    assert embedder.texts == ["Who is Harry?"]
+    assert store.vectors == [unit(1, 0).tolist()]
+
+
+def test_lookup_does_not_create_partitions():
+    semantic = cache()
+
+    for chapter in range(10):
+        assert semantic.lookup(unit(1, 0), f"freeform|{chapter}") is None
+
+    assert len(semantic._partitions) == 0
+
+
+def test_least_recently_used_partition_is_dropped_whole():
+    semantic = cache(max_partitions=2)
+    semantic.store(unit(1, 0), "freeform|1", "q1", "a1", [])
+    semantic.store(unit(1, 0), "freeform|2", "q2", "a2", [])
+    # Using partition 1 makes partition 2 the least recently used
+    assert semantic.lookup(unit(1, 0), "freeform|1") == ("a1", [])
+
+    semantic.store(unit(1, 0), "freeform|3", "q3", "a3", [])
+
+    assert list(semantic._partitions) == ["freeform|1", "freeform|3"]
+    assert semantic.lookup(unit(1, 0), "freeform|2") is None
+
+
+def test_scope_is_bounded():
+    with pytest.raises(ValidationError):
+        ChatRequest(messages=[{"role": "user", "content": "Who is Harry?"}], chapter=MAX_CHAPTER + 1)
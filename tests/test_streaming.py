@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+import requests
+
+from app.api.routes import format_sse
+from app.llm.model import iter_sse_deltas
+from benchmarks.fake_mistral_server import DEFAULT_REPLY
+
+
+def sse_event(content):
+    return "data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": content}}]})
+
+
+def parse_sse(body):
+    """The data of each server-sent event, multi-line fields re-joined with newlines"""
+    events = []
+    for block in body.split("\n\n"):
+        lines = [line[len("data: "):] for line in block.split("\n") if line.startswith("data: ")]
+        if lines:
+            events.append("\n".join(lines))
+    return events
+
+
+def test_format_sse_frames_every_line():
+    assert format_sse("world.\n\nHe") == "data: world.\ndata: \ndata: He\n\n"
+    assert parse_sse(format_sse("a\n\nb\n")) == ["a\n\nb\n"]
+
+
+def test_iter_sse_deltas_stops_at_done():
+    lines = [
+        ": keep-alive",
+        sse_event("Hello "),
+        "",
+        "data: " + json.dumps({"choices": [{"index": 0, "delta": {"role": "assistant"}}]}),
+        sse_event("world"),
+        "data: [DONE]",
+        sse_event("after the end"),
+    ]
+    assert list(iter_sse_deltas(lines)) == ["Hello ", "world"]
+
+
+def test_stream_yields_reply(make_llm):
+    llm = make_llm()
+    chunks = [chunk.text for chunk in llm._stream("Who is Harry?")]
+    assert len(chunks) > 1
+    assert "".join(chunks) == DEFAULT_REPLY
+
+
+def test_astream_yields_reply(make_llm):
+    llm = make_llm(token_delay=0.001)
+
+    async def collect():
+        return [chunk.text async for chunk in llm._astream("Who is Harry?")]
+
+    chunks = asyncio.run(collect())
+    assert len(chunks) > 1
+    assert "".join(chunks) == DEFAULT_REPLY
+
+
+def test_stream_errors_are_raised(make_llm):
+    llm = make_llm(error_status=500)
+    with pytest.raises(requests.HTTPError):
+        list(llm._stream("Who is Harry?"))
+
+    async def collect():
+        return [chunk async for chunk in llm._astream("Who is Harry?")]
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(collect())
+
+
+def test_chat_endpoint_streams_tokens(make_llm, chat_client):
+    client = chat_client(make_llm())
+    response = client.post("/api/chat", json={
+        "messages": [{"role": "user", "content": "Who is Harry?"}],
+        "stream": True
+    })
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert events[0] == "Thinking..."
+    assert events[-1] == "[DONE]"
+    # The reply's blank line survives the SSE framing
+    assert "".join(events[1:-1]) == DEFAULT_REPLY
+
+
+def test_chat_endpoint_streams_error_then_done(make_llm, chat_client):
+    client = chat_client(make_llm(error_status=500))
+    response = client.post("/api/chat", json={
+        "messages": [{"role": "user", "content": "Who is Harry?"}],
+        "stream": True
+    })
+
+    assert response.status_code == 200
+    events = parse_sse(response.text)
+    assert events[0] == "Thinking..."
+    assert events[1].startswith("Error generating response:")
+    assert events[-1] == "[DONE]"